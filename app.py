@@ -5,7 +5,6 @@ import json
 import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import pandas as pd
 import re
 from jinja2 import Template
 
@@ -13,10 +12,9 @@ from jinja2 import Template
 from dynamic_parser import dynamic_parse_and_save, test_gemini_connection
 from billing_dynamic import calculate_invoice, validate_product_data, generate_invoice_summary
 
-# Import Gemini AI
-import google.generativeai as genai
+# Gemini AI is imported and configured on first use
+from gemini_client import get_gemini_model, gemini_configured
 from dotenv import load_dotenv
-import pdfkit
 
 # Load environment variables
 load_dotenv()
@@ -36,23 +34,6 @@ os.makedirs(app.config['INVOICE_FOLDER'], exist_ok=True)
 os.makedirs('templates', exist_ok=True)
 os.makedirs('static', exist_ok=True)
 
-# Configure Gemini AI
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        GEMINI_AVAILABLE = True
-        print("✅ Gemini AI configured successfully")
-    except Exception as e:
-        print(f"⚠️ Error configuring Gemini AI: {e}")
-        GEMINI_AVAILABLE = False
-        model = None
-else:
-    print("⚠️ GEMINI_API_KEY not found. Please set it in your .env file")
-    GEMINI_AVAILABLE = False
-    model = None
-
 # Enhanced in-memory storage with persistent conversation history
 session_data = {}
 
@@ -175,7 +156,8 @@ def chat_endpoint():
 def process_natural_language(message, session, products):
     """Enhanced natural language processing with better conversation understanding"""
     try:
-        if not GEMINI_AVAILABLE or not model:
+        model = get_gemini_model()
+        if not model:
             return get_fallback_response(message, session, products)
         
         # Build rich context for conversation memory
@@ -1044,6 +1026,7 @@ def generate_invoice_pdf(invoice, client_details, session_id):
         
         # Convert HTML to PDF using pdfkit
         try:
+            import pdfkit
             pdfkit.from_string(html_content, pdf_path, options=options)
             print(f"✅ PDF generated successfully: {pdf_filename}")
             return pdf_filename
@@ -1213,7 +1196,7 @@ if __name__ == '__main__':
     print("🚀 Starting Smart Natural Language AI Invoice Assistant...")
     print(f"📁 Upload folder: {app.config['UPLOAD_FOLDER']}")
     print(f"📄 Invoice folder: {app.config['INVOICE_FOLDER']}")
-    print(f"🤖 Gemini AI: {'Available' if GEMINI_AVAILABLE else 'Not Available'}")
+    print(f"🤖 Gemini AI: {'Available' if gemini_configured() else 'Not Available'}")
     print(f"📦 Default products: {len(default_products)} loaded from product_data.json")
     print(f"🏷️ Overall discount functionality: Added")
     
@@ -1,45 +1,83 @@
-# Debug print to verify file execution
-print("✅ Running app0.py from ai_invoice_assistant")
+from startup_profile import StartupProfile
+startup_profile = StartupProfile()
 
-from flask import Flask, request, jsonify, render_template, send_file, session, redirect
+from flask import Flask, request, jsonify, render_template, send_file, session, redirect, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 import os
 import json
 import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import pandas as pd
+from werkzeug.security import check_password_hash
 import re
 from jinja2 import Template
 import sqlite3
-import random 
 from datetime import datetime, timedelta
 import hashlib
 import secrets
+import time
+import logging
+import atexit
+from logging_setup import configure_logging
+from user_import import PasswordHashPool, parse_user_rows, hash_passwords, generate_temp_password, REQUIRED_BULK_USER_FIELDS
+
+# Bulk user imports hash passwords in these workers, forked here before any thread below exists
+# (PASSWORD_HASH_WORKERS is read from the environment; .env is loaded later)
+password_hash_pool = PasswordHashPool(int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))).start()
+
+def log_context():
+    """Request fields attached to every record logged while handling a request"""
+    if not has_request_context():
+        return None
+    return {'endpoint': request.endpoint, 'session_id': request.headers.get('Session-ID'), 'user': session.get('username')}
+
+# Records go through a queue to a background writer; LOG_LEVEL/LOG_LEVELS/LOG_FORMAT configure it
+log_handler = configure_logging(context=log_context)
+# Named explicitly: __name__ is '__main__' when app0 runs as a script
+logger = logging.getLogger('app0')
+logger.info("Running app0.py from ai_invoice_assistant")
+startup_profile.mark('core imports')
 
 
 # Import the new database manager
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, SCHEMA_VERSION, USER_SORT_COLUMNS
+from dashboard_snapshot import DashboardSnapshot, CartAddCounter, growth_percent
+from system_monitor import SystemMetricsSampler, PSUTIL_AVAILABLE
+from metrics import MetricsRegistry
+from request_profiler import RequestProfiler
+from catalog_snapshot import load_catalog, write_snapshot, source_signature, catalog_column
+from product_matcher import MatcherCache, SUGGEST_THRESHOLD
+from memory_report import TracemallocSnapshots, session_report, catalog_report, process_memory
+from export_manager import ExportManager, EXPORT_TYPES, EXPORT_CATEGORIES
+from invoice_store import InvoiceStore
+from render_cache import RenderCache, canonical_hash
+from cart import Cart
+from billing_engine import BillingEngine
 
 # Import your existing modules
 try:
     from dynamic_parser import dynamic_parse_and_save, test_gemini_connection
-    from billing_dynamic_enhanced import calculate_invoice, validate_product_data, generate_invoice_summary
+    from billing_dynamic_enhanced import validate_product_data
 except ImportError:
-    print("⚠️ Original modules not found, using enhanced versions")
-    from billing_dynamic_enhanced import calculate_invoice, validate_product_data, generate_invoice_summary
+    logger.warning("Original modules not found, using enhanced versions")
+    from billing_dynamic_enhanced import validate_product_data
     
     def dynamic_parse_and_save(file_path, output_path=None):
         return []
     
     def test_gemini_connection():
         return True, "Connection test successful"
+startup_profile.mark('app modules')
 
 # Import login handler
 try:
-    from login_handler import setup_login_routes
+    from login_handler import setup_login_routes, registration_listeners, user_cache
 except ImportError:
-    print("⚠️ Login handler not found, creating basic setup")
+    logger.warning("Login handler not found, creating basic setup")
+    from user_cache import UserCache
+    registration_listeners = []
+    user_cache = UserCache('invoices.db')
+    
     def setup_login_routes(app):
         @app.route('/api/login', methods=['GET', 'POST'])
         def login():
@@ -73,10 +111,10 @@ except ImportError:
             session.clear()
             return jsonify({'success': True})
 
-# Import Gemini AI
-import google.generativeai as genai
+# Gemini AI is imported and configured on first use
+from gemini_client import get_llm_model, llm_configured
 from dotenv import load_dotenv
-import pdfkit
+startup_profile.mark('login and gemini client')
 
 # Load environment variables
 load_dotenv()
@@ -91,7 +129,24 @@ CORS(app, supports_credentials=True)  # Allow credentials (cookies) in CORS
 # Configuration
 app.config['UPLOAD_FOLDER'] = 'Uploads'
 app.config['INVOICE_FOLDER'] = 'invoices'
+app.config['EXPORT_FOLDER'] = 'exports'
+# Optional download offload to the front web server: 'X-Sendfile' (Apache/lighttpd, absolute path)
+# or 'X-Accel-Redirect' (nginx, INVOICE_SENDFILE_PREFIX + path relative to INVOICE_FOLDER)
+app.config['INVOICE_SENDFILE_HEADER'] = os.getenv('INVOICE_SENDFILE_HEADER')
+app.config['INVOICE_SENDFILE_PREFIX'] = os.getenv('INVOICE_SENDFILE_PREFIX', '/protected-invoices/')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+# How GST is applied: 'taxable_value' (goods and charges) or 'goods' (see billing_engine.TAX_RULES)
+app.config['GST_RULE'] = os.getenv('GST_RULE', 'taxable_value')
+# Stage timings and counters for /metrics; METRICS_TOKEN, if set, is required as a bearer token to scrape
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') != '0'
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+# Opt-in request profiling: X-Profile header (admins, or PROFILE_TOKEN as value), admin toggle or sampled fraction
+app.config['PROFILE_FOLDER'] = 'profiles'
+app.config['PROFILE_MODE'] = os.getenv('PROFILE_MODE', 'cprofile')
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+app.config['PROFILE_TOKEN'] = os.getenv('PROFILE_TOKEN')
+# Memory-mapped columnar copy of product_data.json shared by all workers (CATALOG_SNAPSHOT= to load the JSON per worker)
+app.config['CATALOG_SNAPSHOT'] = os.getenv('CATALOG_SNAPSHOT', 'product_data.snapshot')
 
 # Ensure directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -101,39 +156,134 @@ os.makedirs('static', exist_ok=True)
 os.makedirs('static/css', exist_ok=True)
 os.makedirs('static/js', exist_ok=True)
 
-# Initialize Database Manager
-db_manager = DatabaseManager()
-
-# Run migration if needed (for existing installations)
-try:
-    db_manager.migrate_existing_data()
-except Exception as e:
-    print(f"⚠️ Migration warning: {e}")
-
-# Configure Gemini AI
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        GEMINI_AVAILABLE = True
-        print("✅ Gemini AI configured successfully")
-    except Exception as e:
-        print(f"⚠️ Error configuring Gemini AI: {e}")
-        GEMINI_AVAILABLE = False
-        model = None
-else:
-    print("⚠️ GEMINI_API_KEY not found. Please set it in your .env file")
-    GEMINI_AVAILABLE = False
-    model = None
+# Prometheus-style metrics (stage timings, DB operations, requests, caches) served at /metrics
+metrics = MetricsRegistry(enabled=app.config['METRICS_ENABLED'])
+http_request_seconds = metrics.histogram('http_request_seconds', 'Request handling time', ('endpoint', 'method'))
+http_requests_total = metrics.counter('http_requests_total', 'Handled requests', ('endpoint', 'method', 'status'))
+metrics.callback('log_records_dropped_total', 'Log records dropped because the log queue was full',
+                 lambda: log_handler.dropped, type='counter')
+
+# Initialize Database Manager (tables, migrations and indexes are set up once by init_db.py)
+db_manager = metrics.instrument_methods(DatabaseManager(initialize=False), 'db_operation_seconds',
+                                        'Time spent in DatabaseManager operations')
+if db_manager.get_schema_version() < SCHEMA_VERSION:
+    logger.warning("Database schema is out of date. Run `python init_db.py` before starting the app")
+startup_profile.mark('database')
+
+# In-memory dashboard metrics, kept current by invoice/user/product events
+dashboard_snapshot = DashboardSnapshot(db_manager, ttl_seconds=int(os.getenv('DASHBOARD_SNAPSHOT_TTL', '300')))
+registration_listeners.append(dashboard_snapshot.record_user_created)
+
+# Cart-add counts for products_analytics, written in batches rather than on every add
+cart_add_counter = CartAddCounter(db_manager, flush_interval=float(os.getenv('CART_ADD_FLUSH_INTERVAL', '30')))
+atexit.register(cart_add_counter.flush)
+
+# Background system metrics for /api/system_health (started on the first request)
+system_sampler = SystemMetricsSampler(
+    db_path=db_manager.db_path,
+    interval=float(os.getenv('SYSTEM_SAMPLER_INTERVAL', '5')),
+    session_counter=lambda: len(session_data)
+)
+
+# Streaming exports written under EXPORT_FOLDER
+export_manager = ExportManager(db_path=db_manager.db_path, export_folder=app.config['EXPORT_FOLDER'])
+
+# Generated invoice files, sharded under INVOICE_FOLDER
+invoice_store = InvoiceStore(app.config['INVOICE_FOLDER'])
+billing_engine = BillingEngine(app.config['GST_RULE'])
+
+# Per-request cProfile/stack-sample profiles, listed and downloaded from /api/admin/profiles
+request_profiler = RequestProfiler(
+    folder=app.config['PROFILE_FOLDER'],
+    mode=app.config['PROFILE_MODE'],
+    sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+    token=app.config['PROFILE_TOKEN']
+)
+
+# tracemalloc snapshots for /api/admin/memory/tracemalloc; tracing only runs while an admin has it started
+memory_snapshots = TracemallocSnapshots()
+
+# Concurrent renders of the same invoice (double-clicks) share one render; the compiled invoice template
+invoice_render_cache = RenderCache()
+invoice_template_cache = {}
+
+# Trigram fuzzy matcher per product list; product add/update/delete routes invalidate it
+product_matchers = MatcherCache()
+
+metrics.callback('sessions', 'In-memory chat sessions', lambda: len(session_data))
+metrics.callback('uptime_seconds', 'Process uptime', system_sampler.uptime_seconds)
+metrics.callback('cache_entries', 'Entries held by each cache', lambda: {
+    'invoice_render': invoice_render_cache.stats()['entries'], 'user': user_cache.stats()['entries'],
+    'product_matcher': product_matchers.stats()['entries']}, labelnames=('cache',))
+metrics.callback('cache_hits_total', 'Cache lookups answered from the cache', lambda: {
+    'invoice_render': invoice_render_cache.hits + invoice_render_cache.coalesced, 'user': user_cache.hits,
+    'product_matcher': product_matchers.hits},
+    type='counter', labelnames=('cache',))
+metrics.callback('cache_misses_total', 'Cache lookups that had to load or render', lambda: {
+    'invoice_render': invoice_render_cache.renders, 'user': user_cache.misses,
+    'product_matcher': product_matchers.builds}, type='counter', labelnames=('cache',))
+
+@app.before_request
+def track_request():
+    system_sampler.ensure_started()
+    system_sampler.record_request()
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s %s", request.method, request.path, extra={'session': dict(session)})
+    profile = request_profiler.start(request.endpoint, request.headers.get(request_profiler.header),
+                                     is_admin=lambda: user_cache.get_role(session.get('username')) == 'admin')
+    if profile:
+        g.profile = profile
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, endpoint, request.method)
+        http_requests_total.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+def profile_details(status):
+    return {'endpoint': request.endpoint, 'method': request.method, 'path': request.path,
+            'user': session.get('username'), 'status': status}
+
+@app.after_request
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile:
+        profile_id = request_profiler.finish(profile, profile_details(response.status_code))
+        if profile_id:
+            response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.teardown_request
+def finish_failed_request_profile(error):
+    # after_request is skipped when a view raises; keep the profile of the failed request
+    profile = g.pop('profile', None)
+    if profile:
+        request_profiler.finish(profile, profile_details(500))
 
 # Enhanced in-memory storage
 session_data = {}
 
+# Invoice files never change once written, so browsers may cache them for a year
+INVOICE_CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Messages kept in session memory as conversation context, and chat page size
+CONVERSATION_WINDOW = 10
+CHAT_PAGE_SIZE = 50
+
+# Admin user list page size (default and cap)
+USER_PAGE_SIZE = 10
+MAX_USER_PAGE_SIZE = 100
+MAX_BULK_USERS = 1000
+
 def get_session_data(session_id):
     if session_id not in session_data:
         session_data[session_id] = {
-            'cart': {},
+            'cart': Cart(billing_engine),
             'client_details': {},
             'conversation_history': [],
             'products': [],
@@ -156,12 +306,17 @@ def validate_user_session():
 
 def admin_required(f):
     def wrap(*args, **kwargs):
-        if 'username' not in session or session.get('role') != 'admin':
+        # Check the stored role (cached) so a demoted or deleted admin loses access right away
+        if 'username' not in session or user_cache.get_role(session['username']) != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     wrap.__name__ = f.__name__  # Preserve function name for Flask
     return wrap
 
+def get_invoice_scope(username):
+    """Username filter for invoice queries: the admin account sees every invoice"""
+    return None if username == 'admin' else username
+
 def get_current_username():
     """Get current authenticated username"""
     return session.get('username')
@@ -177,7 +332,7 @@ def get_session_data(session_id):
     """Get or create session data for a given session ID"""
     if session_id not in session_data:
         session_data[session_id] = {
-            'cart': {},
+            'cart': Cart(billing_engine),
             'client_details': {},
             'conversation_history': [],
             'products': [],
@@ -197,32 +352,55 @@ def save_message_to_db(username, chat_id, message_type, content, metadata=None):
         db_manager.save_message(chat_id, username, message_type, content, metadata)
         return chat_id
     except Exception as e:
-        print(f"❌ Error saving message to DB: {str(e)}")
+        logger.error("Error saving message to DB: %s", e)
         return chat_id
 
+def new_invoice_number():
+    """Timestamped invoice number; the random suffix keeps invoices made in the same second apart"""
+    return f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:4].upper()}"
+
+def save_invoice_record(invoice_number, client_name, invoice, pdf_path, username):
+    """Persist an invoice and push it to the dashboard snapshot"""
+    invoice_date = datetime.now().strftime('%Y-%m-%d')
+    db_manager.save_invoice(invoice_number, client_name, invoice, pdf_path, username, invoice_date,
+                            invoice_store.file_info(pdf_path))
+    dashboard_snapshot.record_invoice(invoice_number, client_name, invoice['summary']['grand_total'],
+                                      invoice_date, username, DatabaseManager.invoice_lines(invoice))
+    cart_add_counter.flush()
+
 def load_default_products():
-    """Load products from product_data.json"""
+    """Load products from product_data.json (through its memory-mapped snapshot when CATALOG_SNAPSHOT is set)"""
     try:
         if os.path.exists('product_data.json'):
+            if app.config['CATALOG_SNAPSHOT']:
+                try:
+                    products = load_catalog('product_data.json', app.config['CATALOG_SNAPSHOT'])
+                    logger.info("Mapped %s products from %s", len(products), app.config['CATALOG_SNAPSHOT'])
+                    return products
+                except (OSError, ValueError) as e:
+                    logger.warning("Catalog snapshot unavailable, loading product_data.json: %s", e)
             with open('product_data.json', 'r') as f:
                 products = json.load(f)
-            print(f"✅ Loaded {len(products)} products from product_data.json")
+            logger.info("Loaded %s products from product_data.json", len(products))
             return products
         else:
-            print("⚠️ product_data.json not found")
+            logger.warning("product_data.json not found")
             return []
     except Exception as e:
-        print(f"❌ Error loading product_data.json: {e}")
+        logger.error("Error loading product_data.json: %s", e)
         return []
 
 def save_products(products):
     """Save products to product_data.json"""
     try:
+        products = list(products)
         with open('product_data.json', 'w') as f:
             json.dump(products, f, indent=2)
-        print(f"✅ Saved {len(products)} products to product_data.json")
+        if app.config['CATALOG_SNAPSHOT']:
+            write_snapshot(products, app.config['CATALOG_SNAPSHOT'], source=source_signature('product_data.json'))
+        logger.info("Saved %s products to product_data.json", len(products))
     except Exception as e:
-        print(f"❌ Error saving product_data.json: {e}")
+        logger.error("Error saving product_data.json: %s", e)
 
 def parse_for_streamlit(file_path):
     """Parse uploaded files for products"""
@@ -230,7 +408,7 @@ def parse_for_streamlit(file_path):
         products = dynamic_parse_and_save(file_path, output_path=None)
         return products
     except Exception as e:
-        print(f"Error parsing for Flask: {e}")
+        logger.error("Error parsing for Flask: %s", e)
         return []
 
 # Enhanced in-memory storage (if not already defined)
@@ -240,106 +418,7 @@ if 'session_data' not in globals():
 # Load default products (if not already loaded)
 if 'default_products' not in globals():
     default_products = load_default_products()
-
-def migrate_users_table():
-    """Migrate users table to add missing columns"""
-    print("🔄 Checking and migrating users table...")
-    
-    try:
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
-        # Get current table structure
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        print(f"Current columns: {columns}")
-        
-        # Define all required columns with their default values
-        required_columns = {
-            'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
-            'username': 'TEXT UNIQUE NOT NULL',
-            'password': 'TEXT NOT NULL',
-            'email': 'TEXT',
-            'full_name': 'TEXT',
-            'phone': 'TEXT',
-            'department': 'TEXT',
-            'role': 'TEXT NOT NULL DEFAULT "user"',
-            'status': 'TEXT NOT NULL DEFAULT "active"',
-            'must_change_password': 'BOOLEAN DEFAULT 0',
-            'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
-            'last_login': 'TIMESTAMP',
-            'created_by': 'TEXT'
-        }
-        
-        # Check if table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-        table_exists = cursor.fetchone()
-        
-        if not table_exists:
-            # Create the table from scratch
-            print("🔨 Creating users table...")
-            columns_sql = ', '.join([f"{col} {definition}" for col, definition in required_columns.items()])
-            cursor.execute(f"CREATE TABLE users ({columns_sql})")
-            print("✅ Users table created successfully")
-        else:
-            # Add missing columns one by one
-            for column_name, column_definition in required_columns.items():
-                if column_name not in columns:
-                    try:
-                        # For non-nullable columns, we need to handle them carefully
-                        if 'NOT NULL' in column_definition and 'DEFAULT' not in column_definition:
-                            if column_name == 'role':
-                                cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} TEXT NOT NULL DEFAULT 'user'")
-                            elif column_name == 'status':
-                                cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} TEXT NOT NULL DEFAULT 'active'")
-                            else:
-                                # Skip primary key and unique constraints in ALTER TABLE
-                                simplified_def = column_definition.replace('PRIMARY KEY AUTOINCREMENT', '').replace('UNIQUE', '').strip()
-                                cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} {simplified_def}")
-                        else:
-                            cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} {column_definition}")
-                        print(f"✅ Added column: {column_name}")
-                    except sqlite3.OperationalError as e:
-                        if "duplicate column name" not in str(e).lower():
-                            print(f"⚠️ Warning adding column {column_name}: {e}")
-        
-        # Create a default admin user if no users exist
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-        
-        if user_count == 0:
-            print("🔨 Creating default admin user...")
-            # Hash the default password
-            import hashlib
-            import secrets
-            
-            def hash_password(password):
-                salt = secrets.token_hex(16)
-                password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-                return f"{salt}:{password_hash}"
-            
-            admin_password = hash_password("admin123")  # Default password
-            
-            cursor.execute('''INSERT INTO users 
-                             (username, password, email, full_name, role, status, must_change_password, created_at)
-                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                          ('admin', admin_password, 'admin@company.com', 'System Administrator', 
-                           'super_admin', 'active', 1, datetime.now().isoformat()))
-            
-            print("✅ Default admin user created:")
-            print("   Username: admin")
-            print("   Password: admin123")
-            print("   ⚠️ Please change this password after first login!")
-        
-        conn.commit()
-        conn.close()
-        
-        print("✅ Users table migration completed successfully")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error during migration: {e}")
-        return False
+startup_profile.mark('product catalog')
 
 import hashlib
 import secrets
@@ -355,6 +434,9 @@ def hash_password(password):
 def verify_password(password, stored_hash):
     """Verify password against stored hash"""
     try:
+        if '$' in stored_hash:
+            # werkzeug format ("method$salt$hash"), used by registration and bulk import
+            return check_password_hash(stored_hash, password)
         salt, password_hash = stored_hash.split(':')
         return hashlib.sha256((password + salt).encode()).hexdigest() == password_hash
     except:
@@ -381,95 +463,61 @@ def validate_user_role_permissions(current_role, target_role, operation='create'
 @app.route('/api/admin/users', methods=['GET'])
 @admin_required
 def get_users():
-    """Get all users with statistics"""
-    print("🔍 Get users session:", dict(session))
+    """Get one page of users (filtered, searched and sorted in SQL) with statistics"""
     try:
         current_user_role = session.get('role', 'user')
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
-        # Ensure users table exists with all required columns
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            email TEXT,
-            full_name TEXT,
-            phone TEXT,
-            department TEXT,
-            role TEXT NOT NULL DEFAULT 'user',
-            status TEXT NOT NULL DEFAULT 'active',
-            must_change_password BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP,
-            created_by TEXT
-        )''')
-        
         # Get users based on current user role
         if current_user_role == 'super_admin':
             # Super admin can see all users
-            cursor.execute('''SELECT id, username, email, full_name, phone, department, 
-                             role, status, must_change_password, created_at, last_login, created_by
-                             FROM users ORDER BY created_at DESC''')
+            visible_roles = None
         elif current_user_role == 'admin':
             # Admin can only see regular users and other admins (but not super admins)
-            cursor.execute('''SELECT id, username, email, full_name, phone, department, 
-                             role, status, must_change_password, created_at, last_login, created_by
-                             FROM users WHERE role IN ('user', 'admin') ORDER BY created_at DESC''')
+            visible_roles = ('user', 'admin')
         else:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        users = []
-        for row in cursor.fetchall():
-            user = {
-                'id': row[0],
-                'username': row[1],
-                'email': row[2],
-                'full_name': row[3],
-                'phone': row[4],
-                'department': row[5],
-                'role': row[6],
-                'status': row[7],
-                'must_change_password': bool(row[8]),
-                'created_at': row[9],
-                'last_login': row[10],
-                'created_by': row[11]
-            }
-            users.append(user)
-        
-        # Calculate statistics
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role IN (SELECT DISTINCT role FROM users)')
-        total_users = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT COUNT(*) FROM users WHERE status = "active"')
-        active_users = cursor.fetchone()[0] or 0
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', USER_PAGE_SIZE, type=int), 1), MAX_USER_PAGE_SIZE)
+        sort = request.args.get('sort', 'created_at')
+        if sort not in USER_SORT_COLUMNS:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid sort column: {sort}'
+            }), 400
         
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role IN ("admin", "super_admin")')
-        admin_users = cursor.fetchone()[0] or 0
+        # 'all' (the UI's default filter value) means no filter
+        filters = {name: request.args.get(name, '').strip() for name in ('role', 'status', 'department')}
+        filters = {name: value for name, value in filters.items() if value and value != 'all'}
+        
+        users, total = db_manager.get_users_page(
+            visible_roles=visible_roles,
+            search=request.args.get('search', '').strip() or None,
+            sort=sort,
+            descending=request.args.get('order', 'desc').lower() != 'asc',
+            limit=per_page,
+            offset=(page - 1) * per_page,
+            **filters
+        )
         
         # New users this month
         first_day_this_month = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-        cursor.execute('SELECT COUNT(*) FROM users WHERE created_at >= ?', (first_day_this_month,))
-        new_users = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        stats = {
-            'total_users': total_users,
-            'active_users': active_users,
-            'admin_users': admin_users,
-            'new_users': new_users
-        }
+        stats = db_manager.get_user_stats(first_day_this_month)
         
         return jsonify({
             'success': True,
             'users': users,
-            'stats': stats
+            'stats': stats,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'total_pages': (total + per_page - 1) // per_page
+            }
         })
         
     except Exception as e:
-        print(f"❌ Error fetching users: {str(e)}")
+        logger.error("Error fetching users: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching users: {str(e)}'
@@ -479,7 +527,6 @@ def get_users():
 @admin_required
 def create_user():
     """Create a new user"""
-    print("🔍 Create user session:", dict(session))
     try:
         current_user_role = session.get('role', 'user')
         current_username = session.get('username')
@@ -511,18 +558,16 @@ def create_user():
                 'error': 'Invalid email format'
             }), 400
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
         # Check if username already exists
-        cursor.execute('SELECT id FROM users WHERE username = ?', (data['username'],))
-        if cursor.fetchone():
-            conn.close()
+        if user_cache.get_user(data['username']):
             return jsonify({
                 'success': False,
                 'error': 'Username already exists'
             }), 400
         
+        conn = sqlite3.connect('invoices.db')
+        cursor = conn.cursor()
+        
         # Check if email already exists
         cursor.execute('SELECT id FROM users WHERE email = ?', (data['email'],))
         if cursor.fetchone():
@@ -547,8 +592,10 @@ def create_user():
         user_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        user_cache.invalidate(data['username'])
         
-        print(f"✅ User created successfully: {data['username']} (ID: {user_id})")
+        logger.info("User created successfully: %s (ID: %s)", data['username'], user_id)
+        dashboard_snapshot.record_user_created(data['username'])
         
         return jsonify({
             'success': True,
@@ -557,17 +604,120 @@ def create_user():
         })
         
     except Exception as e:
-        print(f"❌ Error creating user: {str(e)}")
+        logger.error("Error creating user: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error creating user: {str(e)}'
         }), 500
 
+@app.route('/api/admin/users/bulk', methods=['POST'])
+@admin_required
+def bulk_create_users():
+    """Create many users from a CSV/JSON upload ('file') or a JSON/CSV request body"""
+    try:
+        current_user_role = session.get('role', 'user')
+        current_username = session.get('username')
+        
+        upload = request.files.get('file')
+        try:
+            if upload:
+                rows = parse_user_rows(upload.read(), upload.filename, upload.mimetype)
+            else:
+                rows = parse_user_rows(request.get_data(), content_type=request.content_type)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not rows:
+            return jsonify({
+                'success': False,
+                'error': 'No users to import'
+            }), 400
+        
+        if len(rows) > MAX_BULK_USERS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many users in one import (max {MAX_BULK_USERS})'
+            }), 400
+        
+        # Validate every row first; row numbers are 1-based as in the uploaded file
+        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        errors = {}
+        seen_usernames = set()
+        seen_emails = set()
+        for number, row in enumerate(rows, start=1):
+            row['role'] = row['role'] or 'user'
+            missing = [field for field in REQUIRED_BULK_USER_FIELDS if not row[field]]
+            if missing:
+                errors[number] = f'Missing required field: {missing[0]}'
+            elif not validate_user_role_permissions(current_user_role, row['role'], 'create'):
+                errors[number] = 'Insufficient permissions to create user with this role'
+            elif not re.match(email_pattern, row['email']):
+                errors[number] = 'Invalid email format'
+            elif row['username'] in seen_usernames:
+                errors[number] = 'Duplicate username in import'
+            elif row['email'] in seen_emails:
+                errors[number] = 'Duplicate email in import'
+            seen_usernames.add(row['username'])
+            seen_emails.add(row['email'])
+        
+        # One lookup for all usernames/emails that are already taken
+        existing_usernames, existing_emails = db_manager.find_existing_users(seen_usernames, seen_emails)
+        for number, row in enumerate(rows, start=1):
+            if number in errors:
+                continue
+            if row['username'] in existing_usernames:
+                errors[number] = 'Username already exists'
+            elif row['email'] in existing_emails:
+                errors[number] = 'Email already exists'
+        
+        valid_rows = [row for number, row in enumerate(rows, start=1) if number not in errors]
+        generated_passwords = set()
+        for row in valid_rows:
+            if not row['temp_password']:
+                row['temp_password'] = generate_temp_password()
+                generated_passwords.add(row['username'])
+        
+        for row, password_hash in zip(valid_rows, hash_passwords((row['temp_password'] for row in valid_rows), password_hash_pool)):
+            row['password'] = password_hash
+        
+        if valid_rows:
+            db_manager.bulk_create_users(valid_rows, current_username)
+            for row in valid_rows:
+                user_cache.invalidate(row['username'])
+            dashboard_snapshot.record_users_imported([row['username'] for row in valid_rows])
+        
+        results = []
+        for number, row in enumerate(rows, start=1):
+            result = {'row': number, 'username': row['username'], 'success': number not in errors}
+            if number in errors:
+                result['error'] = errors[number]
+            elif row['username'] in generated_passwords:
+                result['temp_password'] = row['temp_password']
+            results.append(result)
+        
+        logger.info("Bulk import: %s users created, %s rows rejected", len(valid_rows), len(errors))
+        
+        return jsonify({
+            'success': bool(valid_rows),
+            'created': len(valid_rows),
+            'failed': len(errors),
+            'results': results
+        }), 200 if valid_rows else 400
+        
+    except Exception as e:
+        logger.error("Error importing users: %s", e)
+        return jsonify({
+            'success': False,
+            'error': f'Error importing users: {str(e)}'
+        }), 500
+
 @app.route('/api/admin/users/<int:user_id>', methods=['GET'])
 @admin_required
 def get_user(user_id):
     """Get a specific user"""
-    print(f"🔍 Get user {user_id} session:", dict(session))
     try:
         current_user_role = session.get('role', 'user')
         
@@ -617,7 +767,7 @@ def get_user(user_id):
         })
         
     except Exception as e:
-        print(f"❌ Error fetching user: {str(e)}")
+        logger.error("Error fetching user: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching user: {str(e)}'
@@ -627,25 +777,22 @@ def get_user(user_id):
 @admin_required
 def update_user(user_id):
     """Update a user"""
-    print(f"🔍 Update user {user_id} session:", dict(session))
     try:
         current_user_role = session.get('role', 'user')
         data = request.json
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
         # Get existing user
-        cursor.execute('SELECT role FROM users WHERE id = ?', (user_id,))
-        existing_user = cursor.fetchone()
+        existing_user = user_cache.get_user_by_id(user_id)
         if not existing_user:
-            conn.close()
             return jsonify({
                 'success': False,
                 'error': 'User not found'
             }), 404
         
-        existing_role = existing_user[0]
+        conn = sqlite3.connect('invoices.db')
+        cursor = conn.cursor()
+        
+        existing_role = existing_user['role']
         new_role = data.get('role', existing_role)
         
         # Check permissions for both existing and new role
@@ -740,8 +887,9 @@ def update_user(user_id):
         
         conn.commit()
         conn.close()
+        user_cache.invalidate(existing_user['username'], user_id)
         
-        print(f"✅ User {user_id} updated successfully")
+        logger.info("User %s updated successfully", user_id)
         
         return jsonify({
             'success': True,
@@ -749,7 +897,7 @@ def update_user(user_id):
         })
         
     except Exception as e:
-        print(f"❌ Error updating user: {str(e)}")
+        logger.error("Error updating user: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error updating user: {str(e)}'
@@ -759,25 +907,22 @@ def update_user(user_id):
 @admin_required
 def delete_user(user_id):
     """Delete a user"""
-    print(f"🔍 Delete user {user_id} session:", dict(session))
     try:
         current_user_role = session.get('role', 'user')
         current_user_id = session.get('user_id')  # Assuming you store user_id in session
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
         # Get user to be deleted
-        cursor.execute('SELECT username, role FROM users WHERE id = ?', (user_id,))
-        user_to_delete = cursor.fetchone()
+        user_to_delete = user_cache.get_user_by_id(user_id)
         if not user_to_delete:
-            conn.close()
             return jsonify({
                 'success': False,
                 'error': 'User not found'
             }), 404
         
-        username, role = user_to_delete
+        conn = sqlite3.connect('invoices.db')
+        cursor = conn.cursor()
+        
+        username, role = user_to_delete['username'], user_to_delete['role']
         
         # Check permissions
         if not validate_user_role_permissions(current_user_role, role, 'delete'):
@@ -804,6 +949,7 @@ def delete_user(user_id):
             cursor.execute('UPDATE users SET status = ? WHERE id = ?', ('inactive', user_id))
             conn.commit()
             conn.close()
+            user_cache.invalidate(username, user_id)
             
             return jsonify({
                 'success': True,
@@ -822,8 +968,10 @@ def delete_user(user_id):
         
         conn.commit()
         conn.close()
+        user_cache.invalidate(username, user_id)
         
-        print(f"✅ User {username} (ID: {user_id}) deleted successfully")
+        logger.info("User %s (ID: %s) deleted successfully", username, user_id)
+        dashboard_snapshot.record_user_deleted(username)
         
         return jsonify({
             'success': True,
@@ -831,7 +979,7 @@ def delete_user(user_id):
         })
         
     except Exception as e:
-        print(f"❌ Error deleting user: {str(e)}")
+        logger.error("Error deleting user: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error deleting user: {str(e)}'
@@ -863,7 +1011,7 @@ def create_new_chat():
         })
         
     except Exception as e:
-        print(f"❌ Error creating new chat: {str(e)}")
+        logger.error("Error creating new chat: %s", e)
         return jsonify({'error': f'Error creating new chat: {str(e)}'}), 500
 
 
@@ -872,7 +1020,6 @@ def create_new_chat():
 
 @app.route('/api/generate_invoice_from_cart', methods=['POST'])
 def generate_invoice_from_cart():
-    print("🔍 Generate invoice session:", dict(session))
     try:
         username = validate_user_session()
         
@@ -884,58 +1031,26 @@ def generate_invoice_from_cart():
         if not session_data_local['cart']:
             return jsonify({'error': 'Cart is empty'}), 400
         
-        order = {}
-        discounts = {}
-        
-        for item_id, item in session_data_local['cart'].items():
-            product_name = item['name']
-            order[product_name] = item['quantity']
-            if item['discount'] > 0:
-                discounts[product_name] = item['discount']
-        
-        products = session_data_local['products'] if session_data_local['products'] else default_products
-        
         overall_discount = session_data_local.get('overall_discount', 0)
         
-        invoice = calculate_invoice(
-            user_order=order,
-            product_data=products,
-            discounts=discounts,
-            overall_discount=overall_discount
-        )
-        print(f"DEBUG: Invoice object before PDF generation: {invoice}")
-        print(f"DEBUG: Invoice summary before PDF generation: {invoice.get('summary')}")
+        # Cart lines are already priced by the billing engine
+        invoice = session_data_local['cart'].invoice(overall_discount)
+        logger.debug("Invoice object before PDF generation: %s", invoice)
+        logger.debug("Invoice summary before PDF generation: %s", invoice.get('summary'))
         
-        pdf_path = generate_invoice_pdf(invoice, session_data_local["client_details"], session_id)
+        # Render and save the invoice (a retry of the same invoice gets the original file and number back)
+        pdf_path, invoice_number = generate_invoice_pdf(invoice, session_data_local["client_details"], session_id,
+                                                        new_invoice_number(), username)
         
         if not pdf_path:
             return jsonify({"error": "Failed to generate invoice PDF"}), 500
         
-        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # Save invoice data to database
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            invoice_number,
-            session_data_local['client_details'].get('name', 'Walk-in Customer'),
-            invoice['summary']['grand_total'],
-            datetime.now().strftime('%Y-%m-%d'),
-            pdf_path,
-            username
-        ))
-        conn.commit()
-        conn.close()
-        
         # Create the AI response message with download link
         download_btn = f'<a href="#" class="download-invoice-btn" onclick="invoiceApp.downloadInvoice(\'{pdf_path}\')"><i class="fas fa-download"></i> Download PDF Invoice</a>'
         ai_response = f"✅ Invoice generated successfully!<br><br>📄 Invoice #: {invoice_number}<br>📋 Items: {len(session_data_local['cart'])}<br>💰 Total: ₹{invoice['summary']['grand_total']:,.2f}<br><br>{download_btn}"
         
         # Clear cart
-        session_data_local['cart'] = {}
+        session_data_local['cart'].clear()
         session_data_local['overall_discount'] = 0
         
         return jsonify({
@@ -948,40 +1063,73 @@ def generate_invoice_from_cart():
         })
         
     except Exception as e:
-        print(f"❌ Error generating invoice: {str(e)}")
+        logger.error("Error generating invoice: %s", e)
         return jsonify({'error': f'Error generating invoice: {str(e)}'}), 500
 
 @app.route('/api/download_invoice/<filename>')
 def download_invoice(filename):
-    print("🔍 Download invoice session:", dict(session))
     try:
         username = validate_user_session()
         
-        file_path = os.path.join(app.config['INVOICE_FOLDER'], filename)
-        if os.path.exists(file_path):
-            mimetype = 'application/pdf' if filename.endswith('.pdf') else 'text/html'
-            return send_file(file_path, as_attachment=True, download_name=filename, mimetype=mimetype)
-        else:
+        filename = secure_filename(filename)
+        file_path = invoice_store.locate(filename) if filename else None
+        if not file_path:
             return jsonify({'error': 'File not found'}), 404
+        
+        mimetype = 'application/pdf' if filename.endswith('.pdf') else 'text/html'
+        # The content hash recorded at save time is a strong ETag; older invoices fall back to mtime/size
+        record = db_manager.get_invoice_file(filename)
+        etag = record['file_hash'] if record and record['file_hash'] else True
+        
+        sendfile_header = app.config.get('INVOICE_SENDFILE_HEADER')
+        if sendfile_header:
+            response = offload_invoice_download(file_path, filename, mimetype, etag, sendfile_header)
+        else:
+            # send_file answers If-None-Match/If-Modified-Since with 304 and Range with 206
+            response = send_file(file_path, as_attachment=True, download_name=filename, mimetype=mimetype,
+                                 conditional=True, etag=etag, max_age=INVOICE_CACHE_MAX_AGE)
+        
+        # Invoices are per-user: cacheable by the browser, not by shared proxies
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
     except Exception as e:
-        print(f"❌ Error downloading file: {str(e)}")
+        logger.error("Error downloading file: %s", e)
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
+def offload_invoice_download(file_path, filename, mimetype, etag, sendfile_header):
+    """Empty response that tells the front web server to send the file itself"""
+    if etag is True:
+        stat = os.stat(file_path)
+        etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(mimetype=mimetype)
+        if sendfile_header.lower() == 'x-accel-redirect':
+            relative_path = os.path.relpath(file_path, os.path.abspath(invoice_store.root))
+            response.headers[sendfile_header] = app.config['INVOICE_SENDFILE_PREFIX'] + relative_path.replace(os.sep, '/')
+        else:
+            response.headers[sendfile_header] = file_path
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.set_etag(etag)
+    response.cache_control.max_age = INVOICE_CACHE_MAX_AGE
+    return response
+
 @app.route('/api/client/get', methods=['GET'])
 def get_client():
-    print("🔍 Get client session:", dict(session))
     try:
         session_id = request.headers.get('Session-ID', 'default')
         session_data_local = get_session_data(session_id)
         client = session_data_local.get('client_details', {})
         return jsonify({'client': client})
     except Exception as e:
-        print(f"❌ Error fetching client: {str(e)}")
+        logger.error("Error fetching client: %s", e)
         return jsonify({'error': f'Error fetching client: {str(e)}'}), 500
 
 @app.route('/api/client/save', methods=['POST'])
 def save_client():
-    print("🔍 Save client session:", dict(session))
     try:
         username = validate_user_session()
         
@@ -1008,12 +1156,11 @@ def save_client():
         })
         
     except Exception as e:
-        print(f"❌ Error saving client: {str(e)}")
+        logger.error("Error saving client: %s", e)
         return jsonify({'error': f'Error saving client: {str(e)}'}), 500
 
 @app.route('/api/upload_catalog', methods=['POST'])
 def upload_catalog():
-    print("🔍 Upload catalog session:", dict(session))
     try:
         username = validate_user_session()
         
@@ -1033,12 +1180,14 @@ def upload_catalog():
         
         # Save uploaded file
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Unique on disk, so concurrent uploads of the same filename don't overwrite or delete each other
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
         file.save(file_path)
         
         try:
             # Parse the uploaded file
-            products = parse_for_streamlit(file_path)
+            with metrics.stage('catalog_parse'):
+                products = parse_for_streamlit(file_path)
             
             if products:
                 # Update session products
@@ -1057,7 +1206,7 @@ def upload_catalog():
                 return jsonify({'error': 'No products found in the uploaded file'}), 400
                 
         except Exception as parse_error:
-            print(f"❌ Error parsing file: {str(parse_error)}")
+            logger.error("Error parsing file: %s", parse_error)
             return jsonify({'error': f'Error parsing file: {str(parse_error)}'}), 400
         finally:
             # Clean up uploaded file
@@ -1065,13 +1214,12 @@ def upload_catalog():
                 os.remove(file_path)
         
     except Exception as e:
-        print(f"❌ Error uploading catalog: {str(e)}")
+        logger.error("Error uploading catalog: %s", e)
         return jsonify({'error': f'Error uploading catalog: {str(e)}'}), 500
 
 @app.route('/api/update_product', methods=['PUT'])
 @admin_required
 def update_product():
-    print("🔍 Update product session:", dict(session))
     try:
         data = request.json
         session_id = request.headers.get('Session-ID', 'default')
@@ -1116,6 +1264,7 @@ def update_product():
 
         # Update the product in the list
         products[product_index] = updated_product
+        product_matchers.invalidate(products)
 
         # Save to product_data.json if using default products
         if session_data_local['catalog_source'] == 'default':
@@ -1123,6 +1272,7 @@ def update_product():
 
         # Update session products
         session_data_local['products'] = products
+        dashboard_snapshot.record_product_event('updated', updated_product['name'], len(products))
 
         return jsonify({
             'success': True,
@@ -1131,7 +1281,7 @@ def update_product():
         })
 
     except Exception as e:
-        print(f"❌ Error updating product: {str(e)}")
+        logger.error("Error updating product: %s", e)
         return jsonify({'error': f'Error updating product: {str(e)}'}), 500
 
 
@@ -1180,7 +1330,7 @@ def get_all_products():
         })
         
     except Exception as e:
-        print(f"❌ Error fetching products: {str(e)}")
+        logger.error("Error fetching products: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching products: {str(e)}',
@@ -1189,10 +1339,62 @@ def get_all_products():
         }), 500
 
 
+@app.route('/api/products/search', methods=['GET'])
+def search_products():
+    """
+    Search-as-you-type over the session's catalog: ?q= (every word must
+    start a word of the name; empty lists the catalog), limit (max 100),
+    offset and fields=name,price,... to return only those fields. When no
+    name matches, the closest misspelled names are returned (mode 'fuzzy',
+    where total counts only the suggestions up to offset + limit; fuzzy=0
+    turns this off).
+    """
+    try:
+        username = validate_user_session()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 401
+    
+    try:
+        session_id = request.headers.get('Session-ID', 'default')
+        session_data_local = get_session_data(session_id)
+        products = session_data_local['products'] if session_data_local['products'] else default_products
+
+        query = request.args.get('q', '').strip()
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+
+        with metrics.stage('catalog_lookup'):
+            rows = product_matchers.prefix(products).search(query)
+            mode = 'prefix'
+            if not len(rows) and query and request.args.get('fuzzy', '1') != '0':
+                matches = product_matchers.get(products).match(query, limit=offset + limit, threshold=SUGGEST_THRESHOLD)
+                rows = [index for index, _ in matches]
+                mode = 'fuzzy'
+
+        results = []
+        for index in rows[offset:offset + limit]:
+            product = products[int(index)]
+            results.append({field: product[field] for field in fields if field in product} if fields else product)
+
+        return jsonify({
+            'success': True,
+            'query': query,
+            'mode': mode,
+            'results': results,
+            'total': len(rows),
+            'limit': limit,
+            'offset': offset,
+            'source': session_data_local.get('catalog_source', 'default') if session_data_local['products'] else 'default'
+        })
+    except Exception as e:
+        logger.error("Error searching products: %s", e)
+        return jsonify({'success': False, 'error': f'Error searching products: {str(e)}'}), 500
+
+
 @app.route('/api/delete_product', methods=['DELETE'])
 @admin_required
 def delete_product():
-    print("🔍 Delete product session:", dict(session))
     try:
         data = request.json
         session_id = request.headers.get('Session-ID', 'default')
@@ -1217,6 +1419,7 @@ def delete_product():
 
         # Remove the product
         deleted_product = products.pop(product_index)
+        product_matchers.invalidate(products)
 
         # Save to product_data.json if using default products
         if session_data_local['catalog_source'] == 'default':
@@ -1224,6 +1427,7 @@ def delete_product():
 
         # Update session products
         session_data_local['products'] = products
+        dashboard_snapshot.record_product_event('deleted', product_name, len(products))
 
         return jsonify({
             'success': True,
@@ -1231,18 +1435,22 @@ def delete_product():
         })
 
     except Exception as e:
-        print(f"❌ Error deleting product: {str(e)}")
+        logger.error("Error deleting product: %s", e)
         return jsonify({'error': f'Error deleting product: {str(e)}'}), 500
 
 
 @app.route('/api/get_chats', methods=['GET'])
 def get_chats():
-    """Get all chats for the current user"""
+    """Get a page of chats for the current user (?limit=&cursor=)"""
     try:
         username = validate_user_session()
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
         
         # Get chats from database
-        chats = db_manager.get_user_chats(username)
+        try:
+            chats, next_cursor = db_manager.get_user_chats(username, limit, request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Format for frontend
         formatted_chats = []
@@ -1257,11 +1465,13 @@ def get_chats():
         
         return jsonify({
             'success': True,
-            'chats': formatted_chats
+            'chats': formatted_chats,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except Exception as e:
-        print(f"❌ Error fetching chats: {str(e)}")
+        logger.error("Error fetching chats: %s", e)
         return jsonify({'error': f'Error fetching chats: {str(e)}'}), 500
 
 @app.route('/api/admin/users_section')
@@ -1271,45 +1481,83 @@ def get_users_section():
     try:
         return render_template('admin_users.html')
     except Exception as e:
-        print(f"❌ Error loading users section: {str(e)}")
+        logger.error("Error loading users section: %s", e)
         return f"Error loading users section: {str(e)}", 500
 
+def get_chat_messages_page(chat_id, username):
+    """Fetch one page of a chat's messages from the ?limit=&before= query args"""
+    limit = min(max(request.args.get('limit', CHAT_PAGE_SIZE, type=int), 1), 200)
+    before_id = request.args.get('before', type=int)
+    
+    # One extra row tells whether an older page exists
+    messages = db_manager.get_chat_messages(chat_id, username, limit=limit + 1, before_id=before_id)
+    has_more = len(messages) > limit
+    messages = messages[-limit:]
+    
+    # Convert messages to expected format
+    formatted_messages = []
+    for msg in messages:
+        formatted_messages.append({
+            'id': msg['id'],
+            'role': msg['message_type'],
+            'content': msg['content'],
+            'timestamp': msg['timestamp']
+        })
+    
+    return formatted_messages, (messages[0]['id'] if has_more else None)
+
 @app.route('/api/load_chat/<chat_id>', methods=['GET'])
 def load_chat(chat_id):
-    """Load a specific chat and its messages"""
+    """Load a specific chat and its most recent messages"""
     try:
         username = validate_user_session()
         
-        # Get messages from database
-        messages = db_manager.get_chat_messages(chat_id, username)
+        # Get the newest page of messages from database
+        formatted_messages, next_before = get_chat_messages_page(chat_id, username)
         
         # Update current chat in session
         session_id = request.headers.get('Session-ID', 'default')
         session_data_local = get_session_data(session_id)
         session_data_local['current_chat_id'] = chat_id
         
-        # Convert messages to expected format
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                'role': msg['message_type'],
-                'content': msg['content'],
-                'timestamp': msg['timestamp']
-            })
-        
-        # Update conversation history in session
-        session_data_local['conversation_history'] = formatted_messages
+        # Only the tail window is kept in session memory as conversation context
+        session_data_local['conversation_history'] = [
+            {'role': msg['role'], 'content': msg['content'], 'timestamp': msg['timestamp']}
+            for msg in formatted_messages[-CONVERSATION_WINDOW:]
+        ]
         
         return jsonify({
             'success': True,
             'chat_id': chat_id,
-            'messages': formatted_messages
+            'messages': formatted_messages,
+            'next_before': next_before,
+            'has_more': next_before is not None
         })
         
     except Exception as e:
-        print(f"❌ Error loading chat: {str(e)}")
+        logger.error("Error loading chat: %s", e)
         return jsonify({'error': f'Error loading chat: {str(e)}'}), 500
 
+@app.route('/api/chat_messages/<chat_id>', methods=['GET'])
+def get_chat_messages(chat_id):
+    """Get older messages of a chat (?before=<message id>&limit=) without touching the session"""
+    try:
+        username = validate_user_session()
+        
+        formatted_messages, next_before = get_chat_messages_page(chat_id, username)
+        
+        return jsonify({
+            'success': True,
+            'chat_id': chat_id,
+            'messages': formatted_messages,
+            'next_before': next_before,
+            'has_more': next_before is not None
+        })
+        
+    except Exception as e:
+        logger.error("Error fetching chat messages: %s", e)
+        return jsonify({'error': f'Error fetching chat messages: {str(e)}'}), 500
+
 @app.route('/api/delete_chat', methods=['POST'])
 def delete_chat():
     """Delete a specific chat"""
@@ -1337,7 +1585,7 @@ def delete_chat():
             return jsonify({'error': 'Failed to delete chat'}), 500
             
     except Exception as e:
-        print(f"❌ Error deleting chat: {str(e)}")
+        logger.error("Error deleting chat: %s", e)
         return jsonify({'error': f'Error deleting chat: {str(e)}'}), 500
 
 @app.route('/api/rename_chat', methods=['POST'])
@@ -1364,7 +1612,7 @@ def rename_chat():
             return jsonify({'error': 'Failed to rename chat'}), 500
             
     except Exception as e:
-        print(f"❌ Error renaming chat: {str(e)}")
+        logger.error("Error renaming chat: %s", e)
         return jsonify({'error': f'Error renaming chat: {str(e)}'}), 500
 
 def save_message_to_db(username, chat_id, message_type, content, metadata=None):
@@ -1377,7 +1625,7 @@ def save_message_to_db(username, chat_id, message_type, content, metadata=None):
         db_manager.save_message(chat_id, username, message_type, content, metadata)
         return chat_id
     except Exception as e:
-        print(f"❌ Error saving message to DB: {str(e)}")
+        logger.error("Error saving message to DB: %s", e)
         return chat_id
     
 # Continue from Part 1...
@@ -1386,43 +1634,51 @@ def save_message_to_db(username, chat_id, message_type, content, metadata=None):
 def load_default_products():
     try:
         if os.path.exists('product_data.json'):
+            if app.config['CATALOG_SNAPSHOT']:
+                try:
+                    products = load_catalog('product_data.json', app.config['CATALOG_SNAPSHOT'])
+                    logger.info("Mapped %s products from %s", len(products), app.config['CATALOG_SNAPSHOT'])
+                    return products
+                except (OSError, ValueError) as e:
+                    logger.warning("Catalog snapshot unavailable, loading product_data.json: %s", e)
             with open('product_data.json', 'r') as f:
                 products = json.load(f)
-            print(f"✅ Loaded {len(products)} products from product_data.json")
+            logger.info("Loaded %s products from product_data.json", len(products))
             return products
         else:
-            print("⚠️ product_data.json not found")
+            logger.warning("product_data.json not found")
             return []
     except Exception as e:
-        print(f"❌ Error loading product_data.json: {e}")
+        logger.error("Error loading product_data.json: %s", e)
         return []
 
 def save_products(products):
     try:
+        products = list(products)
         with open('product_data.json', 'w') as f:
             json.dump(products, f, indent=2)
-        print(f"✅ Saved {len(products)} products to product_data.json")
+        if app.config['CATALOG_SNAPSHOT']:
+            write_snapshot(products, app.config['CATALOG_SNAPSHOT'], source=source_signature('product_data.json'))
+        logger.info("Saved %s products to product_data.json", len(products))
     except Exception as e:
-        print(f"❌ Error saving product_data.json: {e}")
+        logger.error("Error saving product_data.json: %s", e)
 
 def parse_for_streamlit(file_path):
     try:
         products = dynamic_parse_and_save(file_path, output_path=None)
         return products
     except Exception as e:
-        print(f"Error parsing for Flask: {e}")
+        logger.error("Error parsing for Flask: %s", e)
         return []
 
-# Load default products
-default_products = load_default_products()
-
 # Setup login routes
 setup_login_routes(app)
 
 # Role-based authentication decorator (unchanged)
 def admin_required(f):
     def wrap(*args, **kwargs):
-        if 'username' not in session or session.get('role') != 'admin':
+        # Check the stored role (cached) so a demoted or deleted admin loses access right away
+        if 'username' not in session or user_cache.get_role(session['username']) != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     wrap.__name__ = f.__name__  # Preserve function name for Flask
@@ -1430,7 +1686,6 @@ def admin_required(f):
 
 @app.route('/')
 def index():
-    print("🔍 Index session:", dict(session))
     if 'username' not in session:
         return redirect('/api/login')
     
@@ -1438,7 +1693,7 @@ def index():
     try:
         db_manager.update_user_login(session['username'])
     except Exception as e:
-        print(f"Error updating login time: {e}")
+        logger.error("Error updating login time: %s", e)
     
     return render_template('chat_interface.html')
 
@@ -1465,7 +1720,7 @@ def get_user_info():
         })
         
     except Exception as e:
-        print(f"❌ Error fetching user info: {str(e)}")
+        logger.error("Error fetching user info: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching user info: {str(e)}',
@@ -1487,12 +1742,10 @@ def favicon():
 @app.route('/admin')
 @admin_required
 def admin_dashboard():
-    print("🔍 Admin dashboard session:", dict(session))
     return render_template('admin_dashboard.html')
 
 @app.route('/api/status')
 def status():
-    print("🔍 Status session:", dict(session))
     try:
         gemini_status, gemini_message = test_gemini_connection()
     except:
@@ -1520,18 +1773,9 @@ def status():
 @app.route('/api/admin_dashboard_data', methods=['GET'])
 @admin_required
 def admin_dashboard_data():
-    print("🔍 Admin dashboard data session:", dict(session))
     try:
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-
-        # Total Invoices
-        cursor.execute('SELECT COUNT(*) FROM invoices')
-        total_invoices = cursor.fetchone()[0]
-
-        # Total Revenue
-        cursor.execute('SELECT SUM(amount) FROM invoices')
-        total_revenue = cursor.fetchone()[0] or 0
+        # Total Revenue and Invoices
+        total_revenue, total_invoices = db_manager.get_invoice_totals()
 
         # Active Users (mocked since we don't have user tracking yet)
         active_users = 25
@@ -1539,18 +1783,18 @@ def admin_dashboard_data():
         # Products Sold (mocked; calculate from invoice details if available)
         products_sold = 320
 
-        # Revenue Over Time (last 6 months)
-        revenue_data = []
-        labels = []
+        # Revenue Over Time (last 6 months) in one grouped query, gaps filled here
         current_date = datetime.now()
-        for i in range(5, -1, -1):
-            month_date = current_date.replace(day=1) - pd.Timedelta(days=30 * i)
-            month_start = month_date.strftime('%Y-%m-01')
-            month_end = (month_date + pd.Timedelta(days=31)).replace(day=1).strftime('%Y-%m-01')
-            cursor.execute('SELECT SUM(amount) FROM invoices WHERE date >= ? AND date < ?', (month_start, month_end))
-            month_revenue = cursor.fetchone()[0] or 0
-            revenue_data.append(month_revenue)
-            labels.append(month_date.strftime('%b'))
+        months = []
+        year, month = current_date.year, current_date.month
+        for _ in range(6):
+            months.insert(0, datetime(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        
+        monthly_totals = db_manager.get_invoice_totals_by_period(
+            months[0].strftime('%Y-%m-%d'), current_date.strftime('%Y-%m-%d'), period='month')
+        revenue_data = [monthly_totals.get(m.strftime('%Y-%m'), {}).get('revenue', 0) for m in months]
+        labels = [m.strftime('%b') for m in months]
 
         # Top Products (mocked; need invoice item details for real data)
         product_data = [
@@ -1562,6 +1806,8 @@ def admin_dashboard_data():
         ]
 
         # Recent Invoices (last 5)
+        conn = sqlite3.connect('invoices.db')
+        cursor = conn.cursor()
         cursor.execute('SELECT invoice_number, client_name, amount, date FROM invoices ORDER BY date DESC LIMIT 5')
         recent_invoices = [ 
             {'id': row[0], 'client': row[1], 'amount': row[2], 'date': row[3]}
@@ -1582,7 +1828,7 @@ def admin_dashboard_data():
         })
 
     except Exception as e:
-        print(f"❌ Error fetching admin dashboard data: {str(e)}")
+        logger.error("Error fetching admin dashboard data: %s", e)
         return jsonify({'error': f'Error fetching dashboard data: {str(e)}'}), 500
 
 @app.route('/api/check_password_change_required', methods=['POST'])
@@ -1598,18 +1844,12 @@ def check_password_change_required():
                 'error': 'Username required'
             }), 400
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT must_change_password FROM users WHERE username = ?', (username,))
-        result = cursor.fetchone()
+        user = user_cache.get_user(username)
         
-        conn.close()
-        
-        if result:
+        if user:
             return jsonify({
                 'success': True,
-                'must_change_password': bool(result[0])
+                'must_change_password': bool(user['must_change_password'])
             })
         else:
             return jsonify({
@@ -1618,7 +1858,7 @@ def check_password_change_required():
             }), 404
             
     except Exception as e:
-        print(f"❌ Error checking password change requirement: {str(e)}")
+        logger.error("Error checking password change requirement: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error checking password requirement: {str(e)}'
@@ -1651,15 +1891,10 @@ def change_password():
                 'error': 'New password must be at least 8 characters long'
             }), 400
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
         # Get current password hash
-        cursor.execute('SELECT password FROM users WHERE username = ?', (username,))
-        result = cursor.fetchone()
+        user = user_cache.get_user(username)
         
-        if not result or not verify_password(current_password, result[0]):
-            conn.close()
+        if not user or not verify_password(current_password, user['password']):
             return jsonify({
                 'success': False,
                 'error': 'Current password is incorrect'
@@ -1668,14 +1903,18 @@ def change_password():
         # Hash new password
         new_password_hash = hash_password(new_password)
         
+        conn = sqlite3.connect('invoices.db')
+        cursor = conn.cursor()
+        
         # Update password and clear must_change_password flag
         cursor.execute('''UPDATE users SET password = ?, must_change_password = 0 
                          WHERE username = ?''', (new_password_hash, username))
         
         conn.commit()
         conn.close()
+        user_cache.invalidate(username)
         
-        print(f"✅ Password changed successfully for user: {username}")
+        logger.info("Password changed successfully for user: %s", username)
         
         return jsonify({
             'success': True,
@@ -1683,7 +1922,7 @@ def change_password():
         })
         
     except Exception as e:
-        print(f"❌ Error changing password: {str(e)}")
+        logger.error("Error changing password: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error changing password: {str(e)}'
@@ -1692,7 +1931,6 @@ def change_password():
 # Updated chat endpoint with proper database integration
 @app.route('/api/chat', methods=['POST'])
 def chat_endpoint():
-    print("🔍 Chat endpoint session:", dict(session))
     try:
         username = validate_user_session()
         
@@ -1703,8 +1941,7 @@ def chat_endpoint():
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
         
-        print(f"💬 User message: {user_message}")
-        print(f"🔍 Session ID: {session_id}")
+        logger.debug("User message: %s", user_message)
         
         session_data_local = get_session_data(session_id)
         
@@ -1718,9 +1955,9 @@ def chat_endpoint():
         # Save user message to database IMMEDIATELY (only once)
         try:
             db_manager.save_message(current_chat_id, username, 'user', user_message)
-            print("✅ User message saved to database")
+            logger.debug("User message saved to database")
         except Exception as e:
-            print(f"⚠️ Error saving user message: {e}")
+            logger.warning("Error saving user message: %s", e)
         
         if session_data_local['products']:
             products = session_data_local['products']
@@ -1748,43 +1985,12 @@ def chat_endpoint():
                         'overall_discount': session_data_local['overall_discount']
                     })
                 
-                # Create order from cart
-                order = {}
-                discounts = {}
-                for item_id, item in session_data_local['cart'].items():
-                    product_name = item['name']
-                    order[product_name] = item['quantity']
-                    if item['discount'] > 0:
-                        discounts[product_name] = item['discount']
-                
-                # Calculate invoice
-                invoice = calculate_invoice(
-                    user_order=order,
-                    product_data=products,
-                    discounts=discounts,
-                    overall_discount=session_data_local.get('overall_discount', 0)
-                )
-                
-                # Generate PDF
-                pdf_path = generate_invoice_pdf(invoice, session_data_local["client_details"], session_id)
-                invoice_number = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                # Cart lines are already priced by the billing engine
+                invoice = session_data_local['cart'].invoice(session_data_local.get('overall_discount', 0))
                 
-                # Save to invoice database
-                conn = sqlite3.connect('invoices.db')
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    invoice_number,
-                    session_data_local['client_details'].get('name', 'Walk-in Customer'),
-                    invoice['summary']['grand_total'],
-                    datetime.now().strftime('%Y-%m-%d'),
-                    pdf_path,
-                    username
-                ))
-                conn.commit()
-                conn.close()
+                # Generate PDF and save the invoice (a retry of the same invoice gets the original file and number back)
+                pdf_path, invoice_number = generate_invoice_pdf(invoice, session_data_local["client_details"], session_id,
+                                                                new_invoice_number(), username)
                 
                 # Create AI response with download link
                 download_btn = f'<a href="#" class="download-invoice-btn" onclick="invoiceApp.downloadInvoice(\'{pdf_path}\')"><i class="fas fa-download"></i> Download PDF Invoice</a>'
@@ -1801,7 +2007,7 @@ def chat_endpoint():
                 db_manager.save_message(current_chat_id, username, 'ai', ai_response, invoice_metadata)
                 
                 # Clear cart
-                session_data_local['cart'] = {}
+                session_data_local['cart'].clear()
                 session_data_local['overall_discount'] = 0
                 
                 # Update session conversation history
@@ -1845,9 +2051,9 @@ def chat_endpoint():
         # For all other responses (non-invoice), save normally
         try:
             db_manager.save_message(current_chat_id, username, 'ai', response, action_data)
-            print("✅ AI response saved to database")
+            logger.debug("AI response saved to database")
         except Exception as e:
-            print(f"⚠️ Error saving AI response: {e}")
+            logger.warning("Error saving AI response: %s", e)
         
         # Update conversation history in session (for immediate use only)
         session_data_local['conversation_history'].append({
@@ -1863,9 +2069,9 @@ def chat_endpoint():
         })
         
         # Keep only recent messages in session (last 10 to reduce memory)
-        session_data_local['conversation_history'] = session_data_local['conversation_history'][-10:]
+        session_data_local['conversation_history'] = session_data_local['conversation_history'][-CONVERSATION_WINDOW:]
         
-        print(f"🛒 Cart after response: {session_data_local['cart']}")
+        logger.debug("Cart after response: %s", session_data_local['cart'])
         
         return jsonify({
             'response': response,
@@ -1879,7 +2085,7 @@ def chat_endpoint():
         })
         
     except Exception as e:
-        print(f"❌ Error processing chat: {str(e)}")
+        logger.error("Error processing chat: %s", e)
         return jsonify({'error': f'Error processing chat: {str(e)}'}), 500
 
 
@@ -1887,7 +2093,6 @@ def chat_endpoint():
 @app.route('/api/add_product', methods=['POST'])
 @admin_required
 def add_product():
-    print("🔍 Add product session:", dict(session))
     try:
         data = request.json
         session_id = request.headers.get('Session-ID', 'default')
@@ -1924,6 +2129,7 @@ def add_product():
 
         # Add new product
         products.append(new_product)
+        product_matchers.invalidate(products)
 
         # Save to product_data.json if using default products
         if session_data_local['catalog_source'] == 'default':
@@ -1931,6 +2137,7 @@ def add_product():
 
         # Update session products
         session_data_local['products'] = products
+        dashboard_snapshot.record_product_event('added', new_product['name'], len(products))
 
         return jsonify({
             'success': True,
@@ -1939,12 +2146,11 @@ def add_product():
         })
 
     except Exception as e:
-        print(f"❌ Error adding product: {str(e)}")
+        logger.error("Error adding product: %s", e)
         return jsonify({'error': f'Error adding product: {str(e)}'}), 500
 
 @app.route('/api/get_products', methods=['GET'])
 def get_products():
-    print("🔍 Get products session:", dict(session))
     try:
         # Ensure session is initialized even without login
         if 'username' not in session:
@@ -1953,55 +2159,49 @@ def get_products():
         session_id = request.headers.get('Session-ID', 'default')
         session_data_local = get_session_data(session_id)
         products = session_data_local['products'] if session_data_local['products'] else default_products
-        return jsonify({'products': products, 'count': len(products)})
+        return jsonify({'products': list(products), 'count': len(products)})
     except Exception as e:
-        print(f"❌ Error fetching products: {str(e)}")
+        logger.error("Error fetching products: %s", e)
         return jsonify({'error': f'Error fetching products: {str(e)}'}), 500
     
 # Continue from Part 2...
 
 # Keep all the existing natural language processing functions unchanged
-def process_natural_language(message, session_data, products):
-    try:
-        if not GEMINI_AVAILABLE or not model:
-            return get_fallback_response(message, session_data, products)
-        
-        cart_summary = ""
-        if session_data['cart']:
-            cart_summary = "\n\nCURRENT CART CONTENTS:\n"
-            cart_total = 0
-            for item_id, item in session_data['cart'].items():
-                discounted_price = item['unit_price'] * (1 - item['discount']/100)
-                item_total = discounted_price * item['quantity']
-                cart_total += item_total
-                cart_summary += f"- {item['name']}: {item['quantity']} units @ ₹{item['unit_price']} each"
-                if item['discount'] > 0:
-                    cart_summary += f" (with {item['discount']}% discount = ₹{discounted_price:.2f} each)"
-                cart_summary += f" = ₹{item_total:.2f}\n"
-            
-            if session_data['overall_discount'] > 0:
-                overall_discount_amount = cart_total * session_data['overall_discount'] / 100
-                cart_summary += f"\nOverall Cart Discount: {session_data['overall_discount']}% (₹{overall_discount_amount:.2f})"
-                cart_summary += f"\nCart Total after Overall Discount: ₹{cart_total - overall_discount_amount:.2f}"
-            else:
-                cart_summary += f"\nCart Total: ₹{cart_total:.2f}"
-        else:
-            cart_summary = "\n\nCURRENT CART: Empty"
-        
-        conversation_context = ""
-        if session_data['conversation_history']:
-            conversation_context = "\n\nRECENT CONVERSATION HISTORY:\n"
-            for msg in session_data['conversation_history'][-8:]:
-                role = "User" if msg['role'] == 'user' else "Assistant"
-                conversation_context += f"{role}: {msg['content'][:150]}...\n"
-        
-        product_catalog = ""
-        if products:
-            product_catalog = "\n\nAVAILABLE PRODUCTS:\n"
-            for i, product in enumerate(products, 1):
-                product_catalog += f"{i}. {product['name']} - ₹{product['price']:,.2f}\n"
-        
-        system_prompt = f"""
+@metrics.timed('prompt_build')
+def build_chat_prompt(message, session_data, products):
+    """System prompt for a chat message: cart, recent conversation, catalog and action instructions"""
+    cart_summary = ""
+    cart = session_data['cart']
+    if cart:
+        cart_summary = "\n\nCURRENT CART CONTENTS:\n"
+        summary = cart.summary(session_data['overall_discount'])
+        for line in cart:
+            cart_summary += f"- {line.name}: {line.quantity} units @ ₹{line.unit_price} each"
+            if line.discount > 0:
+                cart_summary += f" (with {line.discount}% discount = ₹{line.discounted_price:.2f} each)"
+            cart_summary += f" = ₹{line.subtotal:.2f}\n"
+        
+        cart_summary += f"\nCart Total (incl. charges and GST): ₹{summary['total_incl_gst']:.2f}"
+        if session_data['overall_discount'] > 0:
+            cart_summary += f"\nOverall Cart Discount: {session_data['overall_discount']}% (₹{summary['overall_discount_amount']:.2f})"
+            cart_summary += f"\nCart Total after Overall Discount: ₹{summary['grand_total']:.2f}"
+    else:
+        cart_summary = "\n\nCURRENT CART: Empty"
+    
+    conversation_context = ""
+    if session_data['conversation_history']:
+        conversation_context = "\n\nRECENT CONVERSATION HISTORY:\n"
+        for msg in session_data['conversation_history'][-8:]:
+            role = "User" if msg['role'] == 'user' else "Assistant"
+            conversation_context += f"{role}: {msg['content'][:150]}...\n"
+    
+    product_catalog = ""
+    if products:
+        product_catalog = "\n\nAVAILABLE PRODUCTS:\n"
+        for i, product in enumerate(products, 1):
+            product_catalog += f"{i}. {product['name']} - ₹{product['price']:,.2f}\n"
+    
+    return f"""
 You are an intelligent AI shopping assistant helping customers manage their cart and create invoices. 
 
 YOUR ROLE:
@@ -2078,11 +2278,20 @@ IMPORTANT RULES:
 - If user wants to apply discount to existing items, use APPLY_DISCOUNT action
 - For overall cart discounts, clearly explain the impact on total amount
 """
+
+def process_natural_language(message, session_data, products):
+    try:
+        model = get_llm_model()
+        if not model:
+            return get_fallback_response(message, session_data, products)
+        
+        system_prompt = build_chat_prompt(message, session_data, products)
         
-        response = model.generate_content(system_prompt)
+        with metrics.stage('llm'):
+            response = model.generate_content(system_prompt)
         response_text = response.text.strip()
         
-        print(f"🤖 AI Response: {response_text}")
+        logger.debug("AI Response: %s", response_text)
         
         action_match = re.search(r'\[ACTION:([^|]+)\|([^|]*)\|([^|]*)\|([^|]*)\]', response_text)
         
@@ -2092,7 +2301,7 @@ IMPORTANT RULES:
             param2 = action_match.group(3).strip()
             param3 = action_match.group(4).strip()
             
-            print(f"✅ Action detected: {action_type} | {param1} | {param2} | {param3}")
+            logger.debug("Action detected: %s | %s | %s | %s", action_type, param1, param2, param3)
             
             clean_response = re.sub(r'\[ACTION:[^\]]+\]', '', response_text).strip()
             
@@ -2125,29 +2334,29 @@ IMPORTANT RULES:
                     quantity = int(quantity_match.group(1)) if quantity_match else 1
                     discount = 0
                     clean_response = f"Adding {quantity} {product['name']}."
-                    print(f"✅ Fallback ADD: {product['name']} | {quantity} | {discount}")
+                    logger.debug("Fallback ADD: %s | %s | %s", product['name'], quantity, discount)
                     return execute_add_action(product['name'], str(quantity), str(discount), session_data, products, clean_response)
         elif "show cart" in message_lower or "cart breakdown" in message_lower:
             clean_response = "Here's your cart breakdown."
-            print("✅ Fallback SHOW_BREAKDOWN")
+            logger.debug("Fallback SHOW_BREAKDOWN")
             return show_cart_detailed_breakdown(session_data), {"action": "show_cart_breakdown"}
         
         clean_response = re.sub(r'\[ACTION:[^\]]+\]', '', response_text).strip()
         return clean_response, None
         
     except Exception as e:
-        print(f"❌ Error in natural language processing: {str(e)}")
+        logger.error("Error in natural language processing: %s", e)
         return get_fallback_response(message, session_data, products)
 
 def get_fallback_response(message, session_data, products):
     """Enhanced fallback response when AI is unavailable"""
     message_lower = message.lower()
     
-    print(f"🔄 Using fallback for: '{message}'")
+    logger.debug("Using fallback for: '%s'", message)
     
     # Handle ADD commands
     if any(word in message_lower for word in ['add', 'buy', 'purchase', 'get']):
-        print("🔍 Detected ADD command in fallback")
+        logger.debug("Detected ADD command in fallback")
         
         # Extract quantity
         quantity_match = re.search(r'\b(\d+)\b', message_lower)
@@ -2161,7 +2370,7 @@ def get_fallback_response(message, session_data, products):
         found_product = smart_product_search_fallback(message_lower, products)
         
         if found_product:
-            print(f"✅ Fallback found product: {found_product['name']}")
+            logger.debug("Fallback found product: %s", found_product['name'])
             clean_response = f"Adding {quantity} {found_product['name']} to cart (AI offline - using basic mode)."
             return execute_add_action(found_product['name'], str(quantity), str(discount), session_data, products, clean_response)
         else:
@@ -2171,36 +2380,36 @@ def get_fallback_response(message, session_data, products):
     
     # Handle REMOVE commands
     elif any(word in message_lower for word in ['remove', 'delete', 'take out']):
-        print("🔍 Detected REMOVE command in fallback")
+        logger.debug("Detected REMOVE command in fallback")
         
         quantity_match = re.search(r'\b(\d+)\b', message_lower)
         quantity = int(quantity_match.group(1)) if quantity_match else 1
         
         # Check cart items
-        for item_id, item in session_data['cart'].items():
-            if any(word in item['name'].lower() for word in message_lower.split()):
-                clean_response = f"Removing {quantity} {item['name']} from cart (AI offline)."
-                return execute_remove_action(item['name'], str(quantity), session_data, products, clean_response)
+        for line in session_data['cart']:
+            if any(word in line.name.lower() for word in message_lower.split()):
+                clean_response = f"Removing {quantity} {line.name} from cart (AI offline)."
+                return execute_remove_action(line.name, str(quantity), session_data, products, clean_response)
         
         return "❌ AI offline. Product not found in cart. Say 'show cart' to see current items.", None
     
     # Handle CART commands
     elif any(word in message_lower for word in ['cart', 'show cart', 'view cart']):
-        print("🔍 Detected CART command in fallback")
+        logger.debug("Detected CART command in fallback")
         return show_cart_formatted(session_data), {"action": "show_cart"}
     
     elif any(word in message_lower for word in [ 'cart breakdown', 'breakdown', 'detailed breakdown', 'detailed pricing', "show bill"]):
-        print("🔍 Detected CART command in fallback")
+        logger.debug("Detected CART command in fallback")
         return show_cart_detailed_breakdown(session_data), {"action": "show_cart_breakdown"}
     
     # Handle PRODUCTS commands
     elif any(word in message_lower for word in ['products', 'catalog', 'list products', 'show products', 'available']):
-        print("🔍 Detected PRODUCTS command in fallback")
+        logger.debug("Detected PRODUCTS command in fallback")
         return show_products_formatted(products), {"action": "show_products"}
     
     # Handle DISCOUNT commands
     elif "discount" in message_lower:
-        print("🔍 Detected DISCOUNT command in fallback")
+        logger.debug("Detected DISCOUNT command in fallback")
         
         discount_match = re.search(r'(\d+)%?\s*(discount|off)', message_lower)
         if not discount_match:
@@ -2223,7 +2432,7 @@ def get_fallback_response(message, session_data, products):
     
     # Handle INVOICE commands
     elif any(word in message_lower for word in ['invoice', 'generate invoice', 'bill', 'generate bill']):
-        print("🔍 Detected INVOICE command in fallback")
+        logger.debug("Detected INVOICE command in fallback")
         if not session_data['cart']:
             return "❌ Cart is empty. Add products before generating invoice.", None
         return process_invoice_generation(session_data), {"action": "generate_invoice"}
@@ -2247,23 +2456,32 @@ def get_fallback_response(message, session_data, products):
 💡 <strong>Tip:</strong> Use exact product names from the catalog.""", None
 
 
+@metrics.timed('catalog_lookup')
 def smart_product_search_fallback(message_lower, products):
     """Enhanced product search for fallback mode"""
-    print(f"🔍 Searching products for: '{message_lower}'")
+    logger.debug("Searching products for: '%s'", message_lower)
     
     # Remove common words that aren't product names
     common_words = {'add', 'buy', 'purchase', 'get', 'want', 'need', 'with', 'and', 'the', 'a', 'an', 'to', 'from', 'of', 'in', 'on', 'at', 'by', 'for', 'discount', 'off', 'percent', '%'}
     message_words = [word for word in message_lower.split() if word not in common_words and not word.isdigit()]
     
-    print(f"🔍 Filtered words: {message_words}")
+    logger.debug("Filtered words: %s", message_words)
     
     # Try exact name match first
     for product in products:
         product_name_lower = product['name'].lower()
         if product_name_lower in message_lower:
-            print(f"✅ Exact match found: {product['name']}")
+            logger.debug("Exact match found: %s", product['name'])
             return product
     
+    # Try fuzzy matching of the remaining words (misspelled names)
+    if message_words:
+        matches = product_matchers.get(products).match(' '.join(message_words), limit=1)
+        if matches:
+            index, score = matches[0]
+            logger.debug("Fuzzy match found: %s (score %.2f)", products[index]['name'], score)
+            return products[index]
+    
     # Try word-by-word matching
     for product in products:
         product_words = product['name'].lower().split()
@@ -2271,7 +2489,7 @@ def smart_product_search_fallback(message_lower, products):
         # Check if most product words are in the message
         matches = sum(1 for word in product_words if word in message_words)
         if matches >= len(product_words) * 0.6:  # 60% of product words must match
-            print(f"✅ Word match found: {product['name']} (matched {matches}/{len(product_words)} words)")
+            logger.debug("Word match found: %s (matched %s/%s words)", product['name'], matches, len(product_words))
             return product
     
     # Try partial matching with key words
@@ -2280,10 +2498,10 @@ def smart_product_search_fallback(message_lower, products):
         # Split into key words and check if any significant word matches
         for word in message_words:
             if len(word) > 3 and word in product_name_lower:  # Only check words longer than 3 chars
-                print(f"✅ Partial match found: {product['name']} (matched word: '{word}')")
+                logger.debug("Partial match found: %s (matched word: '%s')", product['name'], word)
                 return product
     
-    print("❌ No product match found")
+    logger.debug("No product match found")
     return None
 
 def execute_add_action(product_name, quantity_str, discount_str, session_data, products, ai_response):
@@ -2294,42 +2512,25 @@ def execute_add_action(product_name, quantity_str, discount_str, session_data, p
         if quantity <= 0:
             return f"❌ Cannot add zero or negative quantity products to cart.<br><br>💡 Please specify a positive quantity like 'add 2 {product_name}'", None
         
-        print(f"🛍️ Adding: {product_name}, Qty: {quantity}, Discount: {discount}%")
+        logger.debug("Adding: %s, Qty: %s, Discount: %s%%", product_name, quantity, discount)
         
         product = smart_product_search(product_name, products)
         if not product:
             return f"❌ I couldn't find '{product_name}' in our catalog.<br><br>📋 Available products:<br>" + "<br>".join([f"• {p['name']}" for p in products[:10]]), None
         
-        print(f"✅ Found product: {product['name']}")
+        logger.debug("Found product: %s", product['name'])
         
-        item_id = product['name']
-        if item_id in session_data['cart']:
-            existing_item = session_data['cart'][item_id]
-            existing_item['quantity'] += quantity
-            if discount > 0:
-                existing_item['discount'] = discount
-            action_text = f"Updated existing cart item: +{quantity} units"
-        else:
-            session_data['cart'][item_id] = {
-                'name': product['name'],
-                'unit_price': product['price'],
-                'quantity': quantity,
-                'discount': discount,
-                'added_time': datetime.now().isoformat(),
-                'installation_charge': product.get('Installation Charge', 0),
-                'service_charge': product.get('Service Charge', 0),
-                'shipping_charge': product.get('Shipping Charge', 0),
-                'handling_fee': product.get('Handling Fee', 0),
-                'gst_rate': product.get('gst_rate', 18)
-            }
-            action_text = "Added new item to cart"
+        line, is_new = session_data['cart'].add(product, quantity, discount)
+        action_text = "Added new item to cart" if is_new else f"Updated existing cart item: +{quantity} units"
         
-        print(f"✅ {action_text} | Cart: {session_data['cart']}")
+        cart_add_counter.add(product['name'])
         
-        final_discount = session_data['cart'][item_id]['discount']
-        discounted_price = product['price'] * (1 - final_discount/100)
-        total_quantity = session_data['cart'][item_id]['quantity']
-        simple_total = discounted_price * total_quantity
+        logger.debug("%s | Cart: %s", action_text, session_data['cart'])
+        
+        final_discount = line.discount
+        discounted_price = line.discounted_price
+        total_quantity = line.quantity
+        simple_total = line.subtotal
         
         response_lines = [ai_response if ai_response else "✅ Added to cart!"]
         response_lines.extend([
@@ -2370,7 +2571,7 @@ def execute_add_action(product_name, quantity_str, discount_str, session_data, p
         }
         
     except Exception as e:
-        print(f"❌ Error executing add action: {str(e)}")
+        logger.error("Error executing add action: %s", e)
         return f"❌ Error adding product: {str(e)}", None
 
 
@@ -2381,19 +2582,19 @@ def execute_remove_action(product_name, quantity_str, session_data, products, ai
     try:
         quantity = int(quantity_str) if quantity_str and quantity_str.isdigit() else 1
         
-        for item_id, item in list(session_data['cart'].items()):
-            if product_name.lower() in item['name'].lower():
-                if quantity >= item['quantity']:
-                    del session_data['cart'][item_id]
-                    return f"{ai_response}<br><br>✅ Removed all {item['name']} from cart<br>🛒 Cart now has {len(session_data['cart'])} items", {"action": "remove_from_cart"}
+        cart = session_data['cart']
+        for line in cart:
+            if product_name.lower() in line.name.lower():
+                remaining = cart.remove(line.name, quantity)
+                if remaining is None:
+                    return f"{ai_response}<br><br>✅ Removed all {line.name} from cart<br>🛒 Cart now has {len(cart)} items", {"action": "remove_from_cart"}
                 else:
-                    item['quantity'] -= quantity
-                    return f"{ai_response}<br><br>✅ Removed {quantity}x {item['name']}<br>🔢 {item['quantity']} remaining<br>🛒 Cart has {len(session_data['cart'])} items", {"action": "remove_from_cart"}
+                    return f"{ai_response}<br><br>✅ Removed {quantity}x {line.name}<br>🔢 {remaining.quantity} remaining<br>🛒 Cart has {len(cart)} items", {"action": "remove_from_cart"}
         
         return f"{ai_response}<br><br>❌ Couldn't find '{product_name}' in your cart", None
         
     except Exception as e:
-        print(f"❌ Error removing product: {str(e)}")
+        logger.error("Error removing product: %s", e)
         return f"❌ Error removing product: {str(e)}", None
 
 def execute_apply_discount_action(product_name, discount_str, session_data, ai_response):
@@ -2403,52 +2604,36 @@ def execute_apply_discount_action(product_name, discount_str, session_data, ai_r
         if discount < 0 or discount > 100:
             return f"❌ Invalid discount percentage. Please use a value between 0 and 100.", None
         
-        cart_item = None
-        item_key = None
-        
-        for key, item in session_data['cart'].items():
-            if product_name.lower() == item['name'].lower():
-                cart_item = item
-                item_key = key
-                break
+        cart = session_data['cart']
+        cart_item = cart.find(product_name)
         
         if not cart_item:
-            for key, item in session_data['cart'].items():
-                if product_name.lower() in item['name'].lower():
-                    cart_item = item
-                    item_key = key
-                    break
+            return f"❌ I couldn't find '{product_name}' in your cart.<br><br>🛒 Current cart items:<br>" + "<br>".join([f"• {line.name}" for line in cart]), None
         
-        if not cart_item:
-            return f"❌ I couldn't find '{product_name}' in your cart.<br><br>🛒 Current cart items:<br>" + "<br>".join([f"• {item['name']}" for item in session_data['cart'].values()]), None
-        
-        old_discount = cart_item['discount']
-        cart_item['discount'] = discount
-        
-        discounted_price = cart_item['unit_price'] * (1 - discount/100)
-        item_total = discounted_price * cart_item['quantity']
+        old_discount = cart_item.discount
+        cart.set_discount(cart_item.name, discount)
         
         response_lines = [ai_response if ai_response else "✅ Discount applied!"]
         response_lines.extend([
             "",
-            f"📦 {cart_item['name']}",
+            f"📦 {cart_item.name}",
             f"🏷️ Discount updated: {old_discount}% → {discount}%",
-            f"💰 Original Price: ₹{cart_item['unit_price']:,.2f} each",
-            f"💸 New Price: ₹{discounted_price:,.2f} each",
-            f"🔢 Quantity: {cart_item['quantity']} units",
-            f"💳 New Item Total: ₹{item_total:,.2f}",
+            f"💰 Original Price: ₹{cart_item.unit_price:,.2f} each",
+            f"💸 New Price: ₹{cart_item.discounted_price:,.2f} each",
+            f"🔢 Quantity: {cart_item.quantity} units",
+            f"💳 New Item Total: ₹{cart_item.subtotal:,.2f}",
             "",
             "📋 Say 'show cart' to see updated cart"
         ])
         
         return "<br>".join(response_lines), {
             "action": "apply_discount",
-            "product": cart_item['name'],
+            "product": cart_item.name,
             "discount": discount
         }
         
     except Exception as e:
-        print(f"❌ Error applying discount: {str(e)}")
+        logger.error("Error applying discount: %s", e)
         return f"❌ Error applying discount: {str(e)}", None
 
 def execute_update_discount_action(product_name, discount_str, session_data, ai_response):
@@ -2464,26 +2649,19 @@ def execute_overall_discount_action(discount_str, session_data, ai_response):
         if not session_data['cart']:
             return f"❌ Cannot apply overall discount - your cart is empty!<br><br>🛒 Add some products first.", None
         
-        cart_subtotal = 0
-        for item_id, item in session_data['cart'].items():
-            discounted_price = item['unit_price'] * (1 - item['discount']/100)
-            item_total = discounted_price * item['quantity']
-            cart_subtotal += item_total
+        summary = session_data['cart'].summary(discount)
         
         old_discount = session_data['overall_discount']
         session_data['overall_discount'] = discount
         
-        new_discount_amount = cart_subtotal * discount / 100
-        new_total = cart_subtotal - new_discount_amount
-        
         response_lines = [ai_response if ai_response else "✅ Overall cart discount applied!"]
         response_lines.extend([
             "",
             f"🛒 Cart Items: {len(session_data['cart'])} different products",
-            f"💰 Cart Subtotal: ₹{cart_subtotal:,.2f}",
+            f"💰 Cart Total (incl. charges and GST): ₹{summary['total_incl_gst']:,.2f}",
             f"🏷️ Overall Discount: {discount}%",
-            f"💸 Discount Amount: ₹{new_discount_amount:,.2f}",
-            f"💳 New Cart Total: ₹{new_total:,.2f}",
+            f"💸 Discount Amount: ₹{summary['overall_discount_amount']:,.2f}",
+            f"💳 New Cart Total: ₹{summary['grand_total']:,.2f}",
             "",
             "💡 This discount applies to the entire cart total",
             "📋 Say 'show cart breakdown' for detailed pricing",
@@ -2496,7 +2674,7 @@ def execute_overall_discount_action(discount_str, session_data, ai_response):
         }
         
     except Exception as e:
-        print(f"❌ Error applying overall discount: {str(e)}")
+        logger.error("Error applying overall discount: %s", e)
         return f"❌ Error applying overall discount: {str(e)}", None
 
 def execute_clear_overall_discount_action(session_data, ai_response):
@@ -2504,11 +2682,7 @@ def execute_clear_overall_discount_action(session_data, ai_response):
         if session_data['overall_discount'] == 0:
             return f"💡 No overall discount is currently applied to your cart.", None
         
-        cart_subtotal = 0
-        for item_id, item in session_data['cart'].items():
-            discounted_price = item['unit_price'] * (1 - item['discount']/100)
-            item_total = discounted_price * item['quantity']
-            cart_subtotal += item_total
+        cart_total = session_data['cart'].total
         
         old_discount = session_data['overall_discount']
         
@@ -2519,7 +2693,7 @@ def execute_clear_overall_discount_action(session_data, ai_response):
             "",
             f"🛒 Cart Items: {len(session_data['cart'])} different products",
             f"🏷️ Overall Discount: {old_discount}% → 0%",
-            f"💳 New Cart Total: ₹{cart_subtotal:,.2f}",
+            f"💳 New Cart Total: ₹{cart_total:,.2f}",
             "",
             "💡 Individual item discounts are still applied",
             "📋 Say 'show cart' to see updated totals"
@@ -2530,7 +2704,7 @@ def execute_clear_overall_discount_action(session_data, ai_response):
         }
         
     except Exception as e:
-        print(f"❌ Error clearing overall discount: {str(e)}")
+        logger.error("Error clearing overall discount: %s", e)
         return f"❌ Error clearing overall discount: {str(e)}", None
 
 def show_products_formatted(products):
@@ -2553,77 +2727,47 @@ def show_cart_detailed_breakdown(session_data):
     if not session_data['cart']:
         return "🛒 Your cart is empty<br><br>💡 Try adding some products first!"
     
-    lines = [f"🛒 Detailed Cart Breakdown ({len(session_data['cart'])} items)", ""]
-    
-    subtotal = 0
-    total_installation = 0
-    total_service = 0
-    total_shipping = 0
-    total_handling = 0
-    total_gst = 0
-    grand_total = 0
+    cart = session_data['cart']
+    lines = [f"🛒 Detailed Cart Breakdown ({len(cart)} items)", ""]
     
-    for i, (item_id, item) in enumerate(session_data['cart'].items(), 1):
-        qty = item['quantity']
-        base_price = item['unit_price']
-        discount = item['discount']
-        
-        installation = item.get('installation_charge', 0)
-        service = item.get('service_charge', 0)
-        shipping = item.get('shipping_charge', 0)
-        handling = item.get('handling_fee', 0)
-        gst_rate = item.get('gst_rate', 18)
+    for i, line in enumerate(cart, 1):
+        qty = line.quantity
         
-        discounted_price = base_price * (1 - discount/100)
-        item_subtotal = discounted_price * qty
-        
-        item_installation = installation * qty
-        item_service = service * qty
-        item_shipping = shipping * qty
-        item_handling = handling * qty
-        
-        item_gst = (item_subtotal * gst_rate / 100)
-        
-        item_total = item_subtotal + item_installation + item_service + item_shipping + item_handling + item_gst
-        
-        subtotal += item_subtotal
-        total_installation += item_installation
-        total_service += item_service
-        total_shipping += item_shipping
-        total_handling += item_handling
-        total_gst += item_gst
-        grand_total += item_total
-        
-        lines.append(f"{i}. {item['name']}")
+        lines.append(f"{i}. {line.name}")
         lines.append(f"   📦 Quantity: {qty} units")
-        lines.append(f"   💰 Base Price: ₹{base_price:,.2f} each")
+        lines.append(f"   💰 Base Price: ₹{line.unit_price:,.2f} each")
         
-        if discount > 0:
-            lines.append(f"   🏷️ Discount: {discount}%")
-            lines.append(f"   💸 Discounted Price: ₹{discounted_price:,.2f} each")
+        if line.discount > 0:
+            lines.append(f"   🏷️ Discount: {line.discount}%")
+            lines.append(f"   💸 Discounted Price: ₹{line.discounted_price:,.2f} each")
         
         lines.append(f"   📊 Price Breakdown:")
-        lines.append(f"      • Product Subtotal: ₹{item_subtotal:,.2f}")
-        
-        if item_installation > 0:
-            lines.append(f"      • Installation (₹{installation:,.2f} × {qty}): ₹{item_installation:,.2f}")
-        if item_service > 0:
-            lines.append(f"      • Service (₹{service:,.2f} × {qty}): ₹{item_service:,.2f}")
-        if item_shipping > 0:
-            lines.append(f"      • Shipping (₹{shipping:,.2f} × {qty}): ₹{item_shipping:,.2f}")
-        if item_handling > 0:
-            lines.append(f"      • Handling (₹{handling:,.2f} × {qty}): ₹{item_handling:,.2f}")
-        
-        lines.append(f"      • GST ({gst_rate}%): ₹{item_gst:,.2f}")
-        lines.append(f"      • Item Total: ₹{item_total:,.2f}")
+        lines.append(f"      • Product Subtotal: ₹{line.subtotal:,.2f}")
+        
+        if line.installation > 0:
+            lines.append(f"      • Installation (₹{line.installation_charge:,.2f} × {qty}): ₹{line.installation:,.2f}")
+        if line.service > 0:
+            lines.append(f"      • Service (₹{line.service_charge:,.2f} × {qty}): ₹{line.service:,.2f}")
+        if line.shipping > 0:
+            lines.append(f"      • Shipping (₹{line.shipping_charge:,.2f} × {qty}): ₹{line.shipping:,.2f}")
+        if line.handling > 0:
+            lines.append(f"      • Handling (₹{line.handling_fee:,.2f} × {qty}): ₹{line.handling:,.2f}")
+        
+        lines.append(f"      • GST ({line.gst_rate}%): ₹{line.gst:,.2f}")
+        lines.append(f"      • Item Total: ₹{line.total:,.2f}")
         lines.append("")
     
-    overall_discount_amount = 0
-    final_grand_total = grand_total
-    
-    if session_data['overall_discount'] > 0:
-        overall_discount_amount = grand_total * session_data['overall_discount'] / 100
-        final_grand_total = grand_total - overall_discount_amount
+    # Same summary the invoice will carry, from the cart's running totals
+    summary = cart.summary(session_data['overall_discount'])
+    subtotal = summary['subtotal']
+    total_installation = summary['total_installation']
+    total_service = summary['total_service']
+    total_shipping = summary['total_shipping']
+    total_handling = summary['total_handling']
+    total_gst = summary['total_gst']
+    grand_total = summary['total_incl_gst']
+    overall_discount_amount = summary['overall_discount_amount']
+    final_grand_total = summary['grand_total']
     
     lines.extend([
         f"📊 Cart Totals:",
@@ -2660,129 +2804,130 @@ def process_invoice_generation(session_data):
         if not client_details.get('name'):
             return "❌ Client details are missing. Please provide client information first.<br><br>💡 Say 'set client name to [name]' or 'update client details'", None
         
-        invoice_items = []
-        for item_id, item in session_data['cart'].items():
-            discounted_price = item['unit_price'] * (1 - item['discount']/100)
-            invoice_items.append({
-                'name': item['name'],
-                'quantity': item['quantity'],
-                'unit_price': item['unit_price'],
-                'discount': item['discount'],
-                'discounted_price': discounted_price,
-                'installation_charge': item.get('installation_charge', 0),
-                'service_charge': item.get('service_charge', 0),
-                'shipping_charge': item.get('shipping_charge', 0),
-                'handling_fee': item.get('handling_fee', 0),
-                'gst_rate': item.get('gst_rate', 18)
-            })
-        
-        invoice_data = calculate_invoice(invoice_items, session_data['overall_discount'])
-        invoice_number = f"INV-{uuid.uuid4().hex[:8].upper()}"
-        invoice_date = datetime.now().strftime('%Y-%m-%d')
+        # A preview has no invoice number: numbers are issued when the invoice is generated and saved
+        invoice_data = session_data['cart'].invoice(session_data['overall_discount'])
         
-        invoice_summary = generate_invoice_summary(
-            invoice_items=invoice_items,
-            client_details=client_details,
-            invoice_number=invoice_number,
-            invoice_date=invoice_date,
-            overall_discount=session_data['overall_discount']
-        )
-        
-        return f"✅ Invoice ready for generation!<br><br>📄 Invoice #: {invoice_number}<br>📋 Items: {len(invoice_items)}<br>💰 Total: ₹{invoice_data.get('grand_total', 0):,.2f}<br><br>💡 Say 'generate invoice from cart' to create PDF", {
+        return f"✅ Invoice ready for generation!<br><br>📋 Items: {len(invoice_data['items'])}<br>💰 Total: ₹{invoice_data['summary']['grand_total']:,.2f}<br><br>💡 Say 'generate invoice from cart' to create PDF and get the invoice number", {
             "action": "show_invoice_preview",
-            "invoice_number": invoice_number,
             "invoice_data": invoice_data
         }
         
     except Exception as e:
-        print(f"❌ Error generating invoice: {str(e)}")
+        logger.error("Error generating invoice: %s", e)
         return f"❌ Error generating invoice: {str(e)}", None
 
 # Add these additional functions that might be needed
-def generate_invoice_pdf(invoice, client_details, session_id):
-    try:
-        with open(os.path.join(os.path.dirname(__file__), 'invoice_template.html'), 'r') as f:
+def load_invoice_template():
+    """Compiled invoice template and a hash of its source, reloaded only when the file changes"""
+    path = os.path.join(os.path.dirname(__file__), 'invoice_template.html')
+    mtime = os.path.getmtime(path)
+    if invoice_template_cache.get('mtime') != mtime:
+        with open(path, 'r') as f:
             template_content = f.read()
-        
-        template = Template(template_content)
-        
-        seller = {
-            'name': 'Zencia AI',
-            'address': 'Sachivalaya Metro Station, Lucknow Uttar Pradesh 226001',
-            'phone': '1234567890',
-            'gstin': '14556789012345',
-        }
-        
-        # Enhanced client details with proper fallbacks
-        client = {
-            'name': client_details.get('name', 'Walk-in Customer'),
-            'address': client_details.get('address', 'Address not provided'),
-            'gst_number': client_details.get('gst_number', 'GST not provided'),
-            'place_of_supply': client_details.get('place_of_supply', 'Place of supply not specified'),
-            'phone': client_details.get('phone', 'Phone not provided'),
-            'email': client_details.get('email', 'Email not provided')
-        }
-        
-        # Project name with fallback
-        project_name = client_details.get('project_name', 'General Purchase')
-        
-        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        invoice_date = datetime.now().strftime('%d/%m/%Y')
-        
-        print(f"DEBUG: Invoice object in generate_invoice_pdf: {invoice}")
-        print(f"DEBUG: Invoice summary in generate_invoice_pdf: {invoice.get('summary')}")
-        html_content = template.render(
-            invoice=invoice,
-            seller=seller,
-            client=client,
-            project_name=project_name,
-            invoice_number=invoice_number,
-            invoice_date=invoice_date,
-            supplier_ref='',
-            other_ref='',
-            amount_in_words=number_to_words(invoice['summary']['grand_total']),
-            tax_in_words=number_to_words(invoice['summary']['total_gst'])
+        invoice_template_cache.update(
+            mtime=mtime,
+            template=Template(template_content),
+            version=hashlib.sha1(template_content.encode('utf-8')).hexdigest()
         )
-        
-        options = {
-            'page-size': 'A4',
-            'margin-top': '0.5in',
-            'margin-right': '0.5in',
-            'margin-bottom': '0.5in',
-            'margin-left': '0.5in',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': None,
-            'print-media-type': None,
-            'enable-smart-shrinking': True # Added to improve rendering
-        }
-        
-        pdf_filename = f"invoice_{invoice_number}.pdf"
-        pdf_path = os.path.join(app.config['INVOICE_FOLDER'], pdf_filename)
-        
+    return invoice_template_cache['template'], invoice_template_cache['version']
+
+def generate_invoice_pdf(invoice, client_details, session_id, invoice_number, username):
+    """
+    Render the invoice as invoice_number and save its record (line items and
+    sales rollups included); returns (filename, invoice number).
+
+    A double-click (the same cart sent again from the session while it is
+    rendering) waits for that render and returns its file and number,
+    saving nothing. Nothing is reused once the render is done: the cart is
+    cleared by then, so the same order sent again is a new invoice.
+    """
+    seller = {
+        'name': 'Zencia AI',
+        'address': 'Sachivalaya Metro Station, Lucknow Uttar Pradesh 226001',
+        'phone': '1234567890',
+        'gstin': '14556789012345',
+    }
+    
+    # Enhanced client details with proper fallbacks
+    client = {
+        'name': client_details.get('name', 'Walk-in Customer'),
+        'address': client_details.get('address', 'Address not provided'),
+        'gst_number': client_details.get('gst_number', 'GST not provided'),
+        'place_of_supply': client_details.get('place_of_supply', 'Place of supply not specified'),
+        'phone': client_details.get('phone', 'Phone not provided'),
+        'email': client_details.get('email', 'Email not provided')
+    }
+    
+    # Project name with fallback
+    project_name = client_details.get('project_name', 'General Purchase')
+    
+    def render_and_record():
         try:
-            pdfkit.from_string(html_content, pdf_path, options=options)
-            print(f"✅ PDF generated successfully: {pdf_filename}")
-            return pdf_filename
-        except Exception as pdf_error:
-            print(f"❌ PDF generation error: {pdf_error}")
-            # Fallback to generating HTML if PDF generation fails
-            html_filename = f"invoice_{invoice_number}.html"
-            html_path = os.path.join(app.config["INVOICE_FOLDER"], html_filename)
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            print(f"⚠️ Generated HTML instead of PDF: {html_filename}")
-            return html_filename
-        
-    except Exception as e:
-        print(f"❌ Error generating invoice: {str(e)}")
-        # If all else fails, return a default HTML filename or raise an error
-        # For now, let's return a generic HTML filename to avoid 'null'
-        fallback_html_filename = f"invoice_error_{datetime.now().strftime('%Y%m%d%H%M%S')}.html"
-        fallback_html_path = os.path.join(app.config["INVOICE_FOLDER"], fallback_html_filename)
-        with open(fallback_html_path, "w", encoding="utf-8") as f:
-            f.write("<h1>Error generating invoice</h1><p>" + str(e) + "</p>")
-        return fallback_html_filename
+            template, _ = load_invoice_template()
+            filename = render_invoice_file(template, invoice, seller, client, project_name, invoice_number)
+        except Exception as e:
+            logger.error("Error generating invoice: %s", e)
+            # Keep an error page as the invoice file so the sale is still recorded
+            filename = f"invoice_error_{datetime.now().strftime('%Y%m%d%H%M%S')}.html"
+            with open(invoice_store.path_for(filename), "w", encoding="utf-8") as f:
+                f.write("<h1>Error generating invoice</h1><p>" + str(e) + "</p>")
+        # Saved once, by the request that rendered; a failure here reaches every waiting request
+        save_invoice_record(invoice_number, client['name'], invoice, filename, username)
+        return filename, invoice_number
+    
+    render_key = canonical_hash(session_id, username, invoice, client, project_name)
+    return invoice_render_cache.get_or_render(render_key, render_and_record, store=False)
+
+@metrics.timed('invoice_render')
+def render_invoice_file(template, invoice, seller, client, project_name, invoice_number):
+    """Render the invoice to a PDF (or HTML if wkhtmltopdf fails) in the invoice store; returns the filename"""
+    invoice_date = datetime.now().strftime('%d/%m/%Y')
+    
+    logger.debug("Invoice object in generate_invoice_pdf: %s", invoice)
+    logger.debug("Invoice summary in generate_invoice_pdf: %s", invoice.get('summary'))
+    html_content = template.render(
+        invoice=invoice,
+        seller=seller,
+        client=client,
+        project_name=project_name,
+        invoice_number=invoice_number,
+        invoice_date=invoice_date,
+        supplier_ref='',
+        other_ref='',
+        amount_in_words=number_to_words(invoice['summary']['grand_total']),
+        tax_in_words=number_to_words(invoice['summary']['total_gst'])
+    )
+    
+    options = {
+        'page-size': 'A4',
+        'margin-top': '0.5in',
+        'margin-right': '0.5in',
+        'margin-bottom': '0.5in',
+        'margin-left': '0.5in',
+        'encoding': "UTF-8",
+        'no-outline': None,
+        'enable-local-file-access': None,
+        'print-media-type': None,
+        'enable-smart-shrinking': True # Added to improve rendering
+    }
+    
+    pdf_filename = f"invoice_{invoice_number}.pdf"
+    pdf_path = invoice_store.path_for(pdf_filename)
+    
+    try:
+        import pdfkit
+        pdfkit.from_string(html_content, pdf_path, options=options)
+        logger.info("PDF generated successfully: %s", pdf_filename)
+        return pdf_filename
+    except Exception as pdf_error:
+        logger.error("PDF generation error: %s", pdf_error)
+        # Fallback to generating HTML if PDF generation fails
+        html_filename = f"invoice_{invoice_number}.html"
+        html_path = invoice_store.path_for(html_filename)
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        logger.warning("Generated HTML instead of PDF: %s", html_filename)
+        return html_filename
     
 def number_to_words(number):
     try:
@@ -2791,11 +2936,13 @@ def number_to_words(number):
     except ImportError:
         return f"Rupees {int(number)} Only"
 
+@metrics.timed('catalog_lookup')
 def smart_product_search(product_name, products):
+    """Exact name, else the best trigram match (catches misspellings), else the first name containing it"""
+    index = product_matchers.get(products).best(product_name)
+    if index is not None:
+        return products[index]
     product_name = product_name.lower().strip()
-    for product in products:
-        if product_name == product['name'].lower():
-            return product
     for product in products:
         if product_name in product['name'].lower():
             return product
@@ -2806,45 +2953,36 @@ def show_cart_formatted(session_data):
     if not session_data['cart']:
         return "🛒 Your cart is empty<br><br>💡 Try adding some products! Say something like 'I want 2 cameras' or 'add 3 doorbells with 15% discount'"
     
-    lines = [f"🛒 Your Shopping Cart ({len(session_data['cart'])} items)", ""]
-    subtotal = 0
+    cart = session_data['cart']
+    lines = [f"🛒 Your Shopping Cart ({len(cart)} items)", ""]
     
-    for i, (item_id, item) in enumerate(session_data['cart'].items(), 1):
-        discounted_price = item['unit_price'] * (1 - item['discount']/100)
-        item_subtotal = discounted_price * item['quantity']
-        subtotal += item_subtotal
+    for i, line in enumerate(cart, 1):
+        lines.append(f"{i}. {line.name}")
+        lines.append(f"   • Quantity: {line.quantity} units")
+        lines.append(f"   • Price: ₹{line.unit_price:,.2f} each")
         
-        lines.append(f"{i}. {item['name']}")
-        lines.append(f"   • Quantity: {item['quantity']} units")
-        lines.append(f"   • Price: ₹{item['unit_price']:,.2f} each")
+        if line.discount > 0:
+            lines.append(f"   • Discount: {line.discount}%")
+            lines.append(f"   • Discounted Price: ₹{line.discounted_price:,.2f} each")
         
-        if item['discount'] > 0:
-            lines.append(f"   • Discount: {item['discount']}%")
-            lines.append(f"   • Discounted Price: ₹{discounted_price:,.2f} each")
-        
-        lines.append(f"   • Subtotal: ₹{item_subtotal:,.2f}")
+        lines.append(f"   • Subtotal: ₹{line.subtotal:,.2f}")
         lines.append("")
     
-    overall_discount_amount = 0
-    final_total = subtotal
-    
-    if session_data['overall_discount'] > 0:
-        overall_discount_amount = subtotal * session_data['overall_discount'] / 100
-        final_total = subtotal - overall_discount_amount
+    # Same summary the invoice will carry; the overall discount applies to the total with charges and GST
+    summary = cart.summary(session_data['overall_discount'])
     
     lines.extend([
-        f"💰 Cart Subtotal: ₹{subtotal:,.2f}"
+        f"💰 Cart Subtotal: ₹{summary['subtotal']:,.2f}",
+        f"🧾 Total with charges and GST: ₹{summary['total_incl_gst']:,.2f}"
     ])
     
     if session_data['overall_discount'] > 0:
         lines.extend([
-            f"🏷️ Overall Cart Discount ({session_data['overall_discount']}%): -₹{overall_discount_amount:,.2f}",
-            f"💳 Cart Total after Discount: ₹{final_total:,.2f}"
+            f"🏷️ Overall Cart Discount ({session_data['overall_discount']}%): -₹{summary['overall_discount_amount']:,.2f}",
+            f"💳 Cart Total after Discount: ₹{summary['grand_total']:,.2f}"
         ])
     
     lines.extend([
-        "",
-        "💡 Additional charges (installation, service, GST, etc.) will be added during checkout",
         "",
         "🏷️ Say 'apply 10% discount to [product]' to add discounts to existing items",
         "🏷️ Say 'add 25% discount to cart' to apply overall discount to entire cart",
@@ -2871,116 +3009,68 @@ def enhanced_dashboard_data():
             'timestamp': datetime.now().isoformat()
         }
         
-        # Connect to database
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
-        # Get total revenue
-        cursor.execute('SELECT SUM(amount) FROM invoices WHERE username = ? OR ? = "admin"', 
-                      (username, username))
-        total_revenue = cursor.fetchone()[0] or 0
+        # Metrics are served from the in-memory snapshot, not SQLite
+        snapshot = dashboard_snapshot.get_metrics(get_invoice_scope(username))
         
-        # Get total invoices
-        cursor.execute('SELECT COUNT(*) FROM invoices WHERE username = ? OR ? = "admin"', 
-                      (username, username))
-        total_invoices = cursor.fetchone()[0] or 0
+        # Get total revenue and invoices
+        total_revenue = snapshot['total_revenue']
+        total_invoices = snapshot['total_invoices']
         
         # Get total products
         products_count = len(default_products)
         
         # Get total users (admin only)
         if session.get('role') == 'admin':
-            # Create users table if it doesn't exist
-            cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )''')
-            
-            cursor.execute('SELECT COUNT(*) FROM users')
-            total_users = cursor.fetchone()[0] or 0
+            total_users = snapshot['total_users']
+            users_growth = snapshot['users_growth']
         else:
             total_users = 1  # Just the current user
+            users_growth = 0.0
         
-        # Calculate growth percentages (mock data for demo)
+        # Growth compares the last 30 days with the 30 days before (users: total now against 30 days ago)
         dashboard_data['metrics'] = {
             'total_revenue': total_revenue,
-            'revenue_growth': round(random.uniform(5.0, 15.0), 1),
+            'revenue_growth': snapshot['revenue_growth'],
             'total_orders': total_invoices,
-            'orders_growth': round(random.uniform(3.0, 12.0), 1),
+            'orders_growth': snapshot['orders_growth'],
             'total_products': products_count,
             'products_growth': 0.0,  # Products don't change often
             'total_users': total_users,
-            'users_growth': round(random.uniform(1.0, 8.0), 1)
+            'users_growth': users_growth
         }
         
-        # Generate revenue chart data (last 30 days)
-        revenue_data = []
-        labels = []
-        
-        for i in range(29, -1, -1):
-            date = datetime.now() - timedelta(days=i)
-            labels.append(date.strftime('%Y-%m-%d'))
-            
-            # Get actual revenue for this date
-            cursor.execute('''SELECT SUM(amount) FROM invoices 
-                            WHERE date = ? AND (username = ? OR ? = "admin")''', 
-                          (date.strftime('%Y-%m-%d'), username, username))
-            daily_revenue = cursor.fetchone()[0] or 0
-            
-            # Add some randomness if no data
-            if daily_revenue == 0:
-                daily_revenue = random.randint(1000, 15000)
-            
-            revenue_data.append(daily_revenue)
-        
-        dashboard_data['charts']['revenue'] = {
-            'labels': labels,
-            'data': revenue_data
-        }
+        # Revenue chart data (last 30 days)
+        dashboard_data['charts']['revenue'] = snapshot['revenue_chart']
         
         # Get top products data
         top_products = []
-        for i, product in enumerate(default_products[:5]):
+        for product in snapshot['top_products']:
+            name = product['name']
             top_products.append({
-                'name': product['name'][:20] + ('...' if len(product['name']) > 20 else ''),
-                'sales': random.randint(10, 100),
-                'revenue': product['price'] * random.randint(1, 20)
+                'name': name[:20] + ('...' if len(name) > 20 else ''),
+                'sales': product['units_sold'],
+                'revenue': product['revenue']
             })
         
         dashboard_data['charts']['top_products'] = top_products
         
-        # Generate recent activity
-        activities = [
-            {'icon': 'fas fa-user-plus', 'text': 'New user registered', 'time': '2 minutes ago'},
-            {'icon': 'fas fa-shopping-cart', 'text': 'New order placed', 'time': '5 minutes ago'},
-            {'icon': 'fas fa-box', 'text': 'Product added to catalog', 'time': '10 minutes ago'},
-            {'icon': 'fas fa-file-invoice-dollar', 'text': 'Invoice generated', 'time': '15 minutes ago'},
-            {'icon': 'fas fa-edit', 'text': 'Product updated', 'time': '20 minutes ago'}
-        ]
-        
-        dashboard_data['activity'] = activities[:5]  # Latest 5 activities
+        # Recent activity recorded by the snapshot events
+        dashboard_data['activity'] = snapshot['activity']
         
         # Generate alerts (low stock, pending orders, etc.)
         alerts = []
         
-        # Check for low stock products
-        low_stock_products = [p for p in default_products if p.get('stock', 0) < 10]
-        if low_stock_products:
+        # Check for low stock products (only the stock column is read)
+        low_stock_count = sum(1 for stock in catalog_column(default_products, 'stock', 0) if stock < 10)
+        if low_stock_count:
             alerts.append({
                 'type': 'warning',
-                'message': f'{len(low_stock_products)} products have low stock',
+                'message': f'{low_stock_count} products have low stock',
                 'action': 'View Products'
             })
         
         # Check for recent invoices
-        cursor.execute('''SELECT COUNT(*) FROM invoices 
-                         WHERE date >= ? AND (username = ? OR ? = "admin")''', 
-                      (datetime.now().strftime('%Y-%m-%d'), username, username))
-        today_invoices = cursor.fetchone()[0] or 0
+        today_invoices = snapshot['today_orders']
         
         if today_invoices > 0:
             alerts.append({
@@ -2991,15 +3081,13 @@ def enhanced_dashboard_data():
         
         dashboard_data['alerts'] = alerts
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'data': dashboard_data
         })
         
     except Exception as e:
-        print(f"❌ Error fetching enhanced dashboard data: {str(e)}")
+        logger.error("Error fetching enhanced dashboard data: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching dashboard data: {str(e)}'
@@ -3012,23 +3100,30 @@ def products_analytics():
     try:
         username = session.get('username')
         
+        # Sales figures come from the per-product rollup maintained by save_invoice
+        cart_add_counter.flush()
+        product_sales = db_manager.get_product_sales()
+        
         # Get products with enhanced analytics
         products_analytics = []
         
         for product in default_products:
-            # Mock analytics data
+            sales = product_sales.get(product['name'], {})
+            cart_adds = sales.get('cart_adds', 0)
+            order_count = sales.get('order_count', 0)
+            
             analytics = {
                 'name': product['name'],
                 'price': product['price'],
                 'stock': product.get('stock', 0),
-                'total_sales': random.randint(1, 50),
-                'revenue_generated': product['price'] * random.randint(1, 20),
-                'profit_margin': round(random.uniform(15.0, 35.0), 1),
-                'category': 'Electronics',  # Default category
+                'total_sales': sales.get('units_sold', 0),
+                'revenue_generated': round(sales.get('revenue', 0), 2),
+                'profit_margin': None,  # No cost data in the catalog
+                'category': product.get('category', 'Electronics'),
                 'status': 'active' if product.get('stock', 0) > 0 else 'out_of_stock',
-                'last_updated': datetime.now().isoformat(),
-                'views': random.randint(50, 500),
-                'conversion_rate': round(random.uniform(2.0, 15.0), 1)
+                'last_updated': sales.get('last_sold_at'),
+                'cart_adds': cart_adds,
+                'conversion_rate': round(order_count / cart_adds * 100, 1) if cart_adds else 0.0
             }
             
             products_analytics.append(analytics)
@@ -3046,7 +3141,7 @@ def products_analytics():
         })
         
     except Exception as e:
-        print(f"❌ Error fetching products analytics: {str(e)}")
+        logger.error("Error fetching products analytics: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching products analytics: {str(e)}'
@@ -3072,43 +3167,15 @@ def sales_analytics():
         else:
             days = 30
         
-        # Connect to database
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
-        # Get sales data for the timeframe
-        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        scope = get_invoice_scope(username)
         
-        cursor.execute('''SELECT date, SUM(amount), COUNT(*) 
-                         FROM invoices 
-                         WHERE date >= ? AND (username = ? OR ? = "admin")
-                         GROUP BY date 
-                         ORDER BY date''', 
-                      (start_date, username, username))
-        
-        sales_data = cursor.fetchall()
+        # Get sales data for the timeframe in one grouped query
+        labels = [(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days - 1, -1, -1)]
+        sales_by_date = db_manager.get_invoice_totals_by_period(labels[0], labels[-1], 'day', scope)
         
         # Fill in missing dates with zero values
-        sales_by_date = {}
-        for row in sales_data:
-            sales_by_date[row[0]] = {'revenue': row[1], 'orders': row[2]}
-        
-        # Generate complete dataset
-        labels = []
-        revenue_data = []
-        orders_data = []
-        
-        for i in range(days - 1, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            labels.append(date)
-            
-            if date in sales_by_date:
-                revenue_data.append(sales_by_date[date]['revenue'])
-                orders_data.append(sales_by_date[date]['orders'])
-            else:
-                # Add some mock data for demo
-                revenue_data.append(random.randint(0, 5000))
-                orders_data.append(random.randint(0, 10))
+        revenue_data = [sales_by_date[date]['revenue'] if date in sales_by_date else 0 for date in labels]
+        orders_data = [sales_by_date[date]['invoice_count'] if date in sales_by_date else 0 for date in labels]
         
         # Calculate summary statistics
         total_revenue = sum(revenue_data)
@@ -3116,23 +3183,13 @@ def sales_analytics():
         avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
         
         # Calculate growth (compare with previous period)
-        prev_start_date = (datetime.now() - timedelta(days=days*2)).strftime('%Y-%m-%d')
+        prev_start_date = (datetime.now() - timedelta(days=days * 2 - 1)).strftime('%Y-%m-%d')
         prev_end_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        
-        cursor.execute('''SELECT SUM(amount), COUNT(*) 
-                         FROM invoices 
-                         WHERE date >= ? AND date < ? AND (username = ? OR ? = "admin")''', 
-                      (prev_start_date, prev_end_date, username, username))
-        
-        prev_data = cursor.fetchone()
-        prev_revenue = prev_data[0] or 0
-        prev_orders = prev_data[1] or 0
+        prev_revenue, prev_orders = db_manager.get_invoice_totals(prev_start_date, prev_end_date, scope)
         
         revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
         orders_growth = ((total_orders - prev_orders) / prev_orders * 100) if prev_orders > 0 else 0
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'timeframe': timeframe,
@@ -3151,7 +3208,7 @@ def sales_analytics():
         })
         
     except Exception as e:
-        print(f"❌ Error fetching sales analytics: {str(e)}")
+        logger.error("Error fetching sales analytics: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching sales analytics: {str(e)}'
@@ -3168,30 +3225,14 @@ def user_analytics():
         conn = sqlite3.connect('invoices.db')
         cursor = conn.cursor()
         
-        # Ensure users table exists
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL DEFAULT 'user',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )''')
-        
-        # Get user statistics
-        cursor.execute('SELECT COUNT(*) FROM users')
-        total_users = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "admin"')
-        admin_users = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "user"')
-        regular_users = cursor.fetchone()[0] or 0
-        
-        # Get recent registrations (last 30 days)
+        # Get user statistics in a single pass
         thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
-        cursor.execute('SELECT COUNT(*) FROM users WHERE created_at >= ?', (thirty_days_ago,))
-        recent_registrations = cursor.fetchone()[0] or 0
+        cursor.execute('''SELECT COUNT(*),
+                                 COALESCE(SUM(role = 'admin'), 0),
+                                 COALESCE(SUM(role = 'user'), 0),
+                                 COALESCE(SUM(created_at >= ?), 0)
+                          FROM users''', (thirty_days_ago,))
+        total_users, admin_users, regular_users, recent_registrations = cursor.fetchone()
         
         # Get user activity data
         cursor.execute('''SELECT username, last_login 
@@ -3200,16 +3241,13 @@ def user_analytics():
                          LIMIT 10''')
         recent_activity = cursor.fetchall()
         
-        # Generate user growth data (last 30 days)
-        growth_data = []
-        for i in range(29, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(created_at) = ?', (date,))
-            daily_registrations = cursor.fetchone()[0] or 0
-            growth_data.append(daily_registrations)
-        
         conn.close()
         
+        # Generate user growth data (last 30 days) from one grouped range query
+        dates = [(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(29, -1, -1)]
+        registrations = db_manager.get_user_registrations_by_day(dates[0])
+        growth_data = [registrations.get(date, 0) for date in dates]
+        
         return jsonify({
             'success': True,
             'summary': {
@@ -3217,7 +3255,8 @@ def user_analytics():
                 'admin_users': admin_users,
                 'regular_users': regular_users,
                 'recent_registrations': recent_registrations,
-                'growth_rate': round(random.uniform(5.0, 15.0), 1)  # Mock growth rate
+                # Total users now against 30 days ago
+                'growth_rate': growth_percent(total_users, total_users - recent_registrations)
             },
             'growth_data': growth_data,
             'recent_activity': [
@@ -3233,7 +3272,7 @@ def user_analytics():
         })
         
     except Exception as e:
-        print(f"❌ Error fetching user analytics: {str(e)}")
+        logger.error("Error fetching user analytics: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error fetching user analytics: {str(e)}'
@@ -3242,27 +3281,16 @@ def user_analytics():
 @app.route('/api/system_health', methods=['GET'])
 @admin_required
 def system_health():
-    """Get system health metrics"""
+    """Get system health metrics from the background sampler"""
     try:
-        import psutil
-        import os
-        
-        # Get system metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        # Get database size
-        db_size = 0
-        try:
-            db_size = os.path.getsize('invoices.db') / (1024 * 1024)  # Size in MB
-        except:
-            pass
+        sample = system_sampler.latest()
+        cpu_percent = sample['cpu_usage'] or 0
+        memory_percent = sample['memory_usage'] or 0
         
         # Check API health
         api_status = {
-            'gemini_ai': GEMINI_AVAILABLE,
-            'database': True,  # Assume healthy if we got this far
+            'gemini_ai': llm_configured(),
+            'database': os.path.exists(db_manager.db_path),
             'file_system': os.access('.', os.W_OK),
             'uploads_dir': os.path.exists(app.config['UPLOAD_FOLDER'])
         }
@@ -3270,168 +3298,262 @@ def system_health():
         # Calculate overall health score
         health_score = sum([
             50 if cpu_percent < 80 else 20 if cpu_percent < 90 else 10,
-            30 if memory.percent < 80 else 15 if memory.percent < 90 else 5,
+            30 if memory_percent < 80 else 15 if memory_percent < 90 else 5,
             20 if all(api_status.values()) else 10
         ])
         
+        history_limit = request.args.get('history', 60, type=int)
+        
         return jsonify({
             'success': True,
             'health_score': health_score,
             'status': 'healthy' if health_score > 80 else 'warning' if health_score > 60 else 'critical',
             'metrics': {
-                'cpu_usage': round(cpu_percent, 1),
-                'memory_usage': round(memory.percent, 1),
-                'disk_usage': round(disk.percent, 1),
-                'database_size': round(db_size, 2),
-                'uptime': '24h 35m',  # Mock uptime
-                'active_sessions': len(session_data)
+                'cpu_usage': sample['cpu_usage'],
+                'memory_usage': sample['memory_usage'],
+                'disk_usage': sample['disk_usage'],
+                'database_size': sample['database_size'],
+                'uptime': system_sampler.uptime(),
+                'uptime_seconds': int(system_sampler.uptime_seconds()),
+                'active_sessions': sample['active_sessions'],
+                'request_rate': sample['request_rate'],
+                'sampled_at': sample['timestamp']
+            },
+            'history': {
+                'interval_seconds': system_sampler.interval,
+                'timestamps': system_sampler.history('timestamp', history_limit),
+                'cpu_usage': system_sampler.history('cpu_usage', history_limit),
+                'memory_usage': system_sampler.history('memory_usage', history_limit),
+                'request_rate': system_sampler.history('request_rate', history_limit),
+                'active_sessions': system_sampler.history('active_sessions', history_limit)
             },
+            'psutil_available': PSUTIL_AVAILABLE,
+            'startup': startup_profile.as_dict(),
+            'invoice_render_cache': invoice_render_cache.stats(),
             'api_status': api_status,
             'timestamp': datetime.now().isoformat()
         })
         
-    except ImportError:
-        # Fallback if psutil not available
-        return jsonify({
-            'success': True,
-            'health_score': 85,
-            'status': 'healthy',
-            'metrics': {
-                'cpu_usage': 45.2,
-                'memory_usage': 62.8,
-                'disk_usage': 34.1,
-                'database_size': 2.5,
-                'uptime': '24h 35m',
-                'active_sessions': len(session_data)
-            },
-            'api_status': {
-                'gemini_ai': GEMINI_AVAILABLE,
-                'database': True,
-                'file_system': True,
-                'uploads_dir': True
-            },
-            'timestamp': datetime.now().isoformat()
-        })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': f'Error fetching system health: {str(e)}'
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of stage timings, DB operations, requests and caches"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (METRICS_ENABLED=0)'}), 404
+    token = app.config['METRICS_TOKEN']
+    if token and not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+@admin_required
+def profiler_settings():
+    """Profiler status, or switch it on ({enabled, duration_seconds, endpoints, mode, sample_rate}) / off"""
+    try:
+        if request.method == 'POST':
+            data = request.json or {}
+            if data.get('enabled', True):
+                request_profiler.enable(
+                    duration_seconds=data.get('duration_seconds'),
+                    endpoints=data.get('endpoints'),
+                    mode=data.get('mode'),
+                    sample_rate=data.get('sample_rate')
+                )
+            else:
+                request_profiler.disable()
+                if 'sample_rate' in data:
+                    request_profiler.sample_rate = float(data['sample_rate'])
+        return jsonify({'success': True, 'profiler': request_profiler.status()})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Stored request profiles, newest first"""
+    profiles = request_profiler.list()
+    return jsonify({'success': True, 'profiles': profiles, 'count': len(profiles)})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    """Profile file (.prof for pstats/snakeviz, collapsed stacks for flame graphs); ?format=text for a pstats report"""
+    try:
+        record = request_profiler.get(profile_id)
+        if not record or not os.path.exists(request_profiler.path(record)):
+            return jsonify({'error': 'Profile not found'}), 404
+        if request.args.get('format') == 'text' and record['mode'] == 'cprofile':
+            return Response(request_profiler.text_report(record), mimetype='text/plain')
+        return send_file(os.path.abspath(request_profiler.path(record)), as_attachment=True,
+                         download_name=record['filename'])
+    except Exception as e:
+        logger.error("Error downloading profile: %s", e)
+        return jsonify({'error': f'Error downloading profile: {str(e)}'}), 500
+
+@app.route('/api/admin/memory', methods=['GET'])
+@admin_required
+def memory_report():
+    """Bytes per session (?top= largest), per catalog snapshot, and process RSS"""
+    try:
+        top = max(1, min(request.args.get('top', 10, type=int), 100))
+        shared = [billing_engine, default_products]
+        return jsonify({
+            'success': True,
+            'process': process_memory(),
+            'sessions': session_report(session_data, shared=shared, top=top),
+            'catalogs': catalog_report({'default': default_products}, session_data),
+            'tracemalloc': memory_snapshots.status(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error("Error building memory report: %s", e)
+        return jsonify({'error': f'Error building memory report: {str(e)}'}), 500
+
+@app.route('/api/admin/memory/tracemalloc', methods=['GET', 'POST'])
+@admin_required
+def memory_tracemalloc():
+    """tracemalloc status, or {action: start (with frames) | snapshot | stop}"""
+    try:
+        snapshot_id = None
+        if request.method == 'POST':
+            data = request.json or {}
+            action = data.get('action')
+            if action == 'start':
+                memory_snapshots.start(max(1, min(int(data.get('frames', 1)), 50)))
+            elif action == 'snapshot':
+                snapshot_id = memory_snapshots.take()
+            elif action == 'stop':
+                memory_snapshots.stop()
+            else:
+                return jsonify({'error': "action must be 'start', 'snapshot' or 'stop'"}), 400
+        return jsonify({'success': True, 'snapshot_id': snapshot_id, 'tracemalloc': memory_snapshots.status()})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/admin/memory/tracemalloc/diff', methods=['GET'])
+@admin_required
+def memory_tracemalloc_diff():
+    """Allocation growth between two snapshots (?from=&to=), or from one to now; ?key=lineno|filename|traceback"""
+    older_id = request.args.get('from')
+    if not older_id:
+        return jsonify({'error': 'from is required'}), 400
+    try:
+        diff = memory_snapshots.diff(older_id, request.args.get('to'), key_type=request.args.get('key', 'lineno'),
+                                     limit=max(1, min(request.args.get('limit', 20, type=int), 200)))
+        return jsonify({'success': True, 'diff': diff})
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/export_data', methods=['POST'])
 @admin_required
 def export_data():
-    """Export dashboard data in various formats"""
+    """Export dashboard data in various formats to a server-side file"""
     try:
-        data = request.json
+        data = request.json or {}
         export_type = data.get('type', 'csv')  # csv, xlsx, json
         data_category = data.get('category', 'all')  # products, invoices, users, all
         
-        username = session.get('username')
-        
-        # Prepare data based on category
-        export_data = {}
-        
-        if data_category in ['products', 'all']:
-            export_data['products'] = default_products
-        
-        if data_category in ['invoices', 'all']:
-            conn = sqlite3.connect('invoices.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''SELECT * FROM invoices 
-                             WHERE username = ? OR ? = "admin"
-                             ORDER BY date DESC''', 
-                          (username, username))
-            
-            columns = [description[0] for description in cursor.description]
-            invoices = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            export_data['invoices'] = invoices
-            
-            conn.close()
+        if export_type not in EXPORT_TYPES or data_category not in EXPORT_CATEGORIES:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported export: type={export_type}, category={data_category}'
+            }), 400
         
-        if data_category in ['users', 'all'] and session.get('role') == 'admin':
-            conn = sqlite3.connect('invoices.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT username, role, created_at, last_login FROM users')
-            users = [dict(zip(['username', 'role', 'created_at', 'last_login'], row)) 
-                    for row in cursor.fetchall()]
-            export_data['users'] = users
-            
-            conn.close()
+        username = get_invoice_scope(session.get('username'))
+        job = export_manager.create_job(export_type, data_category)
         
-        # Generate export file
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'dashboard_export_{data_category}_{timestamp}'
+        # Large exports can run in the background and be polled for progress
+        if data.get('background'):
+            export_manager.start_export(job, username, default_products)
+            return jsonify({
+                'success': True,
+                **job.to_dict(),
+                'status_url': f'/api/export_status/{job.job_id}'
+            }), 202
         
-        if export_type == 'json':
-            import json
-            file_content = json.dumps(export_data, indent=2, default=str)
-            filename += '.json'
-            
-        elif export_type == 'csv':
-            import csv
-            import io
-            
-            output = io.StringIO()
-            
-            # Export each category as separate sections
-            for category, items in export_data.items():
-                if not items:
-                    continue
-                    
-                output.write(f"\n{category.upper()}\n")
-                output.write("=" * 50 + "\n")
-                
-                if isinstance(items[0], dict):
-                    fieldnames = items[0].keys()
-                    writer = csv.DictWriter(output, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(items)
-                
-                output.write("\n")
-            
-            file_content = output.getvalue()
-            filename += '.csv'
-            
-        elif export_type == 'xlsx':
-            try:
-                import pandas as pd
-                import io
-                
-                output = io.BytesIO()
-                
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    for category, items in export_data.items():
-                        if items:
-                            df = pd.DataFrame(items)
-                            df.to_excel(writer, sheet_name=category.capitalize(), index=False)
-                
-                file_content = output.getvalue()
-                filename += '.xlsx'
-                
-            except ImportError:
-                return jsonify({
-                    'success': False,
-                    'error': 'Excel export requires pandas and openpyxl packages'
-                }), 400
+        export_manager.run_export(job, username, default_products)
+        if job.status != 'completed':
+            return jsonify({
+                'success': False,
+                'error': f'Error exporting data: {job.error}'
+            }), 500
         
         return jsonify({
             'success': True,
-            'filename': filename,
-            'download_url': f'/api/download_export/{filename}',
-            'file_size': len(file_content) if isinstance(file_content, str) else len(file_content),
-            'records_exported': sum(len(items) for items in export_data.values())
+            'job_id': job.job_id,
+            'filename': job.filename,
+            'download_url': f'/api/download_export/{job.filename}',
+            'file_size': job.file_size,
+            'records_exported': job.rows_written
         })
         
     except Exception as e:
-        print(f"❌ Error exporting data: {str(e)}")
+        logger.error("Error exporting data: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error exporting data: {str(e)}'
         }), 500
 
+@app.route('/api/export_status/<job_id>')
+@admin_required
+def export_status(job_id):
+    """Get the progress of an export"""
+    job = export_manager.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Export not found'}), 404
+    return jsonify({'success': True, **job.to_dict()})
+
+@app.route('/api/download_export/<filename>')
+@admin_required
+def download_export(filename):
+    """Download a finished export file"""
+    try:
+        filename = secure_filename(filename)
+        file_path = export_manager.export_path(filename)
+        
+        if not filename or not os.path.isfile(file_path):
+            return jsonify({'success': False, 'error': 'Export file not found'}), 404
+        
+        # send_file streams the file from disk and supports conditional/range requests
+        return send_file(os.path.abspath(file_path), as_attachment=True, download_name=filename, conditional=True)
+        
+    except Exception as e:
+        logger.error("Error downloading export: %s", e)
+        return jsonify({
+            'success': False,
+            'error': f'Error downloading export: {str(e)}'
+        }), 500
+
+@app.route('/api/export_stream')
+@admin_required
+def export_stream():
+    """Stream a csv/json export directly as a chunked response"""
+    export_type = request.args.get('type', 'csv')
+    data_category = request.args.get('category', 'all')
+    
+    if export_type not in ('csv', 'json') or data_category not in EXPORT_CATEGORIES:
+        return jsonify({
+            'success': False,
+            'error': 'Streaming supports csv or json exports only'
+        }), 400
+    
+    username = get_invoice_scope(session.get('username'))
+    filename = export_manager.build_filename(export_type, data_category)
+    mimetype = 'text/csv' if export_type == 'csv' else 'application/json'
+    
+    return Response(
+        stream_with_context(export_manager.stream_export(export_type, data_category, username, default_products)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/bulk_product_operations', methods=['POST'])
 @admin_required
 def bulk_product_operations():
@@ -3478,7 +3600,7 @@ def bulk_product_operations():
                 elif operation == 'update_price':
                     new_price = float(parameters.get('price', 0))
                     if new_price > 0:
-                        products[product_index]['price'] = new_price
+                        products[product_index] = dict(products[product_index], price=new_price)
                         updated_count += 1
                     else:
                         errors.append(f"Invalid price for '{product_name}'")
@@ -3486,7 +3608,7 @@ def bulk_product_operations():
                 elif operation == 'update_stock':
                     new_stock = int(parameters.get('stock', 0))
                     if new_stock >= 0:
-                        products[product_index]['stock'] = new_stock
+                        products[product_index] = dict(products[product_index], stock=new_stock)
                         updated_count += 1
                     else:
                         errors.append(f"Invalid stock for '{product_name}'")
@@ -3494,7 +3616,7 @@ def bulk_product_operations():
                 elif operation == 'update_category':
                     new_category = parameters.get('category', '')
                     if new_category:
-                        products[product_index]['category'] = new_category
+                        products[product_index] = dict(products[product_index], category=new_category)
                         updated_count += 1
                     else:
                         errors.append(f"Invalid category for '{product_name}'")
@@ -3502,10 +3624,15 @@ def bulk_product_operations():
             except Exception as e:
                 errors.append(f"Error processing '{product_name}': {str(e)}")
         
+        product_matchers.invalidate(products)
+
         # Save updated products
         if session_data_local['catalog_source'] == 'default':
             save_products(products)
         session_data_local['products'] = products
+        if updated_count:
+            dashboard_snapshot.record_product_event(
+                'deleted' if operation == 'delete' else 'updated', f'batch ({updated_count})', len(products))
         
         return jsonify({
             'success': True,
@@ -3517,7 +3644,7 @@ def bulk_product_operations():
         })
         
     except Exception as e:
-        print(f"❌ Error in bulk operations: {str(e)}")
+        logger.error("Error in bulk operations: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error in bulk operations: {str(e)}'
@@ -3574,7 +3701,7 @@ def dashboard_settings():
             })
             
     except Exception as e:
-        print(f"❌ Error handling dashboard settings: {str(e)}")
+        logger.error("Error handling dashboard settings: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error handling dashboard settings: {str(e)}'
@@ -3587,32 +3714,11 @@ def real_time_updates():
     try:
         username = session.get('username')
         
-        # Get latest data
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        
-        # Get today's statistics
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        cursor.execute('''SELECT COUNT(*), SUM(amount) 
-                         FROM invoices 
-                         WHERE date = ? AND (username = ? OR ? = "admin")''', 
-                      (today, username, username))
-        
-        today_stats = cursor.fetchone()
-        today_orders = today_stats[0] or 0
-        today_revenue = today_stats[1] or 0
-        
-        # Get latest invoice
-        cursor.execute('''SELECT invoice_number, client_name, amount, date 
-                         FROM invoices 
-                         WHERE username = ? OR ? = "admin"
-                         ORDER BY id DESC LIMIT 1''', 
-                      (username, username))
-        
-        latest_invoice = cursor.fetchone()
-        
-        conn.close()
+        # Served from the in-memory snapshot; pushed to 'dashboard_updates' on change
+        snapshot = dashboard_snapshot.get_metrics(get_invoice_scope(username))
+        today_orders = snapshot['today_orders']
+        today_revenue = snapshot['today_revenue']
+        latest_invoice = snapshot['latest_invoice']
         
         # Prepare updates
         updates = {
@@ -3620,10 +3726,10 @@ def real_time_updates():
             'today_orders': today_orders,
             'today_revenue': today_revenue,
             'latest_invoice': {
-                'number': latest_invoice[0] if latest_invoice else None,
-                'client': latest_invoice[1] if latest_invoice else None,
-                'amount': latest_invoice[2] if latest_invoice else None,
-                'date': latest_invoice[3] if latest_invoice else None
+                'number': latest_invoice['invoice_number'],
+                'client': latest_invoice['client_name'],
+                'amount': latest_invoice['amount'],
+                'date': latest_invoice['date']
             } if latest_invoice else None,
             'system_status': {
                 'api_healthy': True,
@@ -3647,7 +3753,7 @@ def real_time_updates():
         })
         
     except Exception as e:
-        print(f"❌ Error getting real-time updates: {str(e)}")
+        logger.error("Error getting real-time updates: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error getting real-time updates: {str(e)}'
@@ -3680,8 +3786,11 @@ try:
         """Helper function to broadcast dashboard updates"""
         socketio.emit('dashboard_update', data, room='dashboard_updates')
     
+    # Push snapshot deltas to subscribed dashboards
+    dashboard_snapshot.subscribe(broadcast_dashboard_update)
+    
 except ImportError:
-    print("⚠️ Flask-SocketIO not available. Real-time WebSocket updates disabled.")
+    logger.warning("Flask-SocketIO not available. Real-time WebSocket updates disabled.")
     socketio = None
     
     def broadcast_dashboard_update(data):
@@ -3751,7 +3860,7 @@ def logout():
     try:
         # Log the logout attempt
         username = session.get('username', 'Unknown')
-        print(f"🚪 Logout attempt for user: {username}")
+        logger.info("Logout attempt for user: %s", username)
         
         # Clear all session data
         session.clear()
@@ -3760,7 +3869,7 @@ def logout():
         session_id = request.headers.get('Session-ID')
         if session_id and session_id in session_data:
             session_data[session_id] = {
-                'cart': {},
+                'cart': Cart(billing_engine),
                 'client_details': {},
                 'conversation_history': [],
                 'products': [],
@@ -3769,7 +3878,7 @@ def logout():
                 'current_chat_id': None
             }
         
-        print(f"✅ Successful logout for user: {username}")
+        logger.info("Successful logout for user: %s", username)
         
         return jsonify({
             'success': True,
@@ -3777,7 +3886,7 @@ def logout():
         })
         
     except Exception as e:
-        print(f"❌ Error during logout: {str(e)}")
+        logger.error("Error during logout: %s", e)
         # Even if there's an error, we should still return success for security
         session.clear()
         return jsonify({
@@ -3787,17 +3896,21 @@ def logout():
 
 
 
+startup_profile.mark('routes and socketio')
+startup_profile.report()
+
 # Continue with the remaining supporting functions and the main execution block
 if __name__ == '__main__':
     # Run database initialization and migration
-    print("🚀 Starting AI Invoice Assistant...")
-    
+    logger.info("Starting AI Invoice Assistant...")
+    if db_manager.get_schema_version() < SCHEMA_VERSION:
+        db_manager.init_database()
    
 
     # Run with or without SocketIO depending on availability
     if socketio:
-        print("✅ Running with WebSocket support for real-time updates")
+        logger.info("Running with WebSocket support for real-time updates")
         socketio.run(app, debug=True, host='0.0.0.0', port=5000)
     else:
-        print("⚠️ Running without WebSocket support")
+        logger.warning("Running without WebSocket support")
         app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
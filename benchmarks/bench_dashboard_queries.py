@@ -0,0 +1,140 @@
+"""
+Dashboard analytics query benchmark.
+
+Builds a synthetic invoices database (1M invoices by default) and compares the
+old per-day/per-month query loops with the single GROUP BY range queries used
+by the dashboard endpoints.
+
+    python benchmarks/bench_dashboard_queries.py --invoices 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+
+def build_database(db_path, invoice_count, user_count=200, days=730, seed=42):
+    """Populate a fresh database with synthetic invoices and users"""
+    db = DatabaseManager(db_path)
+    rng = random.Random(seed)
+    today = datetime.now()
+    usernames = [f"user{i}" for i in range(user_count)] + ['admin']
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.executemany(
+        'INSERT OR IGNORE INTO users (username, password, role, created_at) VALUES (?, ?, ?, ?)',
+        [(name, 'x', 'user', (today - timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d %H:%M:%S'))
+         for name in usernames])
+
+    batch = []
+    for i in range(invoice_count):
+        batch.append((
+            f"INV-BENCH-{i}",
+            f"Client {rng.randrange(5000)}",
+            round(rng.uniform(500, 50000), 2),
+            (today - timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d'),
+            f"invoice_INV-BENCH-{i}.pdf",
+            rng.choice(usernames)
+        ))
+        if len(batch) == 50000:
+            cursor.executemany('INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username) '
+                               'VALUES (?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        cursor.executemany('INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username) '
+                           'VALUES (?, ?, ?, ?, ?, ?)', batch)
+    conn.commit()
+    cursor.execute('ANALYZE')
+    conn.close()
+    return db
+
+
+def legacy_daily_revenue(db_path, username):
+    """The previous 30-queries-per-request loop"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    data = []
+    for i in range(29, -1, -1):
+        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+        cursor.execute('''SELECT SUM(amount) FROM invoices
+                        WHERE date = ? AND (username = ? OR ? = "admin")''', (date, username, username))
+        data.append(cursor.fetchone()[0] or 0)
+    conn.close()
+    return data
+
+
+def grouped_daily_revenue(db, username):
+    labels = [(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(29, -1, -1)]
+    totals = db.get_invoice_totals_by_period(labels[0], labels[-1], 'day', None if username == 'admin' else username)
+    return [totals[d]['revenue'] if d in totals else 0 for d in labels]
+
+
+def legacy_registrations(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    data = []
+    for i in range(29, -1, -1):
+        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+        cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(created_at) = ?', (date,))
+        data.append(cursor.fetchone()[0] or 0)
+    conn.close()
+    return data
+
+
+def grouped_registrations(db):
+    dates = [(datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(29, -1, -1)]
+    registrations = db.get_user_registrations_by_day(dates[0])
+    return [registrations.get(d, 0) for d in dates]
+
+
+def timed(fn, *args, repeat=5):
+    """Return (best seconds, result) over several runs"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invoices', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench_invoices.db')
+        print(f"🔨 Building database with {args.invoices:,} invoices...")
+        start = time.perf_counter()
+        db = build_database(db_path, args.invoices)
+        print(f"   built in {time.perf_counter() - start:.1f}s")
+
+        cases = [
+            ('daily revenue (admin)', legacy_daily_revenue, (db_path, 'admin'), grouped_daily_revenue, (db, 'admin')),
+            ('daily revenue (user)', legacy_daily_revenue, (db_path, 'user7'), grouped_daily_revenue, (db, 'user7')),
+            ('user registrations', legacy_registrations, (db_path,), grouped_registrations, (db,)),
+        ]
+
+        print(f"\n{'query':<24}{'legacy ms':>12}{'grouped ms':>12}{'speedup':>10}")
+        for name, legacy_fn, legacy_args, new_fn, new_args in cases:
+            legacy_time, legacy_result = timed(legacy_fn, *legacy_args, repeat=args.repeat)
+            new_time, new_result = timed(new_fn, *new_args, repeat=args.repeat)
+            assert [round(v, 2) for v in legacy_result] == [round(v, 2) for v in new_result], name
+            print(f"{name:<24}{legacy_time * 1000:>12.2f}{new_time * 1000:>12.2f}{legacy_time / new_time:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
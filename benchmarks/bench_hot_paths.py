@@ -0,0 +1,445 @@
+"""
+Hot-path benchmark suite.
+
+Times the code that runs on every chat message and invoice against synthetic
+catalogs (1k / 100k / 1M products by default) and synthetic orders:
+
+  billing          billing_dynamic.calculate_invoice, billing_engine.Catalog
+  lookup           billing_dynamic.find_product, app0.smart_product_search,
+                   product_matcher.FuzzyMatcher (index build, misspelled names), PrefixIndex.search
+  parsing          dynamic_parse_and_save on CSV and xlsx uploads
+  prompt           app0.build_chat_prompt (prompt assembly in process_natural_language)
+  render           app0.render_invoice_file (PDF, or the HTML fallback without wkhtmltopdf)
+  chat_db          DatabaseManager chat writes and reads
+
+Everything runs in a temporary directory with a fixed seed. Results are
+written as JSON (one record per benchmark and size, with min/median/p95
+timings, plus the git commit and environment), and --compare reports the
+median change against an earlier results file, exiting 1 if anything got
+slower than --threshold:
+
+    python benchmarks/bench_hot_paths.py --sizes 1000,100000 --output before.json
+    python benchmarks/bench_hot_paths.py --sizes 1000,100000 --compare before.json
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import billing_dynamic
+from billing_engine import BillingEngine, Catalog
+from database_manager import DatabaseManager
+from product_matcher import FuzzyMatcher, PrefixIndex, product_names
+
+CATEGORIES = ['Security Camera', 'Video Doorbell', 'NVR Recorder', 'Smart Lock', 'PoE Switch', 'Motion Sensor',
+              'Mesh Router', 'Smoke Detector', 'UPS System', 'Fiber Transceiver']
+ADJECTIVES = ['AI', 'Pro', 'Outdoor', 'Wireless', 'Enterprise', 'Compact', 'Solar', '4K', 'Dual-Band', 'Smart']
+
+# Lookups timed per sample for the search benchmarks
+LOOKUPS_PER_SAMPLE = 20
+
+BENCHMARKS = []
+
+
+def benchmark(group, name, sizes='sizes'):
+    """Register a setup function(context, size) returning the callable to time (or None to skip)"""
+    def register(setup):
+        BENCHMARKS.append({'group': group, 'name': name, 'sizes': sizes, 'setup': setup})
+        return setup
+    return register
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints and logging of the code under test"""
+    logging.disable(logging.CRITICAL)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+class Context:
+    """Shared state for one run: arguments, work directory and lazily built inputs"""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self._catalogs = {}
+        self._app = None
+
+    def rng(self, *salt):
+        return random.Random(f"{self.args.seed}:{':'.join(map(str, salt))}")
+
+    def catalog(self, size):
+        if size not in self._catalogs:
+            self._catalogs.clear()  # Keep one catalog in memory at a time (1M products is ~1 GB)
+            rng = self.rng('catalog', size)
+            self._catalogs[size] = [{
+                'name': f"{rng.choice(ADJECTIVES)} {rng.choice(CATEGORIES)} {i:07d}",
+                'price': round(rng.uniform(200, 80000), 2),
+                'gst_rate': rng.choice([5, 12, 18, 18, 28]),
+                'Installation Charge': rng.choice([0, 150, 400, 1200]),
+                'Service Charge': rng.choice([0, 100, 250]),
+                'Shipping Charge': rng.choice([0, 75, 150]),
+                'Handling Fee': rng.choice([0, 25, 80])
+            } for i in range(size)]
+        return self._catalogs[size]
+
+    def order(self, size, lines=None):
+        """{product_name: quantity} and {product_name: discount} for a synthetic order"""
+        rng = self.rng('order', size)
+        products = rng.sample(self.catalog(size), min(lines or self.args.order_lines, size))
+        order = {product['name']: rng.randint(1, 25) for product in products}
+        discounts = {name: rng.choice([5, 10, 15]) for name in order if rng.random() < 0.3}
+        return order, discounts
+
+    def app(self):
+        """app0, imported inside the work directory so its database and folders land there"""
+        if self._app is None:
+            with quiet():
+                import app0
+            self._app = app0
+        return self._app
+
+
+# Billing
+
+@benchmark('billing', 'billing_dynamic.calculate_invoice')
+def bench_calculate_invoice(context, size):
+    catalog = context.catalog(size)
+    order, discounts = context.order(size)
+    return lambda: billing_dynamic.calculate_invoice(order, catalog, discounts, overall_discount=5)
+
+
+@benchmark('billing', 'billing_engine.Catalog compile')
+def bench_catalog_compile(context, size):
+    catalog = context.catalog(size)
+    return lambda: Catalog(catalog)
+
+
+@benchmark('billing', 'billing_engine.calculate_invoice (compiled catalog)')
+def bench_engine_invoice(context, size):
+    compiled = Catalog(context.catalog(size))
+    order, discounts = context.order(size)
+    engine = BillingEngine()
+    return lambda: engine.calculate_invoice(order, compiled, discounts, overall_discount=5)
+
+
+# Product lookup
+
+def lookup_names(context, size):
+    """Exact names, lower-cased partial names and misses, spread over the whole catalog"""
+    rng = context.rng('lookup', size)
+    catalog = context.catalog(size)
+    names = []
+    for i in range(LOOKUPS_PER_SAMPLE):
+        product = rng.choice(catalog)
+        if i % 4 == 3:
+            names.append(f"no such product {i}")
+        elif i % 2:
+            names.append(product['name'].lower().split(' ', 1)[1])
+        else:
+            names.append(product['name'])
+    return names
+
+
+@benchmark('lookup', 'billing_dynamic.find_product')
+def bench_find_product(context, size):
+    catalog = context.catalog(size)
+    names = lookup_names(context, size)
+    return lambda: [billing_dynamic.find_product(catalog, name) for name in names]
+
+
+@benchmark('lookup', 'app0.smart_product_search')
+def bench_smart_product_search(context, size):
+    search = context.app().smart_product_search
+    catalog = context.catalog(size)
+    names = lookup_names(context, size)
+    return lambda: [search(name, catalog) for name in names]
+
+
+def misspelled_names(context, size):
+    """Catalog names with one character replaced, as typed by users or returned by the model"""
+    rng = context.rng('misspelled', size)
+    catalog = context.catalog(size)
+    names = []
+    for _ in range(LOOKUPS_PER_SAMPLE):
+        name = list(rng.choice(catalog)['name'].lower())
+        name[rng.randrange(len(name))] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+        names.append(''.join(name))
+    return names
+
+
+@benchmark('lookup', 'product_matcher.FuzzyMatcher build')
+def bench_fuzzy_build(context, size):
+    names = product_names(context.catalog(size))
+    return lambda: FuzzyMatcher(names)
+
+
+@benchmark('lookup', 'product_matcher.FuzzyMatcher.match (misspelled)')
+def bench_fuzzy_match(context, size):
+    matcher = FuzzyMatcher(product_names(context.catalog(size)))
+    names = misspelled_names(context, size)
+    return lambda: [matcher.match(name) for name in names]
+
+
+@benchmark('lookup', 'product_matcher.PrefixIndex.search')
+def bench_prefix_search(context, size):
+    index = PrefixIndex(product_names(context.catalog(size)))
+    rng = context.rng('prefix', size)
+    # What a search box sends while typing: a word's first letters, then two words
+    queries = [' '.join(rng.choice(context.catalog(size))['name'].lower().split()[:1 + i % 2])[:3 + i % 5]
+               for i in range(LOOKUPS_PER_SAMPLE)]
+    return lambda: [index.search(query)[:20] for query in queries]
+
+
+# Catalog upload parsing
+
+def write_upload(context, size, extension):
+    import pandas as pd
+
+    rows = context.catalog(size)
+    frame = pd.DataFrame({
+        'Product Name': [row['name'] for row in rows],
+        'Base Price': [row['price'] for row in rows],
+        'GST Rate': [row['gst_rate'] for row in rows],
+        'Installation Charge': [row['Installation Charge'] for row in rows],
+        'Service Charge': [row['Service Charge'] for row in rows],
+        'Shipping Charge': [row['Shipping Charge'] for row in rows],
+        'Handling Fee': [row['Handling Fee'] for row in rows],
+    })
+    path = os.path.join(context.workdir, f"upload_{size}{extension}")
+    if extension == '.csv':
+        frame.to_csv(path, index=False)
+    else:
+        frame.to_excel(path, index=False)
+    return path
+
+
+def parse_setup(extension, size_limit):
+    def setup(context, size):
+        if size > getattr(context.args, size_limit):
+            return None
+        try:
+            from dynamic_parser import dynamic_parse_and_save
+            path = write_upload(context, size, extension)
+        except ImportError as e:
+            print(f"   skipped: {e}")
+            return None
+        return lambda: dynamic_parse_and_save(path, output_path=None)
+    return setup
+
+
+benchmark('parsing', 'dynamic_parse_and_save (csv)')(parse_setup('.csv', 'max_csv_rows'))
+benchmark('parsing', 'dynamic_parse_and_save (xlsx)')(parse_setup('.xlsx', 'max_xlsx_rows'))
+
+
+# Prompt assembly
+
+@benchmark('prompt', 'app0.build_chat_prompt')
+def bench_chat_prompt(context, size):
+    app0 = context.app()
+    catalog = context.catalog(size)
+    session_data = dict(app0.get_session_data(f"bench-{size}"), cart=app0.Cart(app0.billing_engine),
+                        overall_discount=5)
+    rng = context.rng('prompt', size)
+    for product in rng.sample(catalog, min(context.args.order_lines, size)):
+        session_data['cart'].add(product, rng.randint(1, 10), rng.choice([0, 10]))
+    session_data['conversation_history'] = [
+        {'role': role, 'content': f"message {i} about {rng.choice(catalog)['name']} " * 4}
+        for i, role in enumerate(['user', 'assistant'] * 4)
+    ]
+    return lambda: app0.build_chat_prompt("add 2 security cameras with 10% discount", session_data, catalog)
+
+
+# Invoice rendering
+
+@benchmark('render', 'app0.render_invoice_file', sizes='invoice_lines')
+def bench_render_invoice(context, lines):
+    app0 = context.app()
+    catalog_size = max(lines, 1000)
+    order, discounts = context.order(catalog_size, lines=lines)
+    invoice = BillingEngine().calculate_invoice(order, context.catalog(catalog_size), discounts, overall_discount=5)
+    template, _ = app0.load_invoice_template()
+    seller = {'name': 'Bench Seller', 'address': 'Lucknow', 'phone': '1234567890', 'gstin': '14556789012345'}
+    client = {'name': 'Bench Client', 'address': 'Bench Street', 'gst_number': 'GST', 'place_of_supply': 'UP',
+              'phone': '0', 'email': 'bench@example.com'}
+    return lambda: app0.render_invoice_file(template, invoice, seller, client, 'Benchmark', app0.new_invoice_number())
+
+
+# Chat persistence
+
+def chat_database(context, messages):
+    """Database with `messages` messages spread over 1 message per 20 across chats, plus one open chat"""
+    db_path = os.path.join(context.workdir, f"chat_{messages}.db")
+    db = DatabaseManager(db_path)
+    rng = context.rng('chat', messages)
+    chat_ids = [db.create_new_chat('admin')[0] for _ in range(max(messages // 20, 1))]
+
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT INTO messages (chat_id, username, message_type, content, timestamp) VALUES (?, ?, ?, ?, ?)',
+        [(rng.choice(chat_ids), 'admin', rng.choice(['user', 'ai']), f"message {i} " * rng.randint(3, 30),
+          datetime.now()) for i in range(messages)])
+    conn.commit()
+    conn.close()
+    return db, chat_ids[-1]
+
+
+@benchmark('chat_db', 'DatabaseManager.save_message', sizes='messages')
+def bench_save_message(context, messages):
+    db, chat_id = chat_database(context, messages)
+    counter = iter(range(10 ** 9))
+    return lambda: db.save_message(chat_id, 'admin', 'user', f"benchmark message {next(counter)}")
+
+
+@benchmark('chat_db', 'DatabaseManager.get_chat_messages (page of 50)', sizes='messages')
+def bench_get_chat_messages(context, messages):
+    db, chat_id = chat_database(context, messages)
+    return lambda: db.get_chat_messages(chat_id, 'admin', limit=50)
+
+
+@benchmark('chat_db', 'DatabaseManager.get_user_chats (page of 50)', sizes='messages')
+def bench_get_user_chats(context, messages):
+    db, _ = chat_database(context, messages)
+    return lambda: db.get_user_chats('admin', limit=50)
+
+
+# Runner
+
+def measure(fn, min_time, min_runs, max_runs):
+    """Per-call timings: at least min_runs calls, continuing until min_time seconds or max_runs"""
+    samples = []
+    while len(samples) < max_runs and (len(samples) < min_runs or sum(samples) < min_time):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'runs': len(samples),
+        'min_s': ordered[0],
+        'median_s': statistics.median(ordered),
+        'mean_s': statistics.fmean(ordered),
+        'p95_s': ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        'stdev_s': statistics.stdev(ordered) if len(ordered) > 1 else 0.0
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print median changes against a baseline; returns the names that regressed past threshold"""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+
+    print(f"\n{'benchmark':<58}{'size':>9}{'before ms':>12}{'after ms':>12}{'change':>9}")
+    regressions = []
+    for result in results:
+        before = baseline.get((result['name'], result['size']))
+        if before is None:
+            continue
+        ratio = result['median_s'] / before['median_s']
+        flag = ' ⚠️' if ratio > threshold else ''
+        print(f"{result['name']:<58}{result['size']:>9}{before['median_s'] * 1000:>12.3f}"
+              f"{result['median_s'] * 1000:>12.3f}{ratio:>8.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(f"{result['name']} @ {result['size']}")
+    return regressions
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int_list, default=[1000, 100000, 1000000], help='catalog sizes')
+    parser.add_argument('--invoice-lines', type=int_list, default=[10, 100, 1000], help='lines per rendered invoice')
+    parser.add_argument('--messages', type=int_list, default=[10000, 100000], help='messages in the chat database')
+    parser.add_argument('--order-lines', type=int, default=20, help='lines per synthetic order and cart')
+    parser.add_argument('--max-csv-rows', type=int, default=1000000)
+    parser.add_argument('--max-xlsx-rows', type=int, default=100000, help='writing/reading xlsx is slow past this')
+    parser.add_argument('--group', action='append', help='only run these groups (repeatable)')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds to spend per benchmark and size')
+    parser.add_argument('--min-runs', type=int, default=3)
+    parser.add_argument('--max-runs', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='results file (default: bench_hot_paths_<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help='compare medians with an earlier results file')
+    parser.add_argument('--threshold', type=float, default=1.2, help='median slowdown ratio counted as a regression')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = os.path.abspath(args.output or f"bench_hot_paths_{commit or 'unknown'}.json")
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    results = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        context = Context(args, workdir)
+        selected = [b for b in BENCHMARKS if not args.group or b['group'] in args.group]
+
+        for size_kind in ('sizes', 'invoice_lines', 'messages'):
+            for size in getattr(args, size_kind):
+                for bench in (b for b in selected if b['sizes'] == size_kind):
+                    print(f"⏱️ {bench['name']} @ {size:,}")
+                    with quiet():
+                        fn = bench['setup'](context, size)
+                    if fn is None:
+                        print("   skipped")
+                        continue
+                    with quiet():
+                        samples = measure(fn, args.min_time, args.min_runs, args.max_runs)
+                    stats = summarize(samples)
+                    results.append(dict(group=bench['group'], name=bench['name'], size=size, **stats))
+                    print(f"   median {stats['median_s'] * 1000:.3f} ms over {stats['runs']} runs")
+
+    report = {
+        'suite': 'hot_paths',
+        'commit': commit,
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Wrote {len(results)} results to {output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions past {args.threshold:.2f}x: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Gemini model, for load tests that must not spend API quota.
+
+Speaks the protocol of gemini_client.HTTPModel (POST /v1/generate with
+{"prompt": ...} -> {"text": ...}). Chat prompts get the [ACTION:...] reply
+the real model would give for the user's message, matched against the
+prompt's AVAILABLE PRODUCTS list; catalog column prompts get a column label.
+Replies are delayed by a configurable latency distribution and can fail at
+a configurable rate, so the app's fallback path is exercised too.
+
+    python benchmarks/fake_llm_server.py --port 8765 --latency lognormal:800:0.4 --error-rate 0.01
+    LLM_PROVIDER=http LLM_SERVER_URL=http://127.0.0.1:8765 python app0.py
+
+Latency specs (milliseconds): fixed:MS, uniform:LO:HI, lognormal:MEDIAN:SIGMA,
+exponential:MEAN, or none.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dynamic_parser import fallback_classify_column
+
+MESSAGE_PATTERN = re.compile(r'^USER\'S MESSAGE: "(.*)"$', re.MULTILINE)
+PRODUCT_LINE_PATTERN = re.compile(r'^\d+\. (.+) - ₹[\d,.]+$', re.MULTILINE)
+COLUMN_PATTERN = re.compile(r'What does the column "(.*)" most likely represent')
+NUMBER_PATTERN = re.compile(r'\b(\d+(?:\.\d+)?)\b')
+PERCENT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+
+
+def parse_latency(spec):
+    """Latency spec -> function returning a delay in seconds"""
+    kind, *params = spec.split(':')
+    try:
+        params = [float(p) for p in params]
+    except ValueError:
+        raise ValueError(f"Invalid latency spec '{spec}'")
+
+    if kind == 'none' and not params:
+        return lambda rng: 0.0
+    if kind == 'fixed' and len(params) == 1:
+        return lambda rng: params[0] / 1000
+    if kind == 'uniform' and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1]) / 1000
+    if kind == 'lognormal' and len(params) == 2 and params[0] > 0:
+        mu, sigma = math.log(params[0] / 1000), params[1]
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    if kind == 'exponential' and len(params) == 1 and params[0] > 0:
+        return lambda rng: rng.expovariate(1000 / params[0])
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+
+def catalog_products(prompt):
+    section = prompt.split('AVAILABLE PRODUCTS:', 1)
+    return PRODUCT_LINE_PATTERN.findall(section[1]) if len(section) == 2 else []
+
+
+def match_product(message, products):
+    """Longest product name in the message, else the product sharing most words with it"""
+    message = message.lower()
+    named = [name for name in products if name.lower() in message]
+    if named:
+        return max(named, key=len)
+
+    words = set(re.findall(r'[a-z0-9]+', message))
+    best, best_score = None, 0
+    for name in products:
+        score = len(words & set(re.findall(r'[a-z0-9]+', name.lower())))
+        if score > best_score:
+            best, best_score = name, score
+    return best if best_score >= 2 else None
+
+
+def chat_reply(message, products):
+    """What the model answers for a chat message, following the prompt's action formats"""
+    product = match_product(message, products)
+    text = message.lower()
+    # Numbers in the product name ("NVR 8 Channel") are not quantities
+    rest = text.replace(product.lower(), ' ') if product else text
+    percent = PERCENT_PATTERN.search(rest)
+    numbers = [int(float(n)) for n in NUMBER_PATTERN.findall(PERCENT_PATTERN.sub(' ', rest))]
+
+    if 'invoice' in text or 'bill' in text:
+        return "Generating your invoice now. [ACTION:GENERATE_INVOICE|||]"
+    if 'breakdown' in text:
+        return "Here is the full breakdown of your cart. [ACTION:SHOW_BREAKDOWN|||]"
+    if ('add' in text or 'buy' in text or 'want' in text) and product:
+        quantity = numbers[0] if numbers else 1
+        discount = percent.group(1) if percent else 0
+        return f"Adding {quantity} {product} to your cart. [ACTION:ADD|{product}|{quantity}|{discount}]"
+    if ('remove' in text or 'delete' in text) and product:
+        quantity = numbers[0] if numbers else ''
+        return f"Removing {product} from your cart. [ACTION:REMOVE|{product}|{quantity}|0]"
+    if 'discount' in text and product and percent:
+        return f"Applying {percent.group(1)}% discount on {product}. [ACTION:APPLY_DISCOUNT|{product}|{percent.group(1)}|0]"
+    if 'discount' in text and ('clear' in text or 'remove' in text):
+        return "Removing the overall discount. [ACTION:CLEAR_OVERALL_DISCOUNT|||0]"
+    if 'discount' in text and percent:
+        return f"Applying {percent.group(1)}% off the whole cart. [ACTION:OVERALL_DISCOUNT|||{percent.group(1)}]"
+    if 'cart' in text:
+        return "Here is your cart. [ACTION:SHOW_CART|||]"
+    if 'product' in text or 'catalog' in text or 'show' in text:
+        return "Here are our products. [ACTION:SHOW_PRODUCTS|||]"
+    return "I can add products to your cart, apply discounts, show your cart or generate an invoice. What would you like to do?"
+
+
+def reply(prompt):
+    message = MESSAGE_PATTERN.search(prompt)
+    if message:
+        return chat_reply(message.group(1), catalog_products(prompt))
+    column = COLUMN_PATTERN.search(prompt)
+    if column:
+        return fallback_classify_column(column.group(1))
+    return "OK"
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, dict(self.server.stats, status='ok'))
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/v1/generate':
+            self._send(404, {'error': 'Not found'})
+            return
+        try:
+            prompt = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))['prompt']
+        except (ValueError, KeyError):
+            self._send(400, {'error': 'Expected JSON body with a prompt'})
+            return
+
+        server = self.server
+        with server.lock:
+            delay = server.latency(server.rng)
+            failed = server.rng.random() < server.error_rate
+            server.stats['requests'] += 1
+            server.stats['errors'] += failed
+        time.sleep(delay)
+
+        if failed:
+            self._send(500, {'error': 'Injected model failure'})
+        else:
+            self._send(200, {'text': reply(prompt)})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host, port, latency='none', error_rate=0.0, seed=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), FakeModelHandler)
+    server.daemon_threads = True
+    server.latency = parse_latency(latency)
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = {'requests': 0, 'errors': 0}
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:600:0.5', help='reply delay distribution (see above)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    try:
+        server = make_server(args.host, args.port, args.latency, args.error_rate, args.seed, args.verbose)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"🤖 Fake model listening on http://{args.host}:{args.port} (latency {args.latency}, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
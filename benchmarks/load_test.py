@@ -0,0 +1,225 @@
+"""
+Load generator for a running invoice app.
+
+Each virtual session logs in with its own cookie jar and Session-ID and then
+repeats a shopping conversation against the chat, cart, invoice, chat list
+and catalog upload endpoints until the duration is up. Reports requests,
+errors, throughput and p50/p95/p99 latency per endpoint.
+
+Run the app against the local model stand-in so no API quota is spent:
+
+    python benchmarks/fake_llm_server.py --latency lognormal:600:0.5 &
+    LLM_PROVIDER=http python app0.py &
+    python benchmarks/load_test.py --sessions 50 --duration 60 --output load.json
+
+Exits with status 1 if the error rate is above --max-error-rate.
+"""
+
+import argparse
+import csv
+import http.cookiejar
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+
+class VirtualSession:
+    """One browser: a cookie jar, a Session-ID and the timings of its requests"""
+
+    def __init__(self, base_url, session_id, timeout, record):
+        self.base_url = base_url.rstrip('/')
+        self.session_id = session_id
+        self.timeout = timeout
+        self.record = record
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, endpoint, path, body=None, content_type='application/json', session_id=None):
+        """Send a request, record (endpoint, seconds, ok) and return the decoded JSON or None"""
+        if body is not None and content_type == 'application/json':
+            body = json.dumps(body).encode('utf-8')
+        headers = {'Session-ID': session_id or self.session_id}
+        if body is not None:
+            headers['Content-Type'] = content_type
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers)
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                payload = response.read()
+            ok = True
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            ok = False
+        except (urllib.error.URLError, OSError):
+            payload = None
+            ok = False
+        self.record(endpoint, time.perf_counter() - start, ok)
+
+        try:
+            return json.loads(payload) if ok and payload else None
+        except ValueError:
+            return None
+
+
+def catalog_csv(rng, rows):
+    """A small uploadable catalog in the CSV layout the parser understands"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['Product Name', 'Price', 'GST Rate', 'Installation Charge'])
+    for i in range(rows):
+        writer.writerow([f"Load Test Item {i}", round(rng.uniform(100, 50000), 2), rng.choice([5, 12, 18, 28]),
+                         rng.choice([0, 250, 500])])
+    return out.getvalue().encode('utf-8')
+
+
+def multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def run_session(args, index, deadline, record, start_barrier):
+    rng = random.Random(args.seed * 100003 + index)
+    session = VirtualSession(args.url, f"load-{index}-{uuid.uuid4().hex[:8]}", args.timeout, record)
+    start_barrier.wait()
+    time.sleep(args.ramp_up * index / args.sessions)
+
+    if session.request('login', '/api/login', {'username': args.username, 'password': args.password}) is None:
+        return
+    listing = session.request('products', '/api/get_products') or {}
+    names = [product['name'] for product in listing.get('products', [])]
+    if not names:
+        return
+
+    def chat(message):
+        session.request('chat', '/api/chat', {'message': message})
+        if args.think_time:
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+
+    iteration = 0
+    while time.time() < deadline:
+        iteration += 1
+        picked = rng.sample(names, min(len(names), rng.randint(1, 3)))
+        for name in picked:
+            chat(f"add {rng.randint(1, 5)} {name}")
+        chat("show cart")
+        chat(f"give {rng.choice([5, 10, 15])}% discount on {picked[0]}")
+        chat(f"apply {rng.choice([0, 5, 10])}% overall discount")
+        chat("show breakdown")
+        session.request('generate_invoice', '/api/generate_invoice_from_cart', {})
+        session.request('get_chats', '/api/get_chats?limit=20')
+        for name in picked:
+            chat(f"remove {name}")
+
+        if args.upload_every and iteration % args.upload_every == 0:
+            # A separate Session-ID, so the conversation keeps using the default catalog
+            body, content_type = multipart('file', 'load_test_catalog.csv', catalog_csv(rng, args.upload_rows))
+            session.request('upload_catalog', '/api/upload_catalog', body, content_type,
+                            session_id=f"{session.session_id}-upload")
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint statistics from (seconds, ok) samples"""
+    ordered = sorted(seconds for seconds, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'p50_s': percentile(ordered, 0.50),
+        'p95_s': percentile(ordered, 0.95),
+        'p99_s': percentile(ordered, 0.99),
+        'max_s': ordered[-1]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--sessions', type=int, default=20, help='concurrent virtual sessions')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to keep sending requests')
+    parser.add_argument('--ramp-up', type=float, default=0, help='seconds over which sessions start')
+    parser.add_argument('--think-time', type=float, default=0, help='mean pause after each chat message (seconds)')
+    parser.add_argument('--upload-every', type=int, default=5, help='upload a catalog every N conversations (0: never)')
+    parser.add_argument('--upload-rows', type=int, default=200)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--output', default=None, help='also write the report as JSON')
+    args = parser.parse_args()
+
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(endpoint, seconds, ok):
+        with lock:
+            samples[endpoint].append((seconds, ok))
+
+    start_barrier = threading.Barrier(args.sessions + 1)
+    started = time.time()
+    deadline = started + args.ramp_up + args.duration
+    threads = []
+    for index in range(args.sessions):
+        thread = threading.Thread(target=run_session, args=(args, index, deadline, record, start_barrier), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    print(f"🚀 {args.sessions} sessions against {args.url} for {args.duration:g}s")
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    results = {endpoint: summarize(endpoint_samples, elapsed) for endpoint, endpoint_samples in sorted(samples.items())}
+    all_samples = [sample for endpoint_samples in samples.values() for sample in endpoint_samples]
+    total = summarize(all_samples, elapsed) if all_samples else None
+
+    print(f"\n{'endpoint':<20}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, stats in list(results.items()) + ([('total', total)] if total else []):
+        print(f"{endpoint:<20}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>9.1f}"
+              f"{stats['p50_s'] * 1000:>10.1f}{stats['p95_s'] * 1000:>10.1f}{stats['p99_s'] * 1000:>10.1f}"
+              f"{stats['max_s'] * 1000:>10.1f}")
+
+    if args.output:
+        report = {
+            'suite': 'load_test',
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'elapsed_s': elapsed,
+            'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'password')},
+            'total': total,
+            'endpoints': results
+        }
+        with open(os.path.abspath(args.output), 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Wrote report to {args.output}")
+
+    if not total:
+        print("\n❌ No requests completed")
+        sys.exit(1)
+    error_rate = total['errors'] / total['requests']
+    if error_rate > args.max_error_rate:
+        print(f"\n❌ Error rate {error_rate:.2%} is above {args.max_error_rate:.2%}")
+        sys.exit(1)
+    print(f"\n✅ Error rate {error_rate:.2%}")
+
+
+if __name__ == '__main__':
+    main()
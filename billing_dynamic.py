@@ -1,3 +1,11 @@
+import logging
+
+from billing_engine import BillingEngine, Catalog
+
+logger = logging.getLogger(__name__)
+
+ENGINE = BillingEngine('goods')
+
 def calculate_invoice(user_order, product_data, discounts=None, overall_discount=0):
     """
     Enhanced invoice calculation with better error handling and validation.
@@ -16,77 +24,51 @@ def calculate_invoice(user_order, product_data, discounts=None, overall_discount
     """
     try:
         invoice_items = []
-        subtotal = 0
-        total_gst = 0
-        total_installation = 0
-        total_shipping = 0
-        total_service = 0
-        total_handling = 0
         
         # Ensure discounts is a dictionary
         if discounts is None:
             discounts = {}
         
-        print(f"🧮 Calculating invoice for {len(user_order)} items...")
+        logger.debug("Calculating invoice for %s items...", len(user_order))
+        
+        catalog = Catalog(product_data)
+        lines = []
         
         for product_name, qty in user_order.items():
-            # Find product with flexible matching
-            product = find_product(product_data, product_name)
+            rates = catalog.find(product_name)
             
-            if not product:
-                print(f"⚠️ Product '{product_name}' not found in catalog")
+            if not rates:
+                logger.warning("Product '%s' not found in catalog", product_name)
                 continue
             
-            # Get base price with multiple field name support
-            base_price = get_price(product)
-            if base_price <= 0:
-                print(f"⚠️ Invalid price for product '{product_name}': {base_price}")
+            if rates.unit_price <= 0:
+                logger.warning("Invalid price for product '%s': %s", product_name, rates.unit_price)
                 continue
             
-            # Calculate discount
-            discount_percent = discounts.get(product_name, 0)
-            discounted_price = base_price * (1 - discount_percent / 100)
-            
-            # Calculate GST
-            gst_rate = get_numeric_value(product, ['gst_rate', 'GST Rate', 'tax_rate'], 18)
-            gst_amount = (discounted_price * gst_rate / 100) * qty
-            total_gst += gst_amount
-            
-            # Calculate additional charges
-            install = get_numeric_value(product, ['Installation Charge', 'installation_charge'], 0) * qty
-            service = get_numeric_value(product, ['Service Charge', 'service_charge', 'service_fee'], 0) * qty
-            shipping = get_numeric_value(product, ['Shipping Charge', 'shipping_charge'], 0) * qty
-            handling = get_numeric_value(product, ['Handling Fee', 'handling_fee'], 0) * qty
-            
-            total_installation += install
-            total_shipping += shipping
-            total_service += service
-            total_handling += handling
-            
-            # Calculate totals
-            product_subtotal = discounted_price * qty
-            line_total = product_subtotal + gst_amount + install + shipping + service + handling
-            subtotal += product_subtotal
+            # Price the line with the shared engine (GST on goods only, as this module always has)
+            line = ENGINE.line(rates, qty, discounts.get(product_name, 0))
+            lines.append(line)
             
             # Check for recorded total (for discrepancy analysis)
+            product = find_product(product_data, product_name)
             recorded_total = get_numeric_value(product, ['Total Price', 'total_price'], None)
             expected_total = recorded_total * qty if recorded_total else None
-            discrepancy = round(expected_total - line_total, 2) if expected_total else None
+            discrepancy = round(expected_total - line.total, 2) if expected_total else None
             
             # Create invoice item
             invoice_item = {
                 "name": product_name,
                 "qty": qty,
-                "unit_price": round(base_price, 2),
-                "discount_percent": discount_percent,
-                "discounted_price": round(discounted_price, 2),
-                "gst_rate": gst_rate,
-                "gst_amount": round(gst_amount, 2),
-                "installation_charge": round(install, 2),
-                "shipping_charge": round(shipping, 2),
-                "service_charge": round(service, 2),
-                "handling_fee": round(handling, 2),
-                "calculated_total": round(line_total, 2)
+                "unit_price": round(line.unit_price, 2),
+                "discount_percent": line.discount,
+                "discounted_price": round(line.discounted_price, 2),
+                "gst_rate": line.gst_rate,
+                "gst_amount": round(line.gst, 2),
+                "installation_charge": round(line.installation, 2),
+                "shipping_charge": round(line.shipping, 2),
+                "service_charge": round(line.service, 2),
+                "handling_fee": round(line.handling, 2),
+                "calculated_total": round(line.total, 2)
             }
             
             # Add discrepancy info if available
@@ -96,23 +78,21 @@ def calculate_invoice(user_order, product_data, discounts=None, overall_discount
             
             invoice_items.append(invoice_item)
             
-            print(f"  ✅ {product_name}: {qty}x @ ₹{base_price} = ₹{line_total:.2f}")
+            logger.debug("%s: %sx @ ₹%s = ₹%.2f", product_name, qty, line.unit_price, line.total)
         
         # Calculate final totals
-        total_before_discount = subtotal + total_gst + total_installation + total_shipping + total_service + total_handling
-        discount_amount = total_before_discount * overall_discount / 100
-        grand_total = total_before_discount - discount_amount
+        totals = ENGINE.invoice(lines, overall_discount)['summary']
         
         # Create summary
         summary = {
-            "subtotal": round(subtotal, 2),
-            "total_gst": round(total_gst, 2),
-            "total_installation": round(total_installation, 2),
-            "total_shipping": round(total_shipping, 2),
-            "total_service": round(total_service, 2),
-            "total_handling": round(total_handling, 2),
-            "overall_discount": round(discount_amount, 2),
-            "grand_total": round(grand_total, 2)
+            "subtotal": round(totals['subtotal'], 2),
+            "total_gst": round(totals['total_gst'], 2),
+            "total_installation": round(totals['total_installation'], 2),
+            "total_shipping": round(totals['total_shipping'], 2),
+            "total_service": round(totals['total_service'], 2),
+            "total_handling": round(totals['total_handling'], 2),
+            "overall_discount": round(totals['overall_discount_amount'], 2),
+            "grand_total": round(totals['grand_total'], 2)
         }
         
         result = {
@@ -120,11 +100,11 @@ def calculate_invoice(user_order, product_data, discounts=None, overall_discount
             "summary": summary
         }
         
-        print(f"✅ Invoice calculated: ₹{grand_total:.2f} total for {len(invoice_items)} items")
+        logger.debug("Invoice calculated: ₹%.2f total for %s items", totals['grand_total'], len(invoice_items))
         return result
         
     except Exception as e:
-        print(f"❌ Error calculating invoice: {str(e)}")
+        logger.error("Error calculating invoice: %s", e)
         raise
 
 def find_product(product_data, product_name):
@@ -211,13 +191,11 @@ def validate_product_data(product_data):
             issues.append(f"Product {i+1} ({product.get('name', 'Unknown')}): No price field found")
     
     if issues:
-        print("⚠️ Product data validation issues:")
-        for issue in issues[:10]:  # Show first 10 issues
-            print(f"  - {issue}")
-        if len(issues) > 10:
-            print(f"  ... and {len(issues) - 10} more issues")
+        # Show first 10 issues
+        more = f" (and {len(issues) - 10} more)" if len(issues) > 10 else ""
+        logger.warning("Product data validation issues: %s%s", '; '.join(issues[:10]), more)
     else:
-        print("✅ Product data validation passed")
+        logger.info("Product data validation passed")
     
     return len(issues) == 0
 
@@ -0,0 +1,341 @@
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+# Catalog fields read for each rate, in priority order (uploaded catalogs name them differently)
+PRICE_FIELDS = ('price', 'base_price', 'Price', 'Base Price', 'rate', 'amount', 'cost')
+CHARGE_FIELDS = {
+    'installation_charge': ('Installation Charge', 'installation_charge'),
+    'service_charge': ('Service Charge', 'service_charge', 'service_fee'),
+    'shipping_charge': ('Shipping Charge', 'shipping_charge'),
+    'handling_fee': ('Handling Fee', 'handling_fee'),
+}
+GST_RATE_FIELDS = ('gst_rate', 'GST Rate', 'tax_rate')
+DEFAULT_GST_RATE = 18
+
+# Names a catalog product may be ordered by, besides 'name'
+ALTERNATE_NAME_FIELDS = ('Product Name', 'product_name', 'title')
+
+# Amounts kept for every priced line, and summed over a cart or invoice. They are held as
+# integer paise in the <field>_paise attributes; <field> is a read-only rupee view for display.
+TOTAL_FIELDS = ('subtotal', 'installation', 'service', 'shipping', 'handling', 'gst', 'total')
+TOTAL_PAISE_FIELDS = tuple(f'{field}_paise' for field in TOTAL_FIELDS)
+
+PAISE_PER_RUPEE = 100
+# Percentages (discounts, GST rates) are applied in basis points: 12.5% -> 1250
+BASIS_POINTS = 10000
+
+
+def to_paise(rupees):
+    """Rupee amount (number or numeric string) to integer paise, rounding half up"""
+    return int((Decimal(str(rupees)) * PAISE_PER_RUPEE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_basis_points(percent):
+    return int((Decimal(str(percent)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_rupees(paise):
+    return paise / PAISE_PER_RUPEE
+
+
+def percent_of(paise, basis_points):
+    """basis_points of an amount in paise, rounded half up to a whole paisa"""
+    return (2 * paise * basis_points + BASIS_POINTS) // (2 * BASIS_POINTS)
+
+
+def allocate(paise, weights):
+    """
+    Split an amount in paise across weights in proportion; the shares add
+    up to paise exactly (leftover paise go to the largest remainders).
+    """
+    total = sum(weights)
+    if total <= 0:
+        return [0] * len(weights)
+    shares = [paise * weight // total for weight in weights]
+    by_remainder = sorted(range(len(weights)), key=lambda i: paise * weights[i] % total, reverse=True)
+    for i in by_remainder[:paise - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+class rupees:
+    """Read-only rupee view of an integer paise attribute"""
+
+    def __init__(self, paise_attribute):
+        self.paise_attribute = paise_attribute
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return getattr(instance, self.paise_attribute) / PAISE_PER_RUPEE
+
+
+class RupeeTotals:
+    """Rupee views of TOTAL_PAISE_FIELDS, for classes that hold them"""
+
+    __slots__ = ()
+
+    subtotal = rupees('subtotal_paise')
+    installation = rupees('installation_paise')
+    service = rupees('service_paise')
+    shipping = rupees('shipping_paise')
+    handling = rupees('handling_paise')
+    gst = rupees('gst_paise')
+    total = rupees('total_paise')
+
+
+def _number(product, fields, default=0):
+    """First non-negative numeric value among fields"""
+    for field in fields:
+        if field in product:
+            try:
+                value = float(product[field])
+            except (ValueError, TypeError):
+                continue
+            if value >= 0:
+                return value
+    return default
+
+
+class ProductRates:
+    """
+    Unit price, per-unit charges and GST rate of a product, read from its
+    catalog record once. Prices are converted to paise here, the only
+    rounding of catalog values.
+    """
+
+    __slots__ = ('name', 'unit_price_paise', 'gst_rate', 'gst_basis_points') + tuple(
+        f'{field}_paise' for field in CHARGE_FIELDS)
+
+    unit_price = rupees('unit_price_paise')
+    installation_charge = rupees('installation_charge_paise')
+    service_charge = rupees('service_charge_paise')
+    shipping_charge = rupees('shipping_charge_paise')
+    handling_fee = rupees('handling_fee_paise')
+
+    def __init__(self, name, unit_price, installation_charge=0, service_charge=0, shipping_charge=0,
+                 handling_fee=0, gst_rate=DEFAULT_GST_RATE):
+        self.name = name
+        self.unit_price_paise = to_paise(unit_price)
+        self.installation_charge_paise = to_paise(installation_charge)
+        self.service_charge_paise = to_paise(service_charge)
+        self.shipping_charge_paise = to_paise(shipping_charge)
+        self.handling_fee_paise = to_paise(handling_fee)
+        self.gst_rate = gst_rate
+        self.gst_basis_points = to_basis_points(gst_rate)
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(
+            product.get('name', ''),
+            _number(product, PRICE_FIELDS),
+            gst_rate=_number(product, GST_RATE_FIELDS, DEFAULT_GST_RATE),
+            **{field: _number(product, names) for field, names in CHARGE_FIELDS.items()}
+        )
+
+
+class Catalog:
+    """
+    Product rates indexed by lower-cased name.
+
+    Compiling a product list once replaces the per-order linear search and
+    per-field probing: find() is a dict lookup for exact names and only
+    falls back to a substring scan for partial names.
+    """
+
+    def __init__(self, product_data):
+        self._by_name = {}
+        self._rates = []
+        for product in product_data:
+            if not isinstance(product, dict) or not product.get('name'):
+                continue
+            rates = ProductRates.from_product(product)
+            self._rates.append(rates)
+            for field in ('name',) + ALTERNATE_NAME_FIELDS:
+                name = product.get(field)
+                if name:
+                    self._by_name.setdefault(str(name).lower(), rates)
+
+    def __len__(self):
+        return len(self._rates)
+
+    def find(self, product_name):
+        key = product_name.lower()
+        rates = self._by_name.get(key)
+        if rates is None:
+            rates = next((rates for rates in self._rates if key in rates.name.lower()), None)
+        return rates
+
+
+class GSTOnTaxableValue:
+    """GST on the discounted goods plus installation, service, shipping and handling"""
+
+    name = 'taxable_value'
+
+    def taxable_paise(self, line):
+        return line.subtotal_paise + line.installation_paise + line.service_paise + line.shipping_paise + line.handling_paise
+
+
+class GSTOnGoods:
+    """GST on the discounted goods only; charges are billed without tax"""
+
+    name = 'goods'
+
+    def taxable_paise(self, line):
+        return line.subtotal_paise
+
+
+TAX_RULES = {rule.name: rule for rule in (GSTOnTaxableValue(), GSTOnGoods())}
+DEFAULT_TAX_RULE = GSTOnTaxableValue.name
+
+
+class BillingLine(RupeeTotals):
+    """A quantity of a product at a discount, with the amounts BillingEngine.price() derived for it"""
+
+    __slots__ = ('rates', 'quantity', 'discount', 'taxable_paise') + TOTAL_PAISE_FIELDS
+
+    def __init__(self, rates, quantity, discount=0):
+        self.rates = rates
+        self.quantity = quantity
+        self.discount = discount
+
+    name = property(lambda self: self.rates.name)
+    unit_price = property(lambda self: self.rates.unit_price)
+    gst_rate = property(lambda self: self.rates.gst_rate)
+    installation_charge = property(lambda self: self.rates.installation_charge)
+    service_charge = property(lambda self: self.rates.service_charge)
+    shipping_charge = property(lambda self: self.rates.shipping_charge)
+    handling_fee = property(lambda self: self.rates.handling_fee)
+
+    @property
+    def discounted_price(self):
+        """Unit price after the line discount, for display (amounts use the line subtotal)"""
+        return to_rupees(percent_of(self.rates.unit_price_paise, BASIS_POINTS - to_basis_points(self.discount)))
+
+    def to_item(self):
+        """Invoice item dict, as read by the invoice template and DatabaseManager.invoice_lines"""
+        return {
+            'name': self.name,
+            'qty': self.quantity,
+            'unit_price': self.unit_price,
+            'discount': self.discount,
+            'discounted_price': self.discounted_price,
+            'installation_charge': self.installation,
+            'service_charge': self.service,
+            'shipping_charge': self.shipping,
+            'handling_fee': self.handling,
+            'gst_rate': self.gst_rate,
+            'item_gst': self.gst,
+            'total_amount': self.total,
+            'unit_price_paise': self.rates.unit_price_paise,
+            'total_amount_paise': self.total_paise
+        }
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, qty={self.quantity}, discount={self.discount})"
+
+
+class BillingEngine:
+    """
+    The one place invoice amounts are calculated.
+
+    The cart views, the chat invoice preview and the final invoice all price
+    lines with price() and total them with invoice(), so a preview always
+    shows what the invoice will charge. How GST is applied is a pluggable
+    tax rule (TAX_RULES); the default taxes the goods and charges together,
+    as the generated invoices always have.
+    """
+
+    def __init__(self, tax_rule=DEFAULT_TAX_RULE):
+        self.tax_rule = TAX_RULES[tax_rule] if isinstance(tax_rule, str) else tax_rule
+
+    def line(self, product, quantity, discount=0, line_class=BillingLine):
+        """Priced line for a catalog record (or ProductRates)"""
+        rates = product if isinstance(product, ProductRates) else ProductRates.from_product(product)
+        line = line_class(rates, quantity, discount)
+        self.price(line)
+        return line
+
+    def price(self, line):
+        """
+        (Re)compute the derived amounts of a line after its quantity or discount changed.
+
+        Everything is integer paise. The discount is rounded once on the line
+        subtotal (not per unit) and GST once on the line's taxable amount.
+        """
+        rates = line.rates
+        quantity = line.quantity
+        line.subtotal_paise = percent_of(rates.unit_price_paise * quantity, BASIS_POINTS - to_basis_points(line.discount))
+        line.installation_paise = rates.installation_charge_paise * quantity
+        line.service_paise = rates.service_charge_paise * quantity
+        line.shipping_paise = rates.shipping_charge_paise * quantity
+        line.handling_paise = rates.handling_fee_paise * quantity
+        line.taxable_paise = self.tax_rule.taxable_paise(line)
+        line.gst_paise = percent_of(line.taxable_paise, rates.gst_basis_points)
+        line.total_paise = (line.subtotal_paise + line.installation_paise + line.service_paise + line.shipping_paise
+                            + line.handling_paise + line.gst_paise)
+        return line
+
+    def summary(self, totals, overall_discount=0, gst_rate=DEFAULT_GST_RATE):
+        """
+        Invoice summary from an object carrying TOTAL_PAISE_FIELDS summed over
+        the lines (e.g. a Cart). The overall discount is rounded once, on the
+        cart total; every amount is given in rupees and as <key>_paise.
+        """
+        total = totals.total_paise
+        overall_discount_paise = percent_of(total, to_basis_points(overall_discount)) if overall_discount > 0 else 0
+        amounts = {
+            'subtotal': totals.subtotal_paise,
+            'total_installation': totals.installation_paise,
+            'total_service': totals.service_paise,
+            'total_shipping': totals.shipping_paise,
+            'total_handling': totals.handling_paise,
+            'total_ex_gst': total - totals.gst_paise,
+            'total_gst': totals.gst_paise,
+            'total_incl_gst': total,
+            'overall_discount_amount': overall_discount_paise,
+            'grand_total': total - overall_discount_paise
+        }
+        summary = {key: to_rupees(paise) for key, paise in amounts.items()}
+        summary.update({f'{key}_paise': paise for key, paise in amounts.items()})
+        summary.update(gst_rate=gst_rate, overall_discount=overall_discount, tax_rule=self.tax_rule.name)
+        return summary
+
+    def invoice(self, lines, overall_discount=0, totals=None):
+        """
+        Invoice dict ({'items', 'summary'}) for priced lines.
+
+        totals carries TOTAL_PAISE_FIELDS already summed over the lines (a
+        Cart keeps them as running totals); without it they are summed here.
+        """
+        lines = list(lines)
+        if totals is None:
+            totals = SimpleNamespace(**{field: sum(getattr(line, field) for line in lines)
+                                        for field in TOTAL_PAISE_FIELDS})
+        gst_rates = {line.gst_rate for line in lines}
+        gst_rate = gst_rates.pop() if len(gst_rates) == 1 else DEFAULT_GST_RATE
+
+        return {
+            'items': [line.to_item() for line in lines],
+            'summary': self.summary(totals, overall_discount, gst_rate)
+        }
+
+    def order_lines(self, user_order, catalog, discounts=None):
+        """Priced lines for {product_name: quantity}; products missing from the catalog are skipped"""
+        discounts = discounts or {}
+        lines = []
+        for product_name, quantity in user_order.items():
+            rates = catalog.find(product_name)
+            if rates is None:
+                logger.warning("Product '%s' not found in catalog", product_name)
+                continue
+            lines.append(self.line(rates, quantity, discounts.get(product_name, 0)))
+        return lines
+
+    def calculate_invoice(self, user_order, product_data, discounts=None, overall_discount=0):
+        """Invoice dict for {product_name: quantity} against a product list (or compiled Catalog)"""
+        catalog = product_data if isinstance(product_data, Catalog) else Catalog(product_data)
+        return self.invoice(self.order_lines(user_order, catalog, discounts), overall_discount)
@@ -0,0 +1,133 @@
+from datetime import datetime
+
+from billing_engine import BillingLine, RupeeTotals, TOTAL_PAISE_FIELDS
+
+
+class CartLine(BillingLine):
+    """
+    One product in a cart.
+
+    Charges and the GST rate are copied from the catalog when the product is
+    added; the derived amounts (discounted price, subtotal, per-charge totals,
+    GST, total) are recomputed by the cart's BillingEngine only when quantity
+    or discount change.
+    """
+
+    __slots__ = ('added_time',)
+
+    def __init__(self, rates, quantity, discount=0):
+        super().__init__(rates, quantity, discount)
+        self.added_time = datetime.now().isoformat()
+
+    def to_dict(self):
+        return dict(self.to_item(), added_time=self.added_time)
+
+
+class Cart(RupeeTotals):
+    """
+    Cart lines keyed by product name, with running totals in integer paise.
+
+    Every change goes through add/remove/set_discount/clear, which adjust
+    the cart totals by the changed line only, so reading subtotal, the
+    per-charge totals, GST or total never iterates the lines, and being
+    integers they never drift from the sum of the lines. invoice() hands
+    those totals to the engine instead of recomputing them.
+    """
+
+    __slots__ = ('engine', '_lines') + TOTAL_PAISE_FIELDS
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lines = {}
+        self._reset_totals()
+
+    def _reset_totals(self):
+        for field in TOTAL_PAISE_FIELDS:
+            setattr(self, field, 0)
+
+    def _apply(self, line, sign):
+        for field in TOTAL_PAISE_FIELDS:
+            setattr(self, field, getattr(self, field) + sign * getattr(line, field))
+
+    def _change(self, line, quantity=None, discount=None):
+        self._apply(line, -1)
+        if quantity is not None:
+            line.quantity = quantity
+        if discount is not None:
+            line.discount = discount
+        self.engine.price(line)
+        self._apply(line, 1)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __contains__(self, name):
+        return name in self._lines
+
+    def __repr__(self):
+        return f"Cart({list(self._lines.values())!r}, total={self.total:.2f})"
+
+    def get(self, name):
+        return self._lines.get(name)
+
+    def find(self, name):
+        """Line whose product name equals name (case-insensitive), else the first that contains it"""
+        name = name.lower()
+        for line in self._lines.values():
+            if line.name.lower() == name:
+                return line
+        for line in self._lines.values():
+            if name in line.name.lower():
+                return line
+        return None
+
+    def add(self, product, quantity, discount=0):
+        """Add quantity of a catalog product; a non-zero discount replaces the line's discount
+
+        Returns (line, is_new_line).
+        """
+        line = self._lines.get(product['name'])
+        if line:
+            self._change(line, quantity=line.quantity + quantity, discount=discount if discount > 0 else None)
+            return line, False
+
+        line = self.engine.line(product, quantity, discount, line_class=CartLine)
+        self._lines[line.name] = line
+        self._apply(line, 1)
+        return line, True
+
+    def remove(self, name, quantity=None):
+        """Remove quantity units of a line (all of it if quantity is None or covers it)
+
+        Returns the remaining line, or None if the line was removed.
+        """
+        line = self._lines[name]
+        if quantity is None or quantity >= line.quantity:
+            del self._lines[name]
+            self._apply(line, -1)
+            return None
+
+        self._change(line, quantity=line.quantity - quantity)
+        return line
+
+    def set_discount(self, name, discount):
+        self._change(self._lines[name], discount=discount)
+        return self._lines[name]
+
+    def clear(self):
+        self._lines.clear()
+        self._reset_totals()
+
+    def summary(self, overall_discount=0):
+        """Invoice summary of the cart, from the running totals"""
+        return self.engine.summary(self, overall_discount)
+
+    def invoice(self, overall_discount=0):
+        """Invoice dict for the cart, using the running totals"""
+        return self.engine.invoice(self._lines.values(), overall_discount, totals=self)
+
+    def to_dict(self):
+        return {line.name: line.to_dict() for line in self._lines.values()}
@@ -0,0 +1,280 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from collections.abc import MutableSequence
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CATSNAP1'
+FORMAT_VERSION = 1
+# magic, directory length, data start
+HEADER = struct.Struct('<8sIQ')
+ALIGNMENT = 8
+
+# Per-row value tags, one byte per row and column
+MISSING, INT, FLOAT, STRING, JSON = range(5)
+# Integers stored in the float64 column must round-trip exactly
+MAX_EXACT_INT = 2 ** 53
+
+
+def source_signature(source_path):
+    """mtime and size of the source file, recorded in the snapshot to detect a stale one"""
+    stat = os.stat(source_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _tag(value):
+    if isinstance(value, bool) or value is None:
+        return JSON
+    if isinstance(value, int):
+        return INT if -MAX_EXACT_INT <= value <= MAX_EXACT_INT else JSON
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, str):
+        return STRING
+    return JSON
+
+
+def write_snapshot(products, path, source=None):
+    """
+    Write products (a list of flat dicts) to a columnar snapshot at path.
+
+    Each key becomes a column: a tag byte per row (missing, int, float,
+    string or JSON), a float64 array for numeric values and, for text, a
+    uint64 offsets array into a UTF-8 blob. Arrays are 8-byte aligned in
+    native byte order so readers can cast them straight out of the mapping.
+    The file is written next to path and renamed over it, so workers that
+    already mapped the old file keep reading it unchanged.
+    """
+    columns = []
+    for product in products:
+        for key in product:
+            if key not in columns:
+                columns.append(key)
+    rows = len(products)
+
+    sections = []
+    offset = 0
+
+    def add_section(data):
+        nonlocal offset
+        start = offset
+        padding = -len(data) % ALIGNMENT
+        sections.append(data + b'\0' * padding)
+        offset += len(data) + padding
+        return start
+
+    directory = []
+    for column in columns:
+        tags = bytearray(rows)
+        numbers = [0.0] * rows
+        text_offsets = [0] * (rows + 1)
+        blob = bytearray()
+        for index, product in enumerate(products):
+            if column in product:
+                value = product[column]
+                tag = tags[index] = _tag(value)
+                if tag in (INT, FLOAT):
+                    numbers[index] = float(value)
+                elif tag == STRING:
+                    blob += value.encode('utf-8')
+                elif tag == JSON:
+                    blob += json.dumps(value).encode('utf-8')
+            text_offsets[index + 1] = len(blob)
+
+        has_numbers = any(tag in (INT, FLOAT) for tag in tags)
+        has_text = bool(blob) or any(tag in (STRING, JSON) for tag in tags)
+        directory.append({
+            'name': column,
+            'tags': add_section(bytes(tags)),
+            'numbers': add_section(struct.pack(f'={rows}d', *numbers)) if has_numbers else None,
+            'offsets': add_section(struct.pack(f'={rows + 1}Q', *text_offsets)) if has_text else None,
+            'blob': add_section(bytes(blob)) if has_text else None,
+            'blob_size': len(blob)
+        })
+
+    meta = json.dumps({
+        'version': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'rows': rows,
+        'source': source,
+        'columns': directory
+    }).encode('utf-8')
+    data_start = HEADER.size + len(meta)
+    data_start += -data_start % ALIGNMENT
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(meta), data_start))
+        f.write(meta)
+        f.write(b'\0' * (data_start - HEADER.size - len(meta)))
+        for section in sections:
+            f.write(section)
+    os.replace(temp_path, path)
+
+
+class CatalogSnapshot(MutableSequence):
+    """
+    A product list backed by a read-only memory-mapped snapshot file.
+
+    Every worker that opens the same file shares its pages through the OS
+    page cache instead of holding its own parsed copy, and opening one
+    costs a header read rather than a JSON parse. Indexing and iteration
+    build plain dicts from the columns on the fly, so callers (including
+    isinstance(product, dict) checks and jsonify) see the same products as
+    from json.load; column(name) reads a single column without building
+    rows.
+
+    The snapshot is copy-on-write: the first assignment, deletion or
+    insert materialises the rows into an in-process list, which is used
+    from then on. save_products() writes both product_data.json and a
+    fresh snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rows = None  # Materialised list after the first write
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, meta_size, data_start = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a catalog snapshot")
+            meta = json.loads(self._map[HEADER.size:HEADER.size + meta_size])
+            if meta['version'] != FORMAT_VERSION or meta['byteorder'] != sys.byteorder:
+                raise ValueError(f"{path} was written by an incompatible version or platform")
+            self.source = meta.get('source')
+            self._length = meta['rows']
+            data = memoryview(self._map)[data_start:]
+            self._columns = []
+            for column in meta['columns']:
+                rows = self._length
+                tags = data[column['tags']:column['tags'] + rows]
+                numbers = (data[column['numbers']:column['numbers'] + rows * 8].cast('d')
+                           if column['numbers'] is not None else None)
+                offsets = (data[column['offsets']:column['offsets'] + (rows + 1) * 8].cast('Q')
+                           if column['offsets'] is not None else None)
+                blob = (data[column['blob']:column['blob'] + column['blob_size']]
+                        if column['blob'] is not None else None)
+                self._columns.append((column['name'], tags, numbers, offsets, blob))
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def mapped_bytes(self):
+        """Size of the mapping, shared between every process that opened the file"""
+        return len(self._map) if self._map is not None else 0
+
+    @property
+    def materialized(self):
+        return self._rows is not None
+
+    def close(self):
+        """Release the mapping; only safe once nothing reads the snapshot rows any more"""
+        self._columns = []
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # Views still exported; the mapping is released with them
+            self._map = None
+
+    @staticmethod
+    def _value(tag, index, numbers, offsets, blob):
+        if tag == INT:
+            return int(numbers[index])
+        if tag == FLOAT:
+            return numbers[index]
+        text = str(blob[offsets[index]:offsets[index + 1]], 'utf-8')
+        return text if tag == STRING else json.loads(text)
+
+    def _row(self, index):
+        row = {}
+        for name, tags, numbers, offsets, blob in self._columns:
+            tag = tags[index]
+            if tag != MISSING:
+                row[name] = self._value(tag, index, numbers, offsets, blob)
+        return row
+
+    def column(self, name, default=None):
+        """Every row's value for one column (default where a row lacks it)"""
+        if self._rows is not None:
+            return [row.get(name, default) for row in self._rows]
+        for column_name, tags, numbers, offsets, blob in self._columns:
+            if column_name == name:
+                return [self._value(tag, index, numbers, offsets, blob) if tag != MISSING else default
+                        for index, tag in enumerate(tags)]
+        return [default] * self._length
+
+    def __len__(self):
+        return len(self._rows) if self._rows is not None else self._length
+
+    def __getitem__(self, index):
+        if self._rows is not None:
+            return self._rows[index]
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('catalog index out of range')
+        return self._row(index)
+
+    def __iter__(self):
+        if self._rows is not None:
+            return iter(self._rows)
+        return (self._row(index) for index in range(self._length))
+
+    def _materialize(self):
+        if self._rows is None:
+            self._rows = [self._row(index) for index in range(self._length)]
+        return self._rows
+
+    def __setitem__(self, index, value):
+        self._materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    def __repr__(self):
+        state = 'materialized' if self._rows is not None else 'mapped'
+        return f"<CatalogSnapshot {self.path} {len(self)} products, {state}>"
+
+
+def load_catalog(source_path, snapshot_path):
+    """
+    Products from source_path (JSON) through the snapshot at snapshot_path.
+
+    The snapshot is rebuilt when it is missing, unreadable or was written
+    from a different version of the source file (by mtime and size);
+    otherwise the JSON is not parsed at all.
+    """
+    signature = source_signature(source_path)
+    if os.path.exists(snapshot_path):
+        try:
+            snapshot = CatalogSnapshot(snapshot_path)
+            if snapshot.source == signature:
+                return snapshot
+            snapshot.close()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Rebuilding unreadable catalog snapshot %s: %s", snapshot_path, e)
+
+    with open(source_path, 'r') as f:
+        products = json.load(f)
+    write_snapshot(products, snapshot_path, source=signature)
+    logger.info("Wrote catalog snapshot %s (%s products)", snapshot_path, len(products))
+    return CatalogSnapshot(snapshot_path)
+
+
+def catalog_column(products, name, default=None):
+    """One column of a product list; a catalog snapshot reads it without building rows"""
+    if isinstance(products, CatalogSnapshot):
+        return products.column(name, default)
+    return [product.get(name, default) for product in products]
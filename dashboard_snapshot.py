@@ -0,0 +1,294 @@
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def growth_percent(current, previous):
+    """Percent change from previous to current, to one decimal (0.0 without a previous value)"""
+    return round((current - previous) / previous * 100, 1) if previous > 0 else 0.0
+
+
+class DashboardSnapshot:
+    """
+    In-memory dashboard metrics.
+
+    Each scope (None = every user, or a single username) is loaded from the
+    database on first use and afterwards kept current by the record_* event
+    methods, so dashboard reads do not touch SQLite. Every event pushes a
+    delta to the registered publishers (the Socket.IO 'dashboard_updates'
+    room in app0.py).
+
+    Daily sales are kept for two windows so growth compares the last
+    window_days with the window_days before them.
+
+    Each process holds its own snapshot, so with several workers an event is
+    only applied in the worker that handled it. The snapshot is therefore
+    reloaded after ttl_seconds to pick up changes made elsewhere.
+    """
+
+    def __init__(self, db_manager, ttl_seconds=300, window_days=30, top_n=5):
+        self.db_manager = db_manager
+        self.ttl_seconds = ttl_seconds
+        self.window_days = window_days
+        self.top_n = top_n
+        self._lock = threading.RLock()
+        self._publishers = []
+        self._activity = deque(maxlen=20)
+        self._reset()
+
+    def _reset(self):
+        self._views = {}
+        self._product_sales = None
+        self._total_users = None
+        self._new_users = None
+        self._loaded_at = time.time()
+
+    def subscribe(self, publisher):
+        """Register a callable that receives every delta"""
+        self._publishers.append(publisher)
+
+    def invalidate(self):
+        """Drop all cached metrics; the next read reloads from the database"""
+        with self._lock:
+            self._reset()
+
+    # Lazy loading
+    def _view(self, scope):
+        if time.time() - self._loaded_at > self.ttl_seconds:
+            self._reset()
+
+        view = self._views.get(scope)
+        if view is None:
+            today = datetime.now()
+            window_start = (today - timedelta(days=2 * self.window_days - 1)).strftime('%Y-%m-%d')
+            revenue, count = self.db_manager.get_invoice_totals(username=scope)
+            daily = self.db_manager.get_daily_sales(window_start, today.strftime('%Y-%m-%d'), scope)
+            view = {
+                'total_revenue': revenue,
+                'total_invoices': count,
+                'daily': {date: {'revenue': row['revenue'], 'orders': row['invoice_count']}
+                          for date, row in daily.items()},
+                'latest_invoice': self.db_manager.get_latest_invoice(scope)
+            }
+            self._views[scope] = view
+        return view
+
+    def _products(self):
+        if self._product_sales is None:
+            self._product_sales = {
+                name: {'units_sold': row['units_sold'], 'revenue': row['revenue']}
+                for name, row in self.db_manager.get_product_sales().items()
+            }
+        return self._product_sales
+
+    def _users(self):
+        if self._total_users is None:
+            self._total_users = self.db_manager.get_user_count()
+        return self._total_users
+
+    def _recent_users(self):
+        """Users created in the last window_days"""
+        if self._new_users is None:
+            window_start = (datetime.now() - timedelta(days=self.window_days - 1)).strftime('%Y-%m-%d')
+            self._new_users = sum(self.db_manager.get_user_registrations_by_day(window_start).values())
+        return self._new_users
+
+    # Reads
+    def get_metrics(self, scope=None):
+        """Return a copy of the current metrics for a scope"""
+        with self._lock:
+            view = self._view(scope)
+            now = datetime.now()
+            labels = [(now - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(self.window_days - 1, -1, -1)]
+            daily = view['daily']
+            today = daily.get(labels[-1], {'revenue': 0, 'orders': 0})
+            current = self._window_totals(daily, labels[0], labels[-1])
+            previous = self._window_totals(daily, (now - timedelta(days=2 * self.window_days - 1)).strftime('%Y-%m-%d'),
+                                           (now - timedelta(days=self.window_days)).strftime('%Y-%m-%d'))
+            total_users = self._users()
+
+            return {
+                'total_revenue': view['total_revenue'],
+                'total_invoices': view['total_invoices'],
+                'revenue_growth': growth_percent(current['revenue'], previous['revenue']),
+                'orders_growth': growth_percent(current['orders'], previous['orders']),
+                'today_revenue': today['revenue'],
+                'today_orders': today['orders'],
+                'latest_invoice': dict(view['latest_invoice']) if view['latest_invoice'] else None,
+                'revenue_chart': {
+                    'labels': labels,
+                    'data': [daily[date]['revenue'] if date in daily else 0 for date in labels]
+                },
+                'top_products': self._top_products(),
+                'total_users': total_users,
+                'users_growth': growth_percent(total_users, total_users - self._recent_users()),
+                'activity': self._recent_activity(now)
+            }
+
+    @staticmethod
+    def _window_totals(daily, start, end):
+        days = [totals for date, totals in daily.items() if start <= date <= end]
+        return {'revenue': sum(day['revenue'] for day in days), 'orders': sum(day['orders'] for day in days)}
+
+    def _top_products(self):
+        sold = ((name, sales) for name, sales in self._products().items() if sales['units_sold'] > 0)
+        return [
+            {'name': name, 'units_sold': sales['units_sold'], 'revenue': round(sales['revenue'], 2)}
+            for name, sales in heapq.nlargest(self.top_n, sold, key=lambda entry: entry[1]['units_sold'])
+        ]
+
+    def _recent_activity(self, now, limit=5):
+        return [
+            {'icon': entry['icon'], 'text': entry['text'], 'time': _time_ago(now - entry['at'])}
+            for entry in list(self._activity)[:limit]
+        ]
+
+    # Events
+    def record_invoice(self, invoice_number, client_name, amount, date, username, lines=()):
+        """Apply a newly saved invoice (already committed to the database)"""
+        with self._lock:
+            latest = {'invoice_number': invoice_number, 'client_name': client_name, 'amount': amount, 'date': date}
+
+            for scope in {None, username}:
+                view = self._views.get(scope)
+                if view is None:
+                    continue  # Loaded lazily later, already including this invoice
+                view['total_revenue'] += amount
+                view['total_invoices'] += 1
+                day = view['daily'].setdefault(date, {'revenue': 0, 'orders': 0})
+                day['revenue'] += amount
+                day['orders'] += 1
+                view['latest_invoice'] = latest
+                self._prune(view)
+
+            if self._product_sales is not None:
+                for line in lines:
+                    sales = self._product_sales.setdefault(line['product_name'], {'units_sold': 0, 'revenue': 0})
+                    sales['units_sold'] += line['quantity']
+                    sales['revenue'] += line['revenue']
+
+            self._add_activity('fas fa-file-invoice-dollar', f'Invoice {invoice_number} generated for {client_name}')
+
+            view = self._view(None)
+            today = view['daily'].get(date, {'revenue': 0, 'orders': 0})
+            delta = {
+                'event': 'invoice',
+                'total_revenue': view['total_revenue'],
+                'total_invoices': view['total_invoices'],
+                'today_revenue': today['revenue'],
+                'today_orders': today['orders'],
+                'latest_invoice': dict(latest),
+                'revenue_point': {'date': date, 'revenue': today['revenue']},
+                'top_products': self._top_products()
+            }
+        self._publish(delta)
+
+    def record_user_created(self, username):
+        self._record_user_change(username, 1, 'fas fa-user-plus', f'New user {username} registered')
+
+    def record_users_imported(self, usernames):
+        self._record_user_change(None, len(usernames), 'fas fa-users', f'{len(usernames)} users imported')
+
+    def record_user_deleted(self, username):
+        self._record_user_change(username, -1, 'fas fa-user-minus', f'User {username} deleted')
+
+    def _record_user_change(self, username, change, icon, text):
+        with self._lock:
+            if self._total_users is not None:
+                self._total_users += change
+            if self._new_users is not None and change > 0:
+                # A deleted user's creation date is unknown here; the TTL reload corrects the count
+                self._new_users += change
+            self._add_activity(icon, text)
+            delta = {'event': 'user', 'username': username, 'total_users': self._users()}
+        self._publish(delta)
+
+    def record_product_event(self, action, product_name, total_products):
+        """Record a catalog change; action is 'added', 'updated' or 'deleted'"""
+        icons = {'added': 'fas fa-box', 'updated': 'fas fa-edit', 'deleted': 'fas fa-trash'}
+        with self._lock:
+            self._add_activity(icons.get(action, 'fas fa-box'), f'Product {product_name} {action}')
+            delta = {'event': 'product', 'action': action, 'product': product_name, 'total_products': total_products}
+        self._publish(delta)
+
+    def _add_activity(self, icon, text):
+        self._activity.appendleft({'icon': icon, 'text': text, 'at': datetime.now()})
+
+    def _prune(self, view):
+        window_start = (datetime.now() - timedelta(days=2 * self.window_days - 1)).strftime('%Y-%m-%d')
+        for date in [date for date in view['daily'] if date < window_start]:
+            del view['daily'][date]
+
+    def _publish(self, delta):
+        delta['timestamp'] = datetime.now().isoformat()
+        for publisher in self._publishers:
+            try:
+                publisher(delta)
+            except Exception as e:
+                logger.warning("Error publishing dashboard update: %s", e)
+
+
+class CartAddCounter:
+    """
+    Cart-add counts for product_sales, batched in memory.
+
+    Cart adds happen on the chat path, so add() only bumps a counter; the
+    pending counts are written in one transaction by flush(), which runs
+    on the next add once flush_interval seconds have passed or max_pending
+    adds are waiting, and is also called after each invoice save and before
+    the counts are read. A failed flush keeps the counts for the next one.
+    """
+
+    def __init__(self, db_manager, flush_interval=30, max_pending=500):
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flushed_at = time.time()
+
+    @property
+    def pending(self):
+        """Number of adds not yet written"""
+        with self._lock:
+            return sum(self._pending.values())
+
+    def add(self, product_name):
+        with self._lock:
+            self._pending[product_name] += 1
+            due = (time.time() - self._flushed_at >= self.flush_interval
+                   or sum(self._pending.values()) >= self.max_pending)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending counts; returns the number of adds written"""
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+            self._flushed_at = time.time()
+        if not counts:
+            return 0
+        try:
+            self.db_manager.record_cart_adds(counts)
+        except Exception as e:
+            logger.error("Error recording cart adds: %s", e)
+            with self._lock:
+                self._pending.update(counts)
+            return 0
+        return sum(counts.values())
+
+
+def _time_ago(elapsed):
+    """Format a timedelta like '5 minutes ago'"""
+    seconds = int(elapsed.total_seconds())
+    if seconds < 60:
+        return 'just now'
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size:
+            count = seconds // size
+            return f"{count} {unit}{'s' if count != 1 else ''} ago"
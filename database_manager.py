@@ -1,14 +1,55 @@
 import sqlite3
 import uuid
+import base64
+import hashlib
 from datetime import datetime
 from werkzeug.security import generate_password_hash
+from billing_engine import allocate
 import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever init_database gains new tables, columns or indexes
+SCHEMA_VERSION = 9
+
+# Profile columns used by the admin user management API (added to older databases by migration)
+USER_PROFILE_COLUMNS = {
+    'email': 'TEXT',
+    'full_name': 'TEXT',
+    'phone': 'TEXT',
+    'department': 'TEXT',
+    'status': "TEXT NOT NULL DEFAULT 'active'",
+    'must_change_password': 'BOOLEAN DEFAULT 0',
+    'created_by': 'TEXT'
+}
+
+# Columns returned by the admin user list, and the ones it may be sorted by
+USER_LIST_FIELDS = ('id', 'username', 'email', 'full_name', 'phone', 'department', 'role', 'status',
+                    'must_change_password', 'created_at', 'last_login', 'created_by')
+USER_SORT_COLUMNS = {'created_at', 'last_login', 'username', 'full_name', 'email', 'department', 'role', 'status'}
+
+def encode_page_cursor(*values):
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def content_hash(content):
+    """Hash of a message body, indexed for duplicate checks instead of the full text"""
+    return hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+
+def decode_page_cursor(cursor):
+    """Decode a cursor from encode_page_cursor; raises ValueError if malformed"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
 class DatabaseManager:
-    def __init__(self, db_path='invoices.db'):
+    def __init__(self, db_path='invoices.db', initialize=True):
         self.db_path = db_path
-        self.init_database()
+        if initialize:
+            self.init_database()
     
     def get_connection(self):
         """Get database connection with row factory for dict-like access"""
@@ -16,13 +57,21 @@ class DatabaseManager:
         conn.row_factory = sqlite3.Row
         return conn
     
+    def get_schema_version(self):
+        """Schema version recorded by the last init_database run (0 if never run)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+    
     def init_database(self):
         """Initialize database with all required tables and indexes"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            print("🔄 Initializing database...")
+            logger.info("Initializing database...")
             
             # Check if this is an existing database
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users';")
@@ -32,18 +81,19 @@ class DatabaseManager:
             chat_table_exists = cursor.fetchone() is not None
             
             if users_table_exists or chat_table_exists:
-                print("📂 Existing database detected, performing migration...")
-                self._migrate_existing_database(cursor)
+                logger.info("Existing database detected, performing migration...")
+                self._migrate_existing_database(cursor, cursor.execute('PRAGMA user_version').fetchone()[0])
             else:
-                print("🆕 Creating new database...")
+                logger.info("Creating new database...")
                 self._create_fresh_database(cursor)
             
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
             conn.commit()
-            print("✅ Database initialized successfully")
+            logger.info("Database initialized successfully")
             
         except Exception as e:
             conn.rollback()
-            print(f"❌ Error initializing database: {e}")
+            logger.error("Error initializing database: %s", e)
             raise
         finally:
             conn.close()
@@ -57,6 +107,13 @@ class DatabaseManager:
                 username TEXT UNIQUE NOT NULL,
                 password TEXT NOT NULL,
                 role TEXT NOT NULL DEFAULT 'user' CHECK(role IN ('user', 'admin')),
+                email TEXT,
+                full_name TEXT,
+                phone TEXT,
+                department TEXT,
+                status TEXT NOT NULL DEFAULT 'active',
+                must_change_password BOOLEAN DEFAULT 0,
+                created_by TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_login TIMESTAMP
             )
@@ -72,6 +129,7 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 is_active BOOLEAN DEFAULT 1,
+                message_count INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (username) REFERENCES users (username) ON DELETE CASCADE
             )
         ''')
@@ -86,6 +144,7 @@ class DatabaseManager:
                 content TEXT NOT NULL,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 metadata TEXT, -- JSON for additional data
+                content_hash TEXT,
                 FOREIGN KEY (chat_id) REFERENCES chat_history (chat_id) ON DELETE CASCADE,
                 FOREIGN KEY (username) REFERENCES users (username) ON DELETE CASCADE
             )
@@ -102,18 +161,25 @@ class DatabaseManager:
                 pdf_path TEXT,
                 username TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                file_path TEXT,
+                file_size INTEGER,
+                file_hash TEXT,
+                amount_paise INTEGER,
                 FOREIGN KEY (username) REFERENCES users (username)
             )
         ''')
         
+        # Invoice line items and sales rollups
+        self._create_sales_tables(cursor)
+        
         # Create indexes
         self._create_indexes(cursor)
         
         # Seed default users
         self._seed_default_users(cursor)
     
-    def _migrate_existing_database(self, cursor):
-        """Migrate existing database to new schema"""
+    def _migrate_existing_database(self, cursor, previous_version=0):
+        """Migrate existing database (at schema previous_version) to new schema"""
         # First, let's check what columns exist in existing tables
         cursor.execute("PRAGMA table_info(users)")
         users_columns = [column[1] for column in cursor.fetchall()]
@@ -123,14 +189,19 @@ class DatabaseManager:
         
         # Migrate users table
         if 'created_at' not in users_columns:
-            print("🔄 Adding missing columns to users table...")
-            cursor.execute('ALTER TABLE users ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+            logger.info("Adding missing columns to users table...")
+            # SQLite cannot ADD COLUMN with a CURRENT_TIMESTAMP default, so backfill instead
+            cursor.execute('ALTER TABLE users ADD COLUMN created_at TIMESTAMP')
+            cursor.execute('UPDATE users SET created_at = ? WHERE created_at IS NULL', (datetime.now().isoformat(),))
         if 'last_login' not in users_columns:
             cursor.execute('ALTER TABLE users ADD COLUMN last_login TIMESTAMP')
+        for column_name, column_definition in USER_PROFILE_COLUMNS.items():
+            if column_name not in users_columns:
+                cursor.execute(f'ALTER TABLE users ADD COLUMN {column_name} {column_definition}')
         
         # Handle chat_history table migration
         if 'created_at' not in chat_columns:
-            print("🔄 Migrating chat_history table...")
+            logger.info("Migrating chat_history table...")
             
             # Check if old messages column exists (needs complex migration)
             if 'messages' in chat_columns:
@@ -145,7 +216,7 @@ class DatabaseManager:
         # Create messages table if it doesn't exist
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='messages';")
         if not cursor.fetchone():
-            print("🔄 Creating messages table...")
+            logger.info("Creating messages table...")
             cursor.execute('''
                 CREATE TABLE messages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -160,6 +231,24 @@ class DatabaseManager:
                 )
             ''')
         
+        # Maintained message counter (replaces a COUNT(*) subquery per chat)
+        cursor.execute("PRAGMA table_info(chat_history)")
+        if 'message_count' not in [column[1] for column in cursor.fetchall()]:
+            logger.info("Adding message_count column to chat_history table...")
+            cursor.execute('ALTER TABLE chat_history ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0')
+            cursor.execute('''
+                UPDATE chat_history
+                SET message_count = (SELECT COUNT(*) FROM messages WHERE messages.chat_id = chat_history.chat_id)
+            ''')
+        
+        # Hash column for the duplicate-message check
+        cursor.execute("PRAGMA table_info(messages)")
+        if 'content_hash' not in [column[1] for column in cursor.fetchall()]:
+            logger.info("Adding content_hash column to messages table...")
+            cursor.execute('ALTER TABLE messages ADD COLUMN content_hash TEXT')
+            cursor.connection.create_function('content_hash', 1, content_hash)
+            cursor.execute('UPDATE messages SET content_hash = content_hash(content)')
+        
         # Update invoices table if needed
         cursor.execute("PRAGMA table_info(invoices)")
         invoice_columns = [column[1] for column in cursor.fetchall()]
@@ -167,6 +256,24 @@ class DatabaseManager:
             cursor.execute('ALTER TABLE invoices ADD COLUMN username TEXT')
         if 'created_at' not in invoice_columns:
             cursor.execute('ALTER TABLE invoices ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+        # Stored file location (relative to the InvoiceStore root), size and SHA-256
+        for column_name, column_type in (('file_path', 'TEXT'), ('file_size', 'INTEGER'), ('file_hash', 'TEXT')):
+            if column_name not in invoice_columns:
+                cursor.execute(f'ALTER TABLE invoices ADD COLUMN {column_name} {column_type}')
+        # Exact amounts in integer paise, backfilled from the rupee amounts
+        if 'amount_paise' not in invoice_columns:
+            logger.info("Adding amount_paise column to invoices table...")
+            cursor.execute('ALTER TABLE invoices ADD COLUMN amount_paise INTEGER')
+            cursor.execute('UPDATE invoices SET amount_paise = CAST(ROUND(amount * 100) AS INTEGER) WHERE amount IS NOT NULL')
+        
+        # Create invoice line items and sales rollups if they don't exist
+        self._create_sales_tables(cursor)
+        cursor.execute("PRAGMA table_info(invoice_items)")
+        if 'line_total_paise' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE invoice_items ADD COLUMN line_total_paise INTEGER')
+            cursor.execute('UPDATE invoice_items SET line_total_paise = CAST(ROUND(line_total * 100) AS INTEGER)')
+        if previous_version < 9:
+            self._restate_product_revenue(cursor)
         
         # Create indexes (they will be ignored if they already exist)
         self._create_indexes(cursor)
@@ -178,7 +285,7 @@ class DatabaseManager:
     
     def _migrate_chat_history_with_messages(self, cursor):
         """Complex migration for chat_history table with old messages column"""
-        print("🔄 Performing complex chat_history migration...")
+        logger.info("Performing complex chat_history migration...")
         
         # Step 1: Create new chat_history table with new schema
         cursor.execute('''
@@ -244,30 +351,133 @@ class DatabaseManager:
                                 msg.get('timestamp', datetime.now().isoformat())
                             ))
                     except (json.JSONDecodeError, KeyError) as e:
-                        print(f"⚠️ Could not migrate messages for chat {chat['chat_id']}: {e}")
+                        logger.warning("Could not migrate messages for chat %s: %s", chat['chat_id'], e)
                 
                 migrated_count += 1
             except Exception as e:
-                print(f"⚠️ Error migrating chat {chat['chat_id']}: {e}")
+                logger.warning("Error migrating chat %s: %s", chat['chat_id'], e)
                 continue
         
         # Step 4: Replace old table with new one
         cursor.execute('DROP TABLE chat_history')
         cursor.execute('ALTER TABLE chat_history_new RENAME TO chat_history')
         
-        print(f"✅ Migrated {migrated_count} chats successfully")
+        logger.info("Migrated %s chats successfully", migrated_count)
+    
+    def _create_sales_tables(self, cursor):
+        """Create invoice line items and the incrementally maintained sales rollups"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='daily_sales';")
+        needs_backfill = cursor.fetchone() is None
+        
+        # One row per invoiced product line
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoice_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_id INTEGER NOT NULL,
+                product_name TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                unit_price REAL NOT NULL,
+                discount_percent REAL DEFAULT 0,
+                line_total REAL NOT NULL,
+                line_total_paise INTEGER,
+                FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # Per-product totals, updated in the same transaction as the invoice
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS product_sales (
+                product_name TEXT PRIMARY KEY,
+                units_sold INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0,
+                order_count INTEGER NOT NULL DEFAULT 0,
+                cart_adds INTEGER NOT NULL DEFAULT 0,
+                last_sold_at TIMESTAMP
+            )
+        ''')
+        
+        # Per-day, per-user totals
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_sales (
+                date TEXT NOT NULL,
+                username TEXT NOT NULL DEFAULT '',
+                revenue REAL NOT NULL DEFAULT 0,
+                invoice_count INTEGER NOT NULL DEFAULT 0,
+                units_sold INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, username)
+            )
+        ''')
+        
+        if needs_backfill:
+            # Seed the daily rollup from invoices saved before line items existed
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='invoices';")
+            if cursor.fetchone():
+                logger.info("Backfilling daily_sales from existing invoices...")
+                cursor.execute('''
+                    INSERT INTO daily_sales (date, username, revenue, invoice_count)
+                    SELECT date, COALESCE(username, ''), COALESCE(SUM(amount), 0), COUNT(*)
+                    FROM invoices
+                    WHERE date IS NOT NULL
+                    GROUP BY date, COALESCE(username, '')
+                ''')
+    
+    def _restate_product_revenue(self, cursor):
+        """Restate product_sales.revenue (summed line totals before schema 9) as each line's share of its invoice amount"""
+        logger.info("Restating product revenue net of overall discounts...")
+        cursor.execute('''
+            WITH invoice_totals AS (
+                SELECT invoice_id, SUM(line_total_paise) AS paise FROM invoice_items GROUP BY invoice_id
+            ), shares AS (
+                SELECT items.product_name,
+                       SUM(CAST(items.line_total_paise AS REAL) * invoices.amount_paise / invoice_totals.paise) / 100 AS revenue
+                FROM invoice_items AS items
+                JOIN invoices ON invoices.id = items.invoice_id
+                JOIN invoice_totals ON invoice_totals.invoice_id = items.invoice_id
+                WHERE invoice_totals.paise > 0
+                GROUP BY items.product_name
+            )
+            UPDATE product_sales
+            SET revenue = ROUND((SELECT revenue FROM shares WHERE shares.product_name = product_sales.product_name), 2)
+            WHERE product_name IN (SELECT product_name FROM shares)
+        ''')
     
     def _create_indexes(self, cursor):
-        """Create database indexes for better performance"""
+        """Create database indexes for better performance
+        
+        Each index backs specific DatabaseManager statements;
+        tests/test_query_plans.py verifies the plans.
+        """
         try:
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_username ON chat_history (username)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_created ON chat_history (created_at DESC)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_updated ON chat_history (updated_at DESC)')
+            # Keyset pagination of a user's chats (rowid is implicitly the last key column)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_user_active_created ON chat_history (username, is_active, created_at)')
+            # Message pages walk (chat_id, rowid)
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp DESC)')
+            # Duplicate-message check
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_dedup ON messages (chat_id, content_hash)')
+            # Latest invoice per user walks (username, rowid)
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_username ON invoices (username)')
+            # Covering indexes for the dashboard range/GROUP BY queries
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_user_date_amount ON invoices (username, date, amount)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_date_amount ON invoices (date, amount)')
+            # Invoice download lookup by file name
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_pdf_path ON invoices (pdf_path)')
+            # Registrations per day, grouped in index order
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created_day ON users (substr(created_at, 1, 10))')
+            # Admin user list, newest first
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)')
+            # Duplicate-email checks when creating or importing users
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)')
+            # Per-user daily sales; the (date, username) primary key serves the all-users range
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_sales_user_date ON daily_sales (username, date)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items (invoice_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_sales_units ON product_sales (units_sold DESC)')
+            
+            # Superseded by the composite indexes above, or unused by any query
+            for index_name in ('idx_chat_username', 'idx_chat_created', 'idx_chat_updated',
+                               'idx_messages_timestamp'):
+                cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
         except Exception as e:
-            print(f"⚠️ Warning: Could not create some indexes: {e}")
+            logger.warning("Could not create some indexes: %s", e)
     
     def _seed_default_users(self, cursor):
         """Create default admin and user accounts"""
@@ -289,9 +499,9 @@ class DatabaseManager:
                     VALUES (?, ?, ?)
                 ''', ('user1', generate_password_hash('user123'), 'user'))
                 
-                print("✅ Default users created (admin/admin123, user1/user123)")
+                logger.info("Default users created (admin/admin123, user1/user123)")
         except Exception as e:
-            print(f"⚠️ Error seeding default users: {e}")
+            logger.warning("Error seeding default users: %s", e)
     
     def generate_chat_id(self):
         """Generate unique chat ID"""
@@ -326,30 +536,57 @@ class DatabaseManager:
         finally:
             conn.close()
     
-    def get_user_chats(self, username, limit=50):
-        """Get user's chats ordered by creation date (most recent first)"""
+    def get_user_chats(self, username, limit=50, cursor=None):
+        """
+        Get a page of the user's chats, most recent first.
+        
+        Pages are keyset-paginated on (created_at, id); pass the returned
+        next_cursor to get the following page. Returns (chats, next_cursor),
+        where next_cursor is None on the last page.
+        """
         conn = self.get_connection()
-        cursor = conn.cursor()
+        db_cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                SELECT chat_id, title, created_at, updated_at,
-                       (SELECT COUNT(*) FROM messages WHERE messages.chat_id = chat_history.chat_id) as message_count
+            query = '''
+                SELECT id, chat_id, title, created_at, updated_at, message_count
                 FROM chat_history 
                 WHERE username = ? AND is_active = 1
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (username, limit))
+            '''
+            params = [username]
             
-            return [dict(row) for row in cursor.fetchall()]
+            if cursor:
+                created_at, last_id = decode_page_cursor(cursor)
+                query += ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+                params.extend([created_at, created_at, last_id])
+            
+            query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+            params.append(limit + 1)
             
+            db_cursor.execute(query, params)
+            chats = [dict(row) for row in db_cursor.fetchall()]
+            
+            next_cursor = None
+            if len(chats) > limit:
+                chats = chats[:limit]
+                next_cursor = encode_page_cursor(chats[-1]['created_at'], chats[-1]['id'])
+            
+            return chats, next_cursor
+            
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error fetching chats: {e}")
         finally:
             conn.close()
     
-    def get_chat_messages(self, chat_id, username):
-        """Get all messages for a specific chat"""
+    def get_chat_messages(self, chat_id, username, limit=None, before_id=None):
+        """
+        Get messages for a specific chat, oldest first.
+        
+        With a limit, only the newest `limit` messages (older than before_id,
+        if given) are returned, so callers can page backwards from the tail.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -364,14 +601,24 @@ class DatabaseManager:
                 raise Exception("Chat not found or access denied")
             
             # Get messages
+            if limit is None:
+                cursor.execute('''
+                    SELECT id, message_type, content, timestamp, metadata
+                    FROM messages 
+                    WHERE chat_id = ? 
+                    ORDER BY id ASC
+                ''', (chat_id,))
+                return [dict(row) for row in cursor.fetchall()]
+            
             cursor.execute('''
-                SELECT message_type, content, timestamp, metadata
+                SELECT id, message_type, content, timestamp, metadata
                 FROM messages 
-                WHERE chat_id = ? 
-                ORDER BY timestamp ASC
-            ''', (chat_id,))
+                WHERE chat_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (chat_id, before_id if before_id is not None else 2 ** 63 - 1, limit))
             
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in reversed(cursor.fetchall())]
             
         except Exception as e:
             raise Exception(f"Error fetching messages: {e}")
@@ -394,28 +641,30 @@ class DatabaseManager:
                 raise Exception("Chat not found or access denied")
             
             # Check if this exact message already exists (duplicate prevention)
+            message_hash = content_hash(content)
             cursor.execute('''
-                SELECT id FROM messages 
-                WHERE chat_id = ? AND username = ? AND message_type = ? AND content = ?
-                ORDER BY timestamp DESC LIMIT 1
-            ''', (chat_id, username, message_type, content))
+                SELECT 1 FROM messages 
+                WHERE chat_id = ? AND content_hash = ?
+                  AND username = ? AND message_type = ? AND content = ?
+                LIMIT 1
+            ''', (chat_id, message_hash, username, message_type, content))
             
             existing_message = cursor.fetchone()
             if existing_message:
-                print(f"⚠️ Duplicate message detected, skipping save: {content[:50]}...")
+                logger.debug("Duplicate message detected, skipping save: %.50s...", content)
                 return True  # Return success but don't save duplicate
             
             # Save message if it's not a duplicate
             cursor.execute('''
-                INSERT INTO messages (chat_id, username, message_type, content, metadata, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
+                INSERT INTO messages (chat_id, username, message_type, content, metadata, timestamp, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (chat_id, username, message_type, content, 
-                json.dumps(metadata) if metadata else None, datetime.now()))
+                json.dumps(metadata) if metadata else None, datetime.now(), message_hash))
             
-            # Update chat's updated_at timestamp
+            # Update chat's updated_at timestamp and message counter
             cursor.execute('''
                 UPDATE chat_history 
-                SET updated_at = ? 
+                SET updated_at = ?, message_count = message_count + 1
                 WHERE chat_id = ?
             ''', (datetime.now(), chat_id))
             
@@ -503,6 +752,476 @@ class DatabaseManager:
             ''', (datetime.now(), username))
             conn.commit()
         except Exception as e:
-            print(f"Error updating login time: {e}")
+            logger.error("Error updating login time: %s", e)
+        finally:
+            conn.close()
+    
+    # Invoice and Sales Analytics Methods
+    @staticmethod
+    def invoice_lines(invoice):
+        """Normalize calculated invoice items into line-item dicts.
+        
+        Both billing modules are supported: 'total_amount'/'discount' and
+        'calculated_total'/'discount_percent'. Line totals in paise are taken
+        from the billing engine's 'total_amount_paise' when present.
+        
+        'revenue' is the line's share of the grand total: its line total less
+        its part of the overall cart discount, so product revenue adds up to
+        the invoice amount that daily_sales counts.
+        """
+        lines = []
+        for item in invoice.get('items', []):
+            line_total = float(item.get('total_amount', item.get('calculated_total', 0)))
+            lines.append({
+                'product_name': item['name'],
+                'quantity': int(item.get('qty', item.get('quantity', 0))),
+                'unit_price': float(item.get('unit_price', 0)),
+                'discount_percent': float(item.get('discount', item.get('discount_percent', 0)) or 0),
+                'line_total': line_total,
+                'line_total_paise': item.get('total_amount_paise', round(line_total * 100))
+            })
+        
+        summary = invoice.get('summary', {})
+        discount_paise = summary.get('overall_discount_amount_paise',
+                                     round((summary.get('overall_discount_amount') or 0) * 100))
+        for line, share in zip(lines, allocate(discount_paise, [line['line_total_paise'] for line in lines])):
+            line['revenue_paise'] = line['line_total_paise'] - share
+            line['revenue'] = line['revenue_paise'] / 100
+        return lines
+    
+    def save_invoice(self, invoice_number, client_name, invoice, pdf_path, username, invoice_date=None, file_info=None):
+        """Save an invoice with its line items and update the sales rollups atomically
+        
+        file_info is InvoiceStore.file_info() of the generated file, if any.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            invoice_date = invoice_date or datetime.now().strftime('%Y-%m-%d')
+            grand_total = invoice['summary']['grand_total']
+            grand_total_paise = invoice['summary'].get('grand_total_paise', round(grand_total * 100))
+            now = datetime.now()
+            
+            file_info = file_info or {}
+            cursor.execute('''
+                INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username,
+                                      file_path, file_size, file_hash, amount_paise)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (invoice_number, client_name, grand_total, invoice_date, pdf_path, username,
+                  file_info.get('file_path'), file_info.get('file_size'), file_info.get('file_hash'), grand_total_paise))
+            invoice_id = cursor.lastrowid
+            
+            items = self.invoice_lines(invoice)
+            lines = [(invoice_id, line['product_name'], line['quantity'], line['unit_price'],
+                      line['discount_percent'], line['line_total'], line['line_total_paise'])
+                     for line in items]
+            
+            cursor.executemany('''
+                INSERT INTO invoice_items (invoice_id, product_name, quantity, unit_price, discount_percent,
+                                           line_total, line_total_paise)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', lines)
+            
+            cursor.executemany('''
+                INSERT INTO product_sales (product_name, units_sold, revenue, order_count, last_sold_at)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (product_name) DO UPDATE SET
+                    units_sold = units_sold + excluded.units_sold,
+                    revenue = revenue + excluded.revenue,
+                    order_count = order_count + 1,
+                    last_sold_at = excluded.last_sold_at
+            ''', [(line['product_name'], line['quantity'], line['revenue'], now) for line in items])
+            
+            cursor.execute('''
+                INSERT INTO daily_sales (date, username, revenue, invoice_count, units_sold)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (date, username) DO UPDATE SET
+                    revenue = revenue + excluded.revenue,
+                    invoice_count = invoice_count + 1,
+                    units_sold = units_sold + excluded.units_sold
+            ''', (invoice_date, username or '', grand_total, sum(line[2] for line in lines)))
+            
+            conn.commit()
+            return invoice_id
+            
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Error saving invoice: {e}")
+        finally:
+            conn.close()
+    
+    def record_cart_adds(self, counts):
+        """Add batched cart-add counts ({product_name: adds}, the denominator for conversion rate)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT INTO product_sales (product_name, cart_adds)
+                VALUES (?, ?)
+                ON CONFLICT (product_name) DO UPDATE SET cart_adds = cart_adds + excluded.cart_adds
+            ''', list(counts.items()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def get_product_sales(self):
+        """Get the per-product sales rollup keyed by product name"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT product_name, units_sold, revenue, order_count, cart_adds, last_sold_at
+                FROM product_sales
+            ''')
+            return {row['product_name']: dict(row) for row in cursor.fetchall()}
+            
+        except Exception as e:
+            raise Exception(f"Error fetching product sales: {e}")
+        finally:
+            conn.close()
+    
+    def get_top_products(self, limit=5):
+        """Get best-selling products by units sold"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT product_name, units_sold, revenue, order_count
+                FROM product_sales
+                WHERE units_sold > 0
+                ORDER BY units_sold DESC
+                LIMIT ?
+            ''', (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+            
+        except Exception as e:
+            raise Exception(f"Error fetching top products: {e}")
+        finally:
+            conn.close()
+    
+    def get_daily_sales(self, start_date, end_date, username=None):
+        """Get {date: {revenue, invoice_count, units_sold}} for an inclusive date range.
+        
+        Pass username=None to aggregate across all users.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if username is None:
+                cursor.execute('''
+                    SELECT date, SUM(revenue) AS revenue, SUM(invoice_count) AS invoice_count,
+                           SUM(units_sold) AS units_sold
+                    FROM daily_sales
+                    WHERE date >= ? AND date <= ?
+                    GROUP BY date
+                ''', (start_date, end_date))
+            else:
+                cursor.execute('''
+                    SELECT date, revenue, invoice_count, units_sold
+                    FROM daily_sales
+                    WHERE date >= ? AND date <= ? AND username = ?
+                ''', (start_date, end_date, username))
+            
+            return {row['date']: dict(row) for row in cursor.fetchall()}
+            
+        except Exception as e:
+            raise Exception(f"Error fetching daily sales: {e}")
+        finally:
+            conn.close()
+    
+    def get_invoice_totals(self, start_date=None, end_date=None, username=None):
+        """Get (revenue, invoice_count) for an optional inclusive date range.
+        
+        Pass username=None to aggregate across all users.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            conditions = []
+            params = []
+            if username is not None:
+                conditions.append('username = ?')
+                params.append(username)
+            if start_date:
+                conditions.append('date >= ?')
+                params.append(start_date)
+            if end_date:
+                conditions.append('date <= ?')
+                params.append(end_date)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            
+            cursor.execute(f'SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM invoices {where}', params)
+            revenue, count = cursor.fetchone()
+            return revenue, count
+            
+        except Exception as e:
+            raise Exception(f"Error fetching invoice totals: {e}")
+        finally:
+            conn.close()
+    
+    def get_invoice_totals_by_period(self, start_date, end_date, period='day', username=None):
+        """Get {period_key: {revenue, invoice_count}} in one grouped range query.
+        
+        period is 'day' (keys YYYY-MM-DD) or 'month' (keys YYYY-MM). Periods with
+        no invoices are absent; callers fill the gaps.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Group by the raw date so the covering index delivers rows in group order
+            # (no temp B-tree); days are then folded into months here
+            if username is None:
+                cursor.execute('''
+                    SELECT date, SUM(amount), COUNT(*)
+                    FROM invoices
+                    WHERE date >= ? AND date <= ?
+                    GROUP BY date
+                ''', (start_date, end_date))
+            else:
+                cursor.execute('''
+                    SELECT date, SUM(amount), COUNT(*)
+                    FROM invoices
+                    WHERE username = ? AND date >= ? AND date <= ?
+                    GROUP BY date
+                ''', (username, start_date, end_date))
+            
+            key_length = 7 if period == 'month' else 10
+            totals = {}
+            for date, revenue, count in cursor.fetchall():
+                entry = totals.setdefault(date[:key_length], {'revenue': 0, 'invoice_count': 0})
+                entry['revenue'] += revenue or 0
+                entry['invoice_count'] += count
+            return totals
+            
+        except Exception as e:
+            raise Exception(f"Error fetching invoice totals by {period}: {e}")
+        finally:
+            conn.close()
+    
+    def get_user_registrations_by_day(self, start_date):
+        """Get {YYYY-MM-DD: count} of users created on or after start_date"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Same expression as idx_users_created_day, so the range and the grouping use the index
+            cursor.execute('''
+                SELECT substr(created_at, 1, 10) AS day, COUNT(*)
+                FROM users
+                WHERE substr(created_at, 1, 10) >= ?
+                GROUP BY substr(created_at, 1, 10)
+            ''', (start_date,))
+            return {row[0]: row[1] for row in cursor.fetchall()}
+            
+        except Exception as e:
+            raise Exception(f"Error fetching user registrations: {e}")
+        finally:
+            conn.close()
+    
+    def get_latest_invoice(self, username=None):
+        """Get the most recently saved invoice, optionally for one user"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if username is None:
+                cursor.execute('''
+                    SELECT invoice_number, client_name, amount, date
+                    FROM invoices
+                    ORDER BY id DESC LIMIT 1
+                ''')
+            else:
+                cursor.execute('''
+                    SELECT invoice_number, client_name, amount, date
+                    FROM invoices
+                    WHERE username = ?
+                    ORDER BY id DESC LIMIT 1
+                ''', (username,))
+            
+            row = cursor.fetchone()
+            return dict(row) if row else None
+            
+        except Exception as e:
+            raise Exception(f"Error fetching latest invoice: {e}")
+        finally:
+            conn.close()
+    
+    def get_user_count(self):
+        """Get the total number of user accounts"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT COUNT(*) FROM users')
+            return cursor.fetchone()[0]
+        except Exception as e:
+            raise Exception(f"Error counting users: {e}")
+        finally:
+            conn.close()
+    
+    def get_users_page(self, visible_roles=None, search=None, role=None, status=None, department=None,
+                       sort='created_at', descending=True, limit=10, offset=0):
+        """Get (users, total) for one page of the admin user list
+        
+        Filtering, search and sorting run in SQL; total counts the users
+        matching the filters. sort must be one of USER_SORT_COLUMNS.
+        """
+        if sort not in USER_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort users by {sort!r}")
+        
+        conditions = []
+        params = []
+        if visible_roles:
+            conditions.append(f"role IN ({', '.join('?' * len(visible_roles))})")
+            params.extend(visible_roles)
+        for column, value in (('role', role), ('status', status), ('department', department)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if search:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append('(' + ' OR '.join(f"{column} LIKE ? ESCAPE '\\'"
+                                                for column in ('username', 'full_name', 'email', 'department')) + ')')
+            params.extend([pattern] * 4)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        direction = 'DESC' if descending else 'ASC'
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(f'SELECT COUNT(*) FROM users {where}', params)
+            total = cursor.fetchone()[0]
+            
+            cursor.execute(f'''
+                SELECT {', '.join(USER_LIST_FIELDS)}
+                FROM users {where}
+                ORDER BY {sort} {direction}, id {direction}
+                LIMIT ? OFFSET ?
+            ''', params + [limit, offset])
+            users = []
+            for row in cursor.fetchall():
+                user = dict(zip(USER_LIST_FIELDS, row))
+                user['must_change_password'] = bool(user['must_change_password'])
+                users.append(user)
+            return users, total
+        
+        except Exception as e:
+            raise Exception(f"Error fetching users: {e}")
+        finally:
+            conn.close()
+    
+    def get_user_stats(self, new_since):
+        """Get total, active, admin and new-since-date user counts in one pass over users"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT COUNT(*),
+                       SUM(status = 'active'),
+                       SUM(role IN ('admin', 'super_admin')),
+                       SUM(created_at >= ?)
+                FROM users
+            ''', (new_since,))
+            total, active, admins, new = cursor.fetchone()
+            return {
+                'total_users': total,
+                'active_users': active or 0,
+                'admin_users': admins or 0,
+                'new_users': new or 0
+            }
+        except Exception as e:
+            raise Exception(f"Error fetching user statistics: {e}")
+        finally:
+            conn.close()
+    
+    def find_existing_users(self, usernames, emails):
+        """Get (usernames, emails) from the given ones that are already taken"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            found = {'username': set(), 'email': set()}
+            for column, values in (('username', list(usernames)), ('email', list(emails))):
+                # Chunked to stay under SQLite's bound-parameter limit
+                for start in range(0, len(values), 500):
+                    chunk = values[start:start + 500]
+                    cursor.execute(f"SELECT {column} FROM users WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk)
+                    found[column].update(row[0] for row in cursor.fetchall())
+            return found['username'], found['email']
+        except Exception as e:
+            raise Exception(f"Error checking existing users: {e}")
+        finally:
+            conn.close()
+    
+    def bulk_create_users(self, users, created_by):
+        """Insert users (profile dicts with a hashed 'password') with one executemany
+        
+        New users are active and must change their password on first login.
+        Either every user is inserted or none is.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            created_at = datetime.now().isoformat()
+            cursor.executemany('''
+                INSERT INTO users (username, password, email, full_name, phone, department, role,
+                                   status, must_change_password, created_by, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'active', 1, ?, ?)
+            ''', [(user['username'], user['password'], user['email'], user['full_name'], user.get('phone', ''),
+                   user.get('department', ''), user['role'], created_by, created_at) for user in users])
+            conn.commit()
+            return len(users)
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Error creating users: {e}")
+        finally:
+            conn.close()
+    
+    def get_invoice_file(self, pdf_path):
+        """Get the owner and stored file details of the invoice saved with this file name"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT invoice_number, username, file_path, file_size, file_hash
+                FROM invoices WHERE pdf_path = ?
+                ORDER BY id DESC LIMIT 1
+            ''', (pdf_path,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            raise Exception(f"Error fetching invoice file: {e}")
+        finally:
+            conn.close()
+    
+    def update_invoice_file(self, pdf_path, file_info):
+        """Record the stored location, size and hash of an invoice file"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE invoices SET file_path = ?, file_size = ?, file_hash = ?
+                WHERE pdf_path = ?
+            ''', (file_info['file_path'], file_info['file_size'], file_info['file_hash'], pdf_path))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"Error updating invoice file: {e}")
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
@@ -1,37 +1,12 @@
-import pandas as pd
 import os
 import json
+import logging
 import re
 
-# Try to import and configure Gemini AI
-try:
-    import google.generativeai as genai
-    from dotenv import load_dotenv
-    
-    # Load environment variables
-    load_dotenv()
-    
-    # Configure API key securely
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if api_key:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        GEMINI_AVAILABLE = True
-        print("✅ Gemini AI configured successfully")
-    else:
-        print("⚠️ GEMINI_API_KEY not found in environment variables")
-        GEMINI_AVAILABLE = False
-        model = None
-        
-except ImportError as e:
-    print(f"⚠️ Could not import required packages: {e}")
-    GEMINI_AVAILABLE = False
-    model = None
-except Exception as e:
-    print(f"⚠️ Error configuring Gemini AI: {e}")
-    GEMINI_AVAILABLE = False
-    model = None
+# Gemini is imported and configured lazily, once per process (shared with app0.py)
+from gemini_client import get_llm_model, llm_configured
+
+logger = logging.getLogger(__name__)
 
 def normalize_column(col):
     """Normalize column names to lowercase with underscores"""
@@ -39,8 +14,9 @@ def normalize_column(col):
 
 def gemini_classify_column(column):
     """Use Gemini AI to classify column purpose"""
-    if not GEMINI_AVAILABLE or not model:
-        print(f"Gemini AI not available, using rule-based classification for: {column}")
+    model = get_llm_model()
+    if not model:
+        logger.debug("Gemini AI not available, using rule-based classification for: %s", column)
         return fallback_classify_column(column)
     
     prompt = f"""
@@ -65,7 +41,7 @@ Return just the label, nothing else.
         label = re.sub(r"[^\w_]", "", label)
         return label
     except Exception as e:
-        print(f"AI classification failed for '{column}': {e}")
+        logger.warning("AI classification failed for '%s': %s", column, e)
         return fallback_classify_column(column)
 
 def fallback_classify_column(column):
@@ -113,9 +89,7 @@ def enhanced_column_mapping(df):
     mapped_columns = {}
     used_labels = set()
     
-    print("🔍 Column mapping process:")
-    print(f"Original columns: {original_columns}")
-    print(f"Normalized columns: {list(df.columns)}")
+    logger.debug("Column mapping: original columns %s, normalized %s", original_columns, list(df.columns))
     
     # FIXED: Define rule-based mapping with SPECIFIC priority order
     mapping_rules = {
@@ -138,7 +112,7 @@ def enhanced_column_mapping(df):
     # Apply rule-based mapping with exact matching first
     for col in df.columns:
         mapped = False
-        print(f"\n📋 Processing column: '{col}'")
+        logger.debug("Processing column: '%s'", col)
         
         # Check for exact matches first
         for standard_name, variations in mapping_rules.items():
@@ -147,7 +121,7 @@ def enhanced_column_mapping(df):
                     mapped_columns[col] = standard_name
                     used_labels.add(standard_name)
                     mapped = True
-                    print(f"   ✅ Exact match: '{col}' → '{standard_name}'")
+                    logger.debug("Exact match: '%s' → '%s'", col, standard_name)
                     break
         
         # If no exact match, try partial matching
@@ -158,7 +132,7 @@ def enhanced_column_mapping(df):
                         mapped_columns[col] = standard_name
                         used_labels.add(standard_name)
                         mapped = True
-                        print(f"   ✅ Partial match: '{col}' → '{standard_name}'")
+                        logger.debug("Partial match: '%s' → '%s'", col, standard_name)
                         break
         
         # Use AI classification (or fallback) if no rule matches
@@ -168,7 +142,7 @@ def enhanced_column_mapping(df):
                 if label in mapping_rules.keys() and label not in used_labels:
                     mapped_columns[col] = label
                     used_labels.add(label)
-                    print(f"   ✅ AI/Fallback: '{col}' → '{label}'")
+                    logger.debug("AI/Fallback: '%s' → '%s'", col, label)
                 else:
                     # Handle duplicates or unknown labels
                     if label in used_labels:
@@ -177,10 +151,10 @@ def enhanced_column_mapping(df):
                         final_label = label
                     mapped_columns[col] = final_label
                     used_labels.add(final_label)
-                    print(f"   ⚠️ Fallback: '{col}' → '{final_label}'")
+                    logger.debug("Fallback: '%s' → '%s'", col, final_label)
             except Exception:
                 mapped_columns[col] = col
-                print(f"   ❌ Error: '{col}' → '{col}' (unchanged)")
+                logger.warning("Could not map '%s', keeping it unchanged", col)
     
     return mapped_columns
 
@@ -189,6 +163,9 @@ def dynamic_parse_and_save(file_path, output_path="product_data.json"):
     Enhanced dynamic parser with FIXED field mapping and standardization
     """
     try:
+        # pandas is only needed when a catalog is uploaded
+        import pandas as pd
+        
         # Determine file type and read
         ext = os.path.splitext(file_path)[-1].lower()
         if ext == ".xlsx":
@@ -198,7 +175,7 @@ def dynamic_parse_and_save(file_path, output_path="product_data.json"):
         else:
             raise ValueError("Unsupported format. Please use CSV or Excel files.")
         
-        print(f"📊 Processing {len(df)} rows from {file_path}")
+        logger.info("Processing %s rows from %s", len(df), file_path)
         
         # Apply enhanced column mapping
         mapped_columns = enhanced_column_mapping(df)
@@ -240,27 +217,19 @@ def dynamic_parse_and_save(file_path, output_path="product_data.json"):
         if output_path:
             with open(output_path, "w") as f:
                 json.dump(standardized_products, f, indent=2)
-            print(f"✅ Saved {len(standardized_products)} products to {output_path}")
+            logger.info("Saved %s products to %s", len(standardized_products), output_path)
         
-        print("\n🧠 Final Column Mappings:")
-        for orig, new in mapped_columns.items():
-            print(f"  - {orig} → {new}")
+        logger.info("Column mappings (%s classification): %s", 'AI' if llm_configured() else 'rule-based',
+                    ', '.join(f"{orig} → {new}" for orig, new in mapped_columns.items()))
         
         # Show sample products to verify
-        print(f"\n📋 Sample Product (first 3):")
-        for i, product in enumerate(standardized_products[:3]):
-            print(f"  Product {i+1}: {product.get('name', 'NO NAME')} - ₹{product.get('price', 0)}")
-        
-        # Show AI availability status
-        if GEMINI_AVAILABLE:
-            print("✅ Used Gemini AI for intelligent column classification")
-        else:
-            print("⚠️ Used rule-based classification (Gemini AI not available)")
+        logger.debug("Sample products: %s",
+                     [(product.get('name', 'NO NAME'), product.get('price', 0)) for product in standardized_products[:3]])
         
         return standardized_products
         
     except Exception as e:
-        print(f"❌ Error in dynamic parser: {str(e)}")
+        logger.error("Error in dynamic parser: %s", e)
         raise
 
 def parse_for_streamlit(file_path):
@@ -271,13 +240,14 @@ def parse_for_streamlit(file_path):
         products = dynamic_parse_and_save(file_path, output_path=None)
         return products
     except Exception as e:
-        print(f"Error parsing for Streamlit: {e}")
+        logger.error("Error parsing for Streamlit: %s", e)
         return []
 
 # Test connectivity
 def test_gemini_connection():
     """Test if Gemini AI is properly configured"""
-    if not GEMINI_AVAILABLE:
+    model = get_llm_model()
+    if not model:
         return False, "Gemini AI not available - check API key and dependencies"
     
     try:
@@ -0,0 +1,269 @@
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TYPES = {'csv', 'json', 'xlsx'}
+EXPORT_CATEGORIES = {'products', 'invoices', 'users', 'all'}
+
+
+class ExportJob:
+    """Progress of a single export"""
+
+    def __init__(self, export_type, category, filename):
+        self.job_id = uuid.uuid4().hex
+        self.export_type = export_type
+        self.category = category
+        self.filename = filename
+        self.status = 'pending'
+        self.rows_written = 0
+        self.total_rows = 0
+        self.file_size = 0
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.completed_at = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'type': self.export_type,
+            'category': self.category,
+            'filename': self.filename,
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'progress': round(self.rows_written / self.total_rows * 100, 1) if self.total_rows else
+                        (100.0 if self.status == 'completed' else 0.0),
+            'file_size': self.file_size,
+            'error': self.error,
+            'created_at': self.created_at,
+            'completed_at': self.completed_at,
+            'download_url': f'/api/download_export/{self.filename}' if self.status == 'completed' else None
+        }
+
+
+class ExportManager:
+    """
+    Streaming exports of products, invoices and users.
+
+    Rows are read from SQLite cursors in fetchmany batches and written straight
+    to a file in the export folder (csv/json/xlsx) or yielded as chunks for a
+    streamed HTTP response (csv/json), so memory stays bounded regardless of
+    the number of rows.
+    """
+
+    def __init__(self, db_path='invoices.db', export_folder='exports', batch_size=1000, max_age_seconds=86400):
+        self.db_path = db_path
+        self.export_folder = export_folder
+        self.batch_size = batch_size
+        self.max_age_seconds = max_age_seconds
+        self.jobs = {}
+        self._jobs_lock = threading.Lock()
+        os.makedirs(self.export_folder, exist_ok=True)
+
+    # Sources
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _iter_cursor(self, cursor):
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def _sources(self, conn, category, username, products):
+        """Return [(name, columns, total_rows, row_iterator)] for a category"""
+        sources = []
+
+        if category in ('products', 'all') and products:
+            columns = []
+            for product in products:
+                for key in product:
+                    if key not in columns:
+                        columns.append(key)
+            rows = (tuple(product.get(column) for column in columns) for product in products)
+            sources.append(('products', columns, len(products), rows))
+
+        if category in ('invoices', 'all'):
+            count_cursor = conn.cursor()
+            cursor = conn.cursor()
+            if username is None:
+                count_cursor.execute('SELECT COUNT(*) FROM invoices')
+                cursor.execute('SELECT * FROM invoices ORDER BY date DESC')
+            else:
+                count_cursor.execute('SELECT COUNT(*) FROM invoices WHERE username = ?', (username,))
+                cursor.execute('SELECT * FROM invoices WHERE username = ? ORDER BY date DESC', (username,))
+            columns = [description[0] for description in cursor.description]
+            sources.append(('invoices', columns, count_cursor.fetchone()[0], self._iter_cursor(cursor)))
+
+        if category in ('users', 'all'):
+            count_cursor = conn.cursor()
+            cursor = conn.cursor()
+            count_cursor.execute('SELECT COUNT(*) FROM users')
+            cursor.execute('SELECT username, role, created_at, last_login FROM users')
+            sources.append(('users', ['username', 'role', 'created_at', 'last_login'],
+                            count_cursor.fetchone()[0], self._iter_cursor(cursor)))
+
+        return sources
+
+    # Chunk generators
+    def _iter_csv(self, sources, job=None):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        for name, columns, _, rows in sources:
+            buffer.write(f"\n{name.upper()}\n")
+            buffer.write("=" * 50 + "\n")
+            writer.writerow(columns)
+
+            pending = 0
+            for row in rows:
+                writer.writerow(row)
+                pending += 1
+                if pending == self.batch_size:
+                    yield self._drain(buffer)
+                    if job:
+                        job.rows_written += pending
+                    pending = 0
+
+            buffer.write("\n")
+            yield self._drain(buffer)
+            if job:
+                job.rows_written += pending
+
+    def _iter_json(self, sources, job=None):
+        yield "{"
+        for index, (name, columns, _, rows) in enumerate(sources):
+            yield f'{"," if index else ""}\n  {json.dumps(name)}: ['
+            chunk = []
+            first = True
+            for row in rows:
+                chunk.append(("\n    " if first else ",\n    ") + json.dumps(dict(zip(columns, row)), default=str))
+                first = False
+                if len(chunk) == self.batch_size:
+                    yield "".join(chunk)
+                    if job:
+                        job.rows_written += len(chunk)
+                    chunk = []
+            yield "".join(chunk) + "\n  ]"
+            if job:
+                job.rows_written += len(chunk)
+        yield "\n}\n"
+
+    @staticmethod
+    def _drain(buffer):
+        content = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return content
+
+    def _write_xlsx(self, sources, path, job):
+        from openpyxl import Workbook
+
+        # Write-only mode streams rows to disk instead of building the sheet in memory
+        workbook = Workbook(write_only=True)
+        for name, columns, _, rows in sources:
+            sheet = workbook.create_sheet(title=name.capitalize())
+            sheet.append(columns)
+            for row in rows:
+                sheet.append([value if value is None or isinstance(value, (int, float, str)) else str(value)
+                              for value in row])
+                job.rows_written += 1
+        if not sources:
+            workbook.create_sheet(title='Export')
+        workbook.save(path)
+
+    # Public API
+    def build_filename(self, export_type, category):
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"dashboard_export_{category}_{timestamp}_{uuid.uuid4().hex[:6]}.{export_type}"
+
+    def export_path(self, filename):
+        return os.path.join(self.export_folder, os.path.basename(filename))
+
+    def create_job(self, export_type, category):
+        job = ExportJob(export_type, category, self.build_filename(export_type, category))
+        with self._jobs_lock:
+            self.jobs[job.job_id] = job
+        return job
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def run_export(self, job, username=None, products=None):
+        """Write a job's export file, updating its progress as rows are written"""
+        path = self.export_path(job.filename)
+        temp_path = path + '.part'
+        conn = self._get_connection()
+        job.status = 'running'
+
+        try:
+            sources = self._sources(conn, job.category, username, products)
+            job.total_rows = sum(total for _, _, total, _ in sources)
+
+            if job.export_type == 'xlsx':
+                self._write_xlsx(sources, temp_path, job)
+            else:
+                chunks = self._iter_csv(sources, job) if job.export_type == 'csv' else self._iter_json(sources, job)
+                with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+
+            os.replace(temp_path, path)
+            job.file_size = os.path.getsize(path)
+            job.status = 'completed'
+            logger.info("Export completed: %s (%s rows)", job.filename, job.rows_written)
+
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error("Error exporting data: %s", e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        finally:
+            job.completed_at = datetime.now().isoformat()
+            conn.close()
+
+        return job
+
+    def start_export(self, job, username=None, products=None):
+        """Run an export in a background thread; poll the job for progress"""
+        self.cleanup()
+        thread = threading.Thread(target=self.run_export, args=(job, username, list(products or [])),
+                                  name=f'export-{job.job_id[:8]}', daemon=True)
+        thread.start()
+        return job
+
+    def stream_export(self, export_type, category, username=None, products=None):
+        """Yield csv/json chunks for a streamed HTTP response"""
+        conn = self._get_connection()
+        try:
+            sources = self._sources(conn, category, username, list(products or []))
+            chunks = self._iter_csv(sources) if export_type == 'csv' else self._iter_json(sources)
+            yield from chunks
+        finally:
+            conn.close()
+
+    def cleanup(self):
+        """Delete export files and finished jobs older than max_age_seconds"""
+        cutoff = time.time() - self.max_age_seconds
+        for filename in os.listdir(self.export_folder):
+            path = os.path.join(self.export_folder, filename)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+        with self._jobs_lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job.completed_at and not os.path.exists(self.export_path(job.filename))]:
+                del self.jobs[job_id]
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import threading
+import urllib.request
+from importlib.util import find_spec
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+
+# Which provider answers prompts: 'gemini' (default) or 'http' (an LLM_SERVER_URL speaking the
+# /v1/generate protocol, e.g. benchmarks/fake_llm_server.py for load tests)
+DEFAULT_LLM_PROVIDER = "gemini"
+DEFAULT_LLM_SERVER_URL = "http://127.0.0.1:8765"
+
+_model = None
+_loaded = False
+_lock = threading.Lock()
+
+
+class ModelResponse:
+    """The part of a Gemini response callers use"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class HTTPModel:
+    """
+    Model served over HTTP: POST {base_url}/v1/generate with {"prompt": ...}
+    returns {"text": ...}. Errors raise, like the Gemini SDK, so callers fall
+    back the same way.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.url = base_url.rstrip('/') + '/v1/generate'
+        self.timeout = timeout
+
+    def generate_content(self, prompt):
+        request = urllib.request.Request(self.url, data=json.dumps({'prompt': prompt}).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return ModelResponse(json.load(response)['text'])
+
+
+def _provider_name():
+    return os.getenv("LLM_PROVIDER", DEFAULT_LLM_PROVIDER).lower()
+
+
+def _gemini_available():
+    return bool(os.getenv("GEMINI_API_KEY")) and find_spec("google.generativeai") is not None
+
+
+def _load_gemini_model():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        logger.warning("GEMINI_API_KEY not found. Please set it in your .env file")
+        return None
+
+    try:
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        logger.info("Gemini AI configured successfully")
+        return model
+    except ImportError as e:
+        logger.warning("Could not import required packages: %s", e)
+    except Exception as e:
+        logger.warning("Error configuring Gemini AI: %s", e)
+    return None
+
+
+def _load_http_model():
+    url = os.getenv("LLM_SERVER_URL", DEFAULT_LLM_SERVER_URL)
+    logger.info("Using HTTP model server at %s", url)
+    return HTTPModel(url, timeout=float(os.getenv("LLM_TIMEOUT", "30")))
+
+
+# name -> (is_available(), load_model()); a model only needs generate_content(prompt) -> object with .text
+PROVIDERS = {
+    'gemini': (_gemini_available, _load_gemini_model),
+    'http': (lambda: True, _load_http_model),
+}
+
+
+def register_provider(name, is_available, load_model):
+    """Add a provider selectable with LLM_PROVIDER=name"""
+    PROVIDERS[name] = (is_available, load_model)
+
+
+def llm_configured():
+    """Whether the selected provider can be used, without importing its SDK"""
+    provider = PROVIDERS.get(_provider_name())
+    return provider is not None and provider[0]()
+
+
+def get_llm_model():
+    """
+    Return the shared model of the selected provider, or None if it is not available.
+
+    The provider (and for Gemini, google.generativeai) is loaded on the first
+    call only, so importing app0/dynamic_parser does not pay for the SDK and
+    it is configured once per process.
+    """
+    global _model, _loaded
+    if _loaded:
+        return _model
+
+    with _lock:
+        if not _loaded:
+            provider = PROVIDERS.get(_provider_name())
+            if provider is None:
+                logger.warning("Unknown LLM_PROVIDER '%s' (known: %s)", _provider_name(), ', '.join(PROVIDERS))
+            _model = provider[1]() if provider else None
+            _loaded = True
+    return _model
+
+
+# Names used before providers were pluggable
+gemini_configured = llm_configured
+get_gemini_model = get_llm_model
@@ -0,0 +1,49 @@
+"""
+One-shot database setup for AI Invoice Assistant.
+
+Creates missing tables, migrates existing ones and builds indexes and sales
+rollups. Also moves invoice files from the old flat invoices/ folder into
+the sharded layout and records their size and hash. Run it once per deploy
+(before starting the app workers) instead of having every worker do it at
+import:
+
+    python init_db.py [path/to/invoices.db] [path/to/invoices]
+"""
+
+import logging
+import sys
+
+from database_manager import DatabaseManager, SCHEMA_VERSION
+from invoice_store import InvoiceStore
+
+
+def shard_invoice_files(db_manager, invoice_folder):
+    """Move flat invoice files into shards and record their location, size and hash"""
+    store = InvoiceStore(invoice_folder)
+    moved = store.shard_legacy_files()
+    for filename in moved:
+        db_manager.update_invoice_file(filename, store.file_info(filename))
+    if moved:
+        print(f"📁 Moved {len(moved)} invoice files into sharded folders")
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'invoices.db'
+    invoice_folder = sys.argv[2] if len(sys.argv) > 2 else 'invoices'
+    # Show the DatabaseManager's migration progress on the console
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    print(f"🚀 Initializing database: {db_path}")
+
+    db_manager = DatabaseManager(db_path, initialize=False)
+    current_version = db_manager.get_schema_version()
+    if current_version >= SCHEMA_VERSION:
+        print(f"✅ Database schema is up to date (version {current_version})")
+    else:
+        db_manager.init_database()
+        print(f"🎉 Database schema upgraded from version {current_version} to {SCHEMA_VERSION}")
+
+    shard_invoice_files(db_manager, invoice_folder)
+
+
+if __name__ == "__main__":
+    main()
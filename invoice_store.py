@@ -0,0 +1,64 @@
+import hashlib
+import os
+
+
+class InvoiceStore:
+    """
+    On-disk storage for generated invoice files (PDF, or HTML fallback).
+
+    Files are sharded into two levels of subdirectories named after the
+    SHA-1 of the filename (invoices/3f/a2/invoice_INV-....pdf), so no single
+    directory grows past a few hundred entries and a file's location can be
+    derived from its name alone. Files written before sharding stay in the
+    flat root folder and are still found by locate() until
+    shard_legacy_files() moves them.
+    """
+
+    def __init__(self, root='invoices', chunk_size=1024 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+        os.makedirs(root, exist_ok=True)
+
+    def relative_path(self, filename):
+        """Sharded path of filename, relative to the store root"""
+        digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        return os.path.join(digest[:2], digest[2:4], filename)
+
+    def path_for(self, filename):
+        """Absolute path a new file should be written to (shard directories are created)"""
+        path = os.path.abspath(os.path.join(self.root, self.relative_path(filename)))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def locate(self, filename):
+        """Absolute path of a stored file, or None if it does not exist"""
+        for relative_path in (self.relative_path(filename), filename):
+            path = os.path.abspath(os.path.join(self.root, relative_path))
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def file_info(self, filename):
+        """{'file_path', 'file_size', 'file_hash'} of a stored file, hashed in chunks"""
+        path = self.locate(filename)
+        if path is None:
+            return None
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+        return {
+            'file_path': os.path.relpath(path, os.path.abspath(self.root)),
+            'file_size': os.path.getsize(path),
+            'file_hash': digest.hexdigest()
+        }
+
+    def shard_legacy_files(self):
+        """Move files from the flat root folder into their shards; returns the moved filenames"""
+        moved = []
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                os.replace(entry.path, self.path_for(entry.name))
+                moved.append(entry.name)
+        return moved
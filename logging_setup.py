@@ -0,0 +1,147 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+
+# Attributes every LogRecord has; anything else on a record came from extra= or the context filter
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def record_fields(record):
+    """Structured fields attached to a record with extra= or by the context filter"""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, extra fields and traceback"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(record_fields(record))
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            head, newline, rest = line.partition('\n')
+            line = head + ' ' + ' '.join(f'{key}={value}' for key, value in fields.items()) + newline + rest
+        return line
+
+
+class ContextFilter(logging.Filter):
+    """Adds the fields returned by context() (e.g. endpoint, session id, user) to every record"""
+
+    def __init__(self, context):
+        super().__init__()
+        self.context = context
+
+    def filter(self, record):
+        try:
+            fields = self.context()
+        except Exception:
+            fields = None
+        for key, value in (fields or {}).items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a bounded queue drained by a QueueListener thread.
+
+    The caller only renders the message; writing to stdout (which blocks
+    when a piped log reader falls behind) happens on the listener thread.
+    When the queue is full the record is dropped and counted rather than
+    making the request wait.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_module_levels(value):
+    """'dynamic_parser=DEBUG,werkzeug=WARNING' -> {'dynamic_parser': 'DEBUG', 'werkzeug': 'WARNING'}"""
+    levels = {}
+    for item in (value or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, module_levels=None, fmt=None, stream=None, context=None, queue_size=None):
+    """
+    Route all logging through a NonBlockingQueueHandler to one stream handler.
+
+    Defaults come from the environment: LOG_LEVEL (INFO, so debug dumps are
+    off unless asked for), LOG_LEVELS for per-module levels, LOG_FORMAT
+    ('text' or 'json') and LOG_QUEUE_SIZE. Only the first call configures;
+    it returns the queue handler (whose dropped count is worth exporting).
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None:
+        return next(h for h in root.handlers if isinstance(h, NonBlockingQueueHandler))
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    module_levels = module_levels if module_levels is not None else parse_module_levels(os.getenv('LOG_LEVELS'))
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+    queue_size = queue_size or int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter() if fmt == 'json' else TextFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    if context:
+        handler.addFilter(ContextFilter(context))
+
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return handler
@@ -1,51 +1,18 @@
 from flask import Blueprint, render_template, request, session, jsonify
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
+from user_cache import UserCache
 
 login_bp = Blueprint('login', __name__)
 
-def setup_login_routes(app):
-    app.register_blueprint(login_bp)
+# Callables invoked with the username after a successful registration
+registration_listeners = []
 
-def init_users_db():
-    conn = sqlite3.connect('invoices.db')
-    cursor = conn.cursor()
-    
-    # Existing users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL DEFAULT 'user' CHECK(role IN ('user', 'admin'))
-        )
-    ''')
-    
-    # New chat_history table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id TEXT NOT NULL,
-            username TEXT NOT NULL,
-            title TEXT,
-            timestamp TEXT,
-            messages TEXT,
-            FOREIGN KEY (username) REFERENCES users (username)
-        )
-    ''')
-    
-    # Seed default users
-    try:
-        cursor.execute('INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)',
-                      ('admin', generate_password_hash('admin123'), 'admin'))
-        cursor.execute('INSERT OR IGNORE INTO users (username, password, role) VALUES (?, ?, ?)',
-                      ('user1', generate_password_hash('user123'), 'user'))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass
-    conn.close()
+# Shared with app0.py, which invalidates it on user create/update/delete
+user_cache = UserCache('invoices.db')
 
-init_users_db()
+def setup_login_routes(app):
+    app.register_blueprint(login_bp)
 
 @login_bp.route('/api/login', methods=['GET', 'POST'])
 def login():
@@ -54,16 +21,12 @@ def login():
         username = data.get('username')
         password = data.get('password')
         
-        conn = sqlite3.connect('invoices.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT password, role FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        conn.close()
+        user = user_cache.get_user(username)
         
-        if user and check_password_hash(user[0], password):
+        if user and check_password_hash(user['password'], password):
             session['username'] = username
-            session['role'] = user[1]
-            return jsonify({'success': True, 'role': user[1]})
+            session['role'] = user['role']
+            return jsonify({'success': True, 'role': user['role']})
         else:
             return jsonify({'success': False, 'error': 'Invalid username or password'}), 401
     
@@ -90,6 +53,9 @@ def register():
                          (username, generate_password_hash(password), role))
             conn.commit()
             conn.close()
+            user_cache.invalidate(username)
+            for listener in registration_listeners:
+                listener(username)
             return jsonify({'success': True})
         except sqlite3.IntegrityError:
             return jsonify({'success': False, 'error': 'Username already exists'}), 400
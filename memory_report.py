@@ -0,0 +1,209 @@
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+# Classes, modules and functions a session may reference but never owns
+_OPAQUE_TYPES = (type, type(sys), type(len), type(lambda: None))
+
+
+def deep_sizeof(obj, seen=None, exclude=()):
+    """
+    Bytes held by obj and everything it references (containers, __dict__
+    and __slots__ attributes), counting each object once per seen set.
+
+    Objects whose id() is in exclude are skipped, so shared state such as
+    the billing engine or the default catalog is not charged to every
+    session that points at it.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        key = id(current)
+        if key in seen or key in exclude or isinstance(current, _OPAQUE_TYPES):
+            continue
+        seen.add(key)
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            # Copy first: other requests may be editing these containers
+            for k, v in list(current.items()):
+                stack.append(k)
+                stack.append(v)
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(list(current))
+        elif not isinstance(current, (str, bytes, int, float, bool)):
+            if hasattr(current, '__dict__'):
+                stack.append(vars(current))
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    value = getattr(current, slot, None)
+                    if value is not None:
+                        stack.append(value)
+    return size
+
+
+def session_report(session_data, shared=(), top=10):
+    """
+    Bytes per session (split by key: cart, conversation_history, products,
+    ...), the top largest sessions and the total, with shared objects
+    excluded.
+    """
+    exclude = {id(obj) for obj in shared}
+    sessions = []
+    for session_id, data in list(session_data.items()):
+        seen = set()
+        parts = {key: deep_sizeof(value, seen, exclude) for key, value in list(data.items())}
+        history = data.get('conversation_history') or []
+        products = data.get('products') or ()
+        sessions.append({
+            'session_id': session_id,
+            'bytes': sum(parts.values()) + sys.getsizeof(data),
+            'parts': parts,
+            'cart_lines': len(data.get('cart') or ()),
+            'history_messages': len(history),
+            'uploaded_products': 0 if id(products) in exclude else len(products)
+        })
+
+    sessions.sort(key=lambda entry: entry['bytes'], reverse=True)
+    total = sum(entry['bytes'] for entry in sessions)
+    return {
+        'count': len(sessions),
+        'total_bytes': total,
+        'average_bytes': total // len(sessions) if sessions else 0,
+        'by_part': _sum_parts(sessions),
+        'largest': sessions[:top]
+    }
+
+
+def _sum_parts(sessions):
+    totals = {}
+    for entry in sessions:
+        for key, size in entry['parts'].items():
+            totals[key] = totals.get(key, 0) + size
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def catalog_report(catalogs, session_data):
+    """
+    Bytes per distinct catalog (product list) in memory: the named catalogs
+    and each session's uploaded one, with the sessions that reference it.
+    """
+    found = OrderedDict()  # id -> entry
+
+    def add(products, name, session_id=None):
+        if not products:
+            return
+        entry = found.get(id(products))
+        if entry is None:
+            # mapped_bytes: a memory-mapped snapshot's file pages, shared with other workers
+            entry = found[id(products)] = {'name': name, 'products': len(products), 'bytes': deep_sizeof(products),
+                                           'mapped_bytes': getattr(products, 'mapped_bytes', 0), 'sessions': []}
+        if session_id is not None:
+            entry['sessions'].append(session_id)
+
+    for name, products in catalogs.items():
+        add(products, name)
+    for session_id, data in list(session_data.items()):
+        add(data.get('products'), f"uploaded:{session_id}", session_id)
+
+    snapshots = list(found.values())
+    for entry in snapshots:
+        entry['referenced_by'] = len(entry.pop('sessions'))
+    return {'count': len(snapshots), 'total_bytes': sum(e['bytes'] for e in snapshots), 'snapshots': snapshots}
+
+
+def process_memory():
+    """Resident and virtual size of this process, when psutil is available"""
+    if not PSUTIL_AVAILABLE:
+        return None
+    info = psutil.Process().memory_info()
+    return {'rss_bytes': info.rss, 'vms_bytes': info.vms}
+
+
+class TracemallocSnapshots:
+    """
+    On-demand tracemalloc: start/stop tracing, take named snapshots (the
+    last max_snapshots are kept) and diff two of them, or one against now,
+    grouped by line or file.
+
+    Tracing slows allocation-heavy code noticeably, so it only runs between
+    an admin's start() and stop().
+    """
+
+    def __init__(self, max_snapshots=5):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()  # id -> (snapshot, taken_at)
+        self._taken = 0
+        self._lock = threading.Lock()
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        """Stop tracing; tracemalloc snapshots taken so far stay available for diffing"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def status(self):
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [{'id': snapshot_id, 'taken_at': taken_at} for snapshot_id, (_, taken_at) in self._snapshots.items()]
+        return {'tracing': tracing, 'frames': tracemalloc.get_traceback_limit() if tracing else None,
+                'traced_bytes': current, 'peak_bytes': peak, 'snapshots': snapshots}
+
+    def take(self):
+        """Record a snapshot; returns its id"""
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc is not running; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        taken_at = datetime.now().isoformat()
+        with self._lock:
+            self._taken += 1
+            snapshot_id = f"snap-{self._taken}"
+            self._snapshots[snapshot_id] = (snapshot, taken_at)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def _get(self, snapshot_id):
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise KeyError(f"Unknown snapshot '{snapshot_id}'")
+        return entry[0]
+
+    def diff(self, older_id, newer_id=None, key_type='lineno', limit=20):
+        """Top allocation changes from older to newer (a fresh snapshot when newer_id is None)"""
+        if key_type not in ('lineno', 'filename', 'traceback'):
+            raise ValueError("key_type must be 'lineno', 'filename' or 'traceback'")
+        older = self._get(older_id)
+        newer_id = newer_id or self.take()
+        stats = self._get(newer_id).compare_to(older, key_type)
+        return {
+            'from': older_id,
+            'to': newer_id,
+            'size_diff_bytes': sum(stat.size_diff for stat in stats),
+            'top': [{
+                'location': str(stat.traceback) if key_type != 'traceback' else stat.traceback.format(),
+                'size_bytes': stat.size,
+                'size_diff_bytes': stat.size_diff,
+                'count': stat.count,
+                'count_diff': stat.count_diff
+            } for stat in stats[:limit]]
+        }
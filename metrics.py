@@ -0,0 +1,234 @@
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond lookups to multi-second model calls and renders
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label values"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labelvalues, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    """Observation counts in fixed buckets, plus sum and count, per label values"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labelvalues: (list(counts), total) for labelvalues, (counts, total) in self._series.items()}
+        for labelvalues, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield (f"{self.name}_bucket", _format_labels(self.labelnames, labelvalues, ('le', _format_value(bound))),
+                       cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labelvalues), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labelvalues), cumulative
+
+
+class Callback:
+    """Values read from the application when scraped (session count, cache statistics)"""
+
+    def __init__(self, name, help, read, type='gauge', labelnames=()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.type = type
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            labelvalues = labelvalues if isinstance(labelvalues, tuple) else (labelvalues,)
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'stage', 'started')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.stage_seconds.observe(time.perf_counter() - self.started, self.stage)
+        if exc_type is not None:
+            self.registry.stage_errors.inc(self.stage)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and scrape-time callbacks rendered in the
+    Prometheus text format for /metrics.
+
+    Request handling marks its stages (LLM call, prompt build, catalog
+    lookup, invoice render) with stage(name) or @timed(name), which feed
+    the app_stage_seconds histogram; instrument_methods() does the same for
+    every public method of an object such as the DatabaseManager.
+
+    With enabled=False (METRICS_ENABLED=0) stage() returns a shared no-op
+    context manager, and timed() and instrument_methods() leave functions
+    untouched, so instrumented code runs at its uninstrumented speed.
+    """
+
+    def __init__(self, enabled=True, prefix='app'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.stage_seconds = self.histogram('stage_seconds', 'Time spent in each request stage', ('stage',))
+        self.stage_errors = self.counter('stage_errors_total', 'Stages that raised an exception', ('stage',))
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(f"{self.prefix}_{name}", help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(f"{self.prefix}_{name}", help, labelnames, buckets))
+
+    def callback(self, name, help, read, type='gauge', labelnames=()):
+        return self._register(Callback(f"{self.prefix}_{name}", help, read, type, labelnames))
+
+    def stage(self, name):
+        """Context manager timing one stage into app_stage_seconds{stage=name}"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _StageTimer(self, name)
+
+    def timed(self, stage):
+        """Decorator timing every call of a function as a stage"""
+        def decorator(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _StageTimer(self, stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument_methods(self, obj, name, help):
+        """Time each public method of obj into a histogram labelled by method name"""
+        if not self.enabled:
+            return obj
+        histogram = self.histogram(name, help, ('operation',))
+        errors = self.counter(f"{name.rsplit('_seconds', 1)[0]}_errors_total",
+                              f"Calls timed by {self.prefix}_{name} that raised", ('operation',))
+
+        def wrap(operation, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                except Exception:
+                    errors.inc(operation)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, operation)
+            return wrapper
+
+        for attribute in dir(type(obj)):
+            if attribute.startswith('_') or not callable(getattr(type(obj), attribute)):
+                continue
+            setattr(obj, attribute, wrap(attribute, getattr(obj, attribute)))
+        return obj
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.warning("Error reading metric %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
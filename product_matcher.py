@@ -0,0 +1,270 @@
+import re
+import sys
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+import numpy as np
+
+# Default minimum Jaccard similarity of trigram sets for a fuzzy match
+DEFAULT_THRESHOLD = 0.3
+# Lower bar for 'did you mean' suggestions, where a single misspelled word is compared with whole names
+SUGGEST_THRESHOLD = 0.1
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def words(text):
+    """Lower-cased alphanumeric words of text"""
+    return _NON_WORD.sub(' ', str(text).lower()).split()
+
+
+def trigrams(text):
+    """
+    Character trigrams of each word of text, lower-cased, with words padded
+    by two leading spaces and one trailing space as in PostgreSQL pg_trgm
+    (so 'tv' gives '  t', ' tv', 'tv ').
+    """
+    grams = set()
+    for word in words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FuzzyMatcher:
+    """
+    Ranked fuzzy lookup of product names through a trigram inverted index.
+
+    match() scores names by the Jaccard similarity of their trigram sets
+    with the query's, so misspellings ('secuirty camra'), reordered words
+    and missing words still find the right product. The index keeps, for
+    each trigram, the sorted indices of the names containing it, all in
+    one numpy array with an offsets array (CSR layout).
+
+    A query counts shared trigrams per name with one bincount over its
+    trigrams' postings. Trigrams in more than half the names (shared
+    words, digits) are stored as the complement, the names lacking them,
+    so no lookup scans a posting longer than half the catalog and the
+    work stays in numpy on 100k-name catalogs.
+
+    The index is immutable; build a new matcher (MatcherCache does this)
+    when the catalog changes.
+    """
+
+    def __init__(self, names, threshold=DEFAULT_THRESHOLD):
+        self.names = list(names)
+        self.threshold = threshold
+        self._ids = {}  # trigram -> id
+        self._exact = {}  # lower-cased name -> first index
+        gram_ids = []
+        name_indices = []
+        sizes = []
+        for index, name in enumerate(self.names):
+            grams = trigrams(name) if name else ()
+            sizes.append(len(grams))
+            if name:
+                self._exact.setdefault(str(name).lower().strip(), index)
+            for gram in grams:
+                gram_ids.append(self._ids.setdefault(gram, len(self._ids)))
+            name_indices.extend([index] * len(grams))
+
+        gram_ids = np.asarray(gram_ids, dtype=np.int32)
+        order = np.argsort(gram_ids, kind='stable')
+        self._postings = np.asarray(name_indices, dtype=np.int32)[order]
+        self._offsets = np.zeros(len(self._ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(self._ids)), out=self._offsets[1:])
+        self._sizes = np.asarray(sizes, dtype=np.int32)
+
+        # Trigrams in most names (shared words, digits) are counted through the names lacking them
+        self._complements = {}
+        everyone = np.arange(len(self.names), dtype=np.int32)
+        for gram_id in np.flatnonzero(np.diff(self._offsets) > len(self.names) // 2):
+            posting = self._postings[self._offsets[gram_id]:self._offsets[gram_id + 1]]
+            self._complements[int(gram_id)] = np.setdiff1d(everyone, posting, assume_unique=True)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return (self._postings.nbytes + self._offsets.nbytes + self._sizes.nbytes
+                + sum(complement.nbytes for complement in self._complements.values()))
+
+    def exact(self, name):
+        """Index of the name equal to name ignoring case, or None"""
+        return self._exact.get(str(name).lower().strip())
+
+    def match(self, query, limit=5, threshold=None):
+        """[(index, score), ...] of names scoring at least threshold against query, best first"""
+        threshold = self.threshold if threshold is None else threshold
+        query_grams = trigrams(query)
+        known = [self._ids[gram] for gram in query_grams if gram in self._ids]
+        # A name needs at least threshold * |query| shared trigrams to reach the threshold
+        if not known or len(known) < threshold * len(query_grams):
+            return []
+
+        offsets = self._offsets
+        postings = self._postings
+        rare = [postings[offsets[i]:offsets[i + 1]] for i in known if i not in self._complements]
+        common = [self._complements[i] for i in known if i in self._complements]
+        shared = np.bincount(np.concatenate(rare), minlength=len(self.names)) if rare else np.zeros(len(self.names), np.int64)
+        if common:
+            # Every name has the common trigrams except those listed in their complements
+            shared += len(common)
+            shared -= np.bincount(np.concatenate(common), minlength=len(self.names))
+        # shared / (q + size - shared) >= threshold, rearranged to avoid dividing for every name
+        candidates = np.flatnonzero(shared * (1 + threshold) >= threshold * (self._sizes + len(query_grams)))
+        shared = shared[candidates]
+        scores = shared / (len(query_grams) + self._sizes[candidates] - shared)
+        if threshold <= 0:
+            keep = scores > 0
+            candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            # Keep every name tied with the limit-th score so ties resolve by catalog order below
+            cutoff = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= cutoff
+            candidates, scores = candidates[keep], scores[keep]
+        ranked = np.lexsort((candidates, -scores))[:limit]
+        return [(int(candidates[i]), round(float(scores[i]), 4)) for i in ranked]
+
+    def best(self, query, threshold=None):
+        """Index of the best match for query (an exact name first), or None"""
+        index = self.exact(query)
+        if index is not None:
+            return index
+        matches = self.match(query, limit=1, threshold=threshold)
+        return matches[0][0] if matches else None
+
+
+# Sorts after every character words() keeps, closing a prefix range in the sorted key lists
+_PREFIX_END = '\x7f'
+
+
+class PrefixIndex:
+    """
+    Search-as-you-type over product names.
+
+    Every word of every name is kept in one sorted list with a parallel
+    array of the names it came from, so the names having a word that
+    starts with a query term are one bisect range (the sorted array does
+    the job of a trie at a fraction of the memory); a query's terms must
+    all match. The whole normalised names are kept sorted the same way so
+    names starting with the full query can be ranked first.
+
+    search() ranks the exact name first, then names starting with the
+    query, then by how many terms matched a whole word, shorter names and
+    catalog order.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        pairs = []
+        full = []
+        for index, name in enumerate(self.names):
+            name_words = words(name) if name else []
+            pairs.extend((sys.intern(word), index) for word in set(name_words))
+            full.append((' '.join(name_words), index))
+        self._lengths = np.fromiter((len(name) for name, _ in full), dtype=np.int32, count=len(full))
+        pairs.sort()
+        full.sort()
+        self._words = [word for word, _ in pairs]
+        self._word_rows = np.fromiter((index for _, index in pairs), dtype=np.int32, count=len(pairs))
+        self._full = [name for name, _ in full]
+        self._full_rows = np.fromiter((index for _, index in full), dtype=np.int32, count=len(full))
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _between(keys, rows, low, high):
+        return rows[bisect_left(keys, low):bisect_left(keys, high)]
+
+    def search(self, query):
+        """Indices of the names matching query, best first (every name, in catalog order, for an empty query)"""
+        terms = words(query)
+        if not terms:
+            return np.arange(len(self.names))
+
+        rows = None
+        for term in terms:
+            matched = np.unique(self._between(self._words, self._word_rows, term, term + _PREFIX_END))
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+            if not len(rows):
+                return rows
+
+        whole_words = np.zeros(len(rows), dtype=np.int32)
+        for term in terms:
+            exact = self._word_rows[bisect_left(self._words, term):bisect_right(self._words, term)]
+            whole_words += np.isin(rows, exact)
+
+        normalised = ' '.join(terms)
+        tier = np.full(len(rows), 2, dtype=np.int8)
+        tier[np.isin(rows, self._between(self._full, self._full_rows, normalised, normalised + _PREFIX_END))] = 1
+        tier[np.isin(rows, self._between(self._full, self._full_rows, normalised, normalised + ' '))] = 0
+        return rows[np.lexsort((rows, self._lengths[rows], -whole_words, tier))]
+
+
+def product_names(products):
+    """Names of a product list, read from the name column of a catalog snapshot without building rows"""
+    if hasattr(products, 'column'):
+        return products.column('name', '')
+    return [product.get('name', '') if isinstance(product, dict) else '' for product in products]
+
+
+class MatcherCache:
+    """
+    Name indexes (FuzzyMatcher, PrefixIndex) per product list: the default
+    catalog and each session's upload, built on first lookup.
+
+    Lists are keyed by identity and edited in place, so whoever adds,
+    updates or deletes products calls invalidate() for the list. The least
+    recently used lists are dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries=64, threshold=DEFAULT_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries = OrderedDict()  # id(products) -> (products, {kind: index})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def _index(self, products, kind, build):
+        key = id(products)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is products:
+                self._entries.move_to_end(key)
+                if kind in entry[1]:
+                    self.hits += 1
+                    return entry[1][kind]
+
+        index = build(product_names(products))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not products:
+                # Holding products keeps its id from being reused while cached
+                entry = self._entries[key] = (products, {})
+            entry[1][kind] = index
+            self._entries.move_to_end(key)
+            self.builds += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def get(self, products):
+        """FuzzyMatcher for products"""
+        return self._index(products, 'fuzzy', lambda names: FuzzyMatcher(names, self.threshold))
+
+    def prefix(self, products):
+        """PrefixIndex for products"""
+        return self._index(products, 'prefix', PrefixIndex)
+
+    def invalidate(self, products):
+        with self._lock:
+            self._entries.pop(id(products), None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'builds': self.builds}
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def canonical_hash(*parts):
+    """SHA-256 of JSON-serializable parts, independent of dict key order"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RenderCache:
+    """
+    De-duplicates expensive renders (invoice PDFs) by content key.
+
+    get_or_render(key, render) returns the artifact rendered earlier for the
+    same key if it is younger than ttl_seconds and still passes is_valid
+    (e.g. the file still exists). Concurrent calls with a key that is being
+    rendered wait for that render instead of starting their own. Failed
+    renders are not cached; their exception is raised in every waiter.
+    With store=False the result is shared only with the calls waiting on
+    that render and is not kept for later ones.
+
+    Each process holds its own cache, so identical requests handled by
+    different workers may still render twice.
+    """
+
+    def __init__(self, ttl_seconds=600, max_entries=1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (result, rendered_at)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.coalesced = 0
+        self.renders = 0
+
+    def get_or_render(self, key, render, is_valid=None, store=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] <= self.ttl_seconds and (is_valid is None or is_valid(entry[0])):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = _InFlight()
+                self.renders += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = render()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.error is None and store:
+                    self._entries[key] = (flight.result, time.time())
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'in_flight': len(self._in_flight),
+                    'hits': self.hits, 'coalesced': self.coalesced, 'renders': self.renders}
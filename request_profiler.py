@@ -0,0 +1,259 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import secrets
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+
+class _StackSampler:
+    """Samples one thread's Python stack every interval seconds into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = ';'.join(f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                             for entry in traceback.extract_stack(frame))
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed format ("frame;frame;frame count"), ready for flamegraph.pl/speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _ActiveProfile:
+    def __init__(self, mode, reason, sample_interval):
+        self.mode = mode
+        self.reason = reason
+        self.started = time.perf_counter()
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = _StackSampler(threading.get_ident(), sample_interval)
+            self.profiler.start()
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        return time.perf_counter() - self.started
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of individual requests.
+
+    A request is profiled when it carries the trigger header (from an admin
+    session, or with PROFILE_TOKEN as its value), while an admin has
+    switched profiling on (optionally for some endpoints and for a limited
+    time), or when it falls in the sampled fraction sample_rate. 'cprofile'
+    mode records deterministic call statistics (saved as .prof for
+    pstats/snakeviz); 'sample' mode samples the request thread's stack
+    every sample_interval seconds (saved as collapsed stacks for flame
+    graphs), which costs far less on long requests.
+
+    Profiles are written under folder with a JSON metadata file each, which
+    is read back on startup; the oldest are deleted beyond max_profiles.
+    When nothing is switched on start() returns None after a couple of
+    attribute checks, so requests pay nothing measurable.
+    """
+
+    def __init__(self, folder='profiles', mode='cprofile', sample_rate=0.0, sample_interval=0.005,
+                 max_profiles=200, max_concurrent=4, token=None, header='X-Profile'):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (known: {', '.join(PROFILE_MODES)})")
+        self.folder = folder
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.sample_interval = sample_interval
+        self.max_profiles = max_profiles
+        self.max_concurrent = max_concurrent
+        self.token = token
+        self.header = header
+        self.enabled_until = None  # Admin toggle: profile matching requests until this time (inf: until switched off)
+        self.endpoints = None  # Admin toggle: only these endpoints (None: all)
+        self._profiles = OrderedDict()  # profile id -> metadata
+        self._active = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        # Profile ids start with a timestamp, so name order is age order
+        for name in sorted(os.listdir(self.folder)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.folder, name), encoding='utf-8') as f:
+                    record = json.load(f)
+                self._profiles[record['id']] = record
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Skipping unreadable profile metadata %s: %s", name, e)
+        self._prune()
+
+    def _prune(self):
+        while len(self._profiles) > self.max_profiles:
+            profile_id, evicted = self._profiles.popitem(last=False)
+            for name in (evicted['filename'], f"{profile_id}.json"):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+
+    def enable(self, duration_seconds=None, endpoints=None, mode=None, sample_rate=None):
+        """Admin toggle: profile every (matching) request, for duration_seconds or until disable()"""
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (known: {', '.join(PROFILE_MODES)})")
+        with self._lock:
+            self.enabled_until = time.time() + duration_seconds if duration_seconds else float('inf')
+            self.endpoints = set(endpoints) if endpoints else None
+            if mode is not None:
+                self.mode = mode
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+
+    def disable(self):
+        with self._lock:
+            self.enabled_until = None
+            self.endpoints = None
+
+    def status(self):
+        with self._lock:
+            toggled = self.enabled_until is not None and time.time() < self.enabled_until
+            return {
+                'enabled': toggled,
+                'enabled_until': (datetime.fromtimestamp(self.enabled_until).isoformat()
+                                  if toggled and self.enabled_until != float('inf') else None),
+                'endpoints': sorted(self.endpoints) if toggled and self.endpoints else None,
+                'mode': self.mode,
+                'sample_rate': self.sample_rate,
+                'header': self.header,
+                'active': self._active,
+                'stored': len(self._profiles)
+            }
+
+    def _reason(self, endpoint, header_value, is_admin):
+        if header_value is not None and ((self.token and secrets.compare_digest(header_value, self.token)) or is_admin()):
+            return 'header'
+        if self.enabled_until is not None:
+            if time.time() < self.enabled_until:
+                if self.endpoints is None or endpoint in self.endpoints:
+                    return 'admin'
+            else:
+                self.disable()
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def start(self, endpoint, header_value=None, is_admin=lambda: False):
+        """Start profiling the current request if it is selected; returns a handle for finish() or None"""
+        if header_value is None and self.enabled_until is None and not self.sample_rate:
+            return None
+        reason = self._reason(endpoint, header_value, is_admin)
+        if reason is None:
+            return None
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                return None
+            self._active += 1
+        try:
+            return _ActiveProfile(self.mode, reason, self.sample_interval)
+        except Exception as e:
+            with self._lock:
+                self._active -= 1
+            logger.warning("Could not start request profile: %s", e)
+            return None
+
+    def finish(self, active, details):
+        """Stop a profile started by start() and store it with details (endpoint, method, path, user, status)"""
+        try:
+            duration = active.stop()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+        profile_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        try:
+            if active.mode == 'cprofile':
+                filename = f"{profile_id}.prof"
+                active.profiler.dump_stats(os.path.join(self.folder, filename))
+                summary = self._top_functions(active.profiler)
+            else:
+                filename = f"{profile_id}.collapsed.txt"
+                with open(os.path.join(self.folder, filename), 'w', encoding='utf-8') as f:
+                    f.write(active.profiler.collapsed())
+                summary = [{'stack': stack.rsplit(';', 1)[-1], 'samples': count}
+                           for stack, count in active.profiler.stacks.most_common(10)]
+            record = dict(details, id=profile_id, filename=filename, mode=active.mode, reason=active.reason,
+                          duration_ms=round(duration * 1000, 2), created_at=datetime.now().isoformat(), top=summary)
+            with open(os.path.join(self.folder, f"{profile_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(record, f, default=str)
+        except Exception as e:
+            logger.warning("Could not save request profile: %s", e)
+            return None
+
+        with self._lock:
+            self._profiles[profile_id] = record
+            self._prune()
+        logger.info("Saved %s profile %s for %s (%.1f ms, %s)", active.mode, profile_id, details.get('endpoint'),
+                    duration * 1000, active.reason)
+        return profile_id
+
+    @staticmethod
+    def _top_functions(profiler, limit=10):
+        stats = pstats.Stats(profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{'function': f"{func} ({os.path.basename(path)}:{line})", 'calls': calls,
+                 'cumulative_ms': round(cumulative * 1000, 2)}
+                for (path, line, func), (_, calls, _, cumulative, _) in rows]
+
+    def list(self):
+        """Stored profiles, newest first"""
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def path(self, record):
+        return os.path.join(self.folder, record['filename'])
+
+    def text_report(self, record, limit=50):
+        """pstats report of a cProfile profile sorted by cumulative time"""
+        out = io.StringIO()
+        pstats.Stats(self.path(record), stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
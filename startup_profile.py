@@ -0,0 +1,37 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Wall-clock timing of application startup.
+
+    mark(name) records the time spent since the previous mark, so a module can
+    call it after each block of imports/initialization and print a per-phase
+    report once startup is done.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = []
+        self._last_mark = self.started_at
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last_mark))
+        self._last_mark = now
+
+    def total_seconds(self):
+        return self._last_mark - self.started_at
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total_seconds() * 1000, 1),
+            'phases': [{'phase': name, 'ms': round(seconds * 1000, 1)} for name, seconds in self.phases]
+        }
+
+    def report(self):
+        logger.info("Startup finished in %.0f ms (%s)", self.total_seconds() * 1000,
+                    ', '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases))
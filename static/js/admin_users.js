@@ -8,12 +8,15 @@ class AdminUsersManager {
         this.currentPage = 1;
         this.itemsPerPage = 10;
         this.totalUsers = 0;
-        this.allUsers = [];
-        this.filteredUsers = [];
+        this.totalPages = 0;
+        this.users = []; // Current page only; filtering and paging happen on the server
         this.currentUserRole = 'admin'; // Will be set from session
         this.searchTerm = '';
         this.roleFilter = 'all';
         this.statusFilter = 'all';
+        this.departmentFilter = 'all';
+        this.sortColumn = 'created_at';
+        this.sortOrder = 'desc';
         
         this.init();
     }
@@ -55,7 +58,7 @@ class AdminUsersManager {
         const searchInput = document.getElementById('userSearchInput');
         if (searchInput) {
             searchInput.addEventListener('input', this.debounce((e) => {
-                this.searchTerm = e.target.value.toLowerCase();
+                this.searchTerm = e.target.value.trim();
                 this.filterAndDisplayUsers();
             }, 300));
         }
@@ -77,6 +80,19 @@ class AdminUsersManager {
             });
         }
 
+        const departmentFilter = document.getElementById('departmentFilter');
+        if (departmentFilter) {
+            departmentFilter.addEventListener('change', (e) => {
+                this.departmentFilter = e.target.value;
+                this.filterAndDisplayUsers();
+            });
+        }
+
+        // Column sorting
+        document.querySelectorAll('#usersTable th[data-sort]').forEach(header => {
+            header.addEventListener('click', () => this.sortBy(header.dataset.sort));
+        });
+
         // Form submissions
         const addUserForm = document.getElementById('addUserForm');
         if (addUserForm) {
@@ -237,13 +253,29 @@ class AdminUsersManager {
         try {
             this.showLoading(true);
             
-            const response = await fetch('/api/admin/users');
+            const params = new URLSearchParams({
+                page: this.currentPage,
+                per_page: this.itemsPerPage,
+                sort: this.sortColumn,
+                order: this.sortOrder,
+                role: this.roleFilter,
+                status: this.statusFilter,
+                department: this.departmentFilter
+            });
+            if (this.searchTerm) params.set('search', this.searchTerm);
+
+            const response = await fetch(`/api/admin/users?${params}`);
             const data = await response.json();
             
             if (data.success) {
-                this.allUsers = data.users || [];
+                this.users = data.users || [];
+                this.totalUsers = data.pagination?.total || 0;
+                this.totalPages = data.pagination?.total_pages || 0;
                 this.updateStatsCards(data.stats || {});
-                this.filterAndDisplayUsers();
+                this.displayUsers();
+                this.updatePagination();
+                this.updateTableSubtitle();
+                this.updateSortIndicators();
             } else {
                 this.showError('Failed to load users: ' + (data.error || 'Unknown error'));
             }
@@ -272,24 +304,27 @@ class AdminUsersManager {
     }
 
     filterAndDisplayUsers() {
-        this.filteredUsers = this.allUsers.filter(user => {
-            const matchesSearch = !this.searchTerm || 
-                user.full_name?.toLowerCase().includes(this.searchTerm) ||
-                user.username?.toLowerCase().includes(this.searchTerm) ||
-                user.email?.toLowerCase().includes(this.searchTerm) ||
-                user.department?.toLowerCase().includes(this.searchTerm);
+        this.currentPage = 1; // Reset to first page
+        this.loadUsersData();
+    }
 
-            const matchesRole = this.roleFilter === 'all' || user.role === this.roleFilter;
-            const matchesStatus = this.statusFilter === 'all' || user.status === this.statusFilter;
+    sortBy(column) {
+        if (this.sortColumn === column) {
+            this.sortOrder = this.sortOrder === 'asc' ? 'desc' : 'asc';
+        } else {
+            this.sortColumn = column;
+            this.sortOrder = 'asc';
+        }
+        this.filterAndDisplayUsers();
+    }
 
-            return matchesSearch && matchesRole && matchesStatus;
+    updateSortIndicators() {
+        document.querySelectorAll('#usersTable th[data-sort]').forEach(header => {
+            header.classList.remove('sorted-asc', 'sorted-desc');
+            if (header.dataset.sort === this.sortColumn) {
+                header.classList.add(`sorted-${this.sortOrder}`);
+            }
         });
-
-        this.totalUsers = this.filteredUsers.length;
-        this.currentPage = 1; // Reset to first page
-        this.displayUsers();
-        this.updatePagination();
-        this.updateTableSubtitle();
     }
 
     displayUsers() {
@@ -298,7 +333,7 @@ class AdminUsersManager {
         
         if (!tbody) return;
 
-        if (this.filteredUsers.length === 0) {
+        if (this.users.length === 0) {
             tbody.innerHTML = '';
             if (emptyState) emptyState.style.display = 'block';
             return;
@@ -306,11 +341,7 @@ class AdminUsersManager {
 
         if (emptyState) emptyState.style.display = 'none';
 
-        const startIndex = (this.currentPage - 1) * this.itemsPerPage;
-        const endIndex = startIndex + this.itemsPerPage;
-        const pageUsers = this.filteredUsers.slice(startIndex, endIndex);
-
-        tbody.innerHTML = pageUsers.map(user => this.createUserRow(user)).join('');
+        tbody.innerHTML = this.users.map(user => this.createUserRow(user)).join('');
     }
 
     createUserRow(user) {
@@ -381,7 +412,7 @@ class AdminUsersManager {
     }
 
     updatePagination() {
-        const totalPages = Math.ceil(this.totalUsers / this.itemsPerPage);
+        const totalPages = this.totalPages;
         
         // Update pagination info
         const startItem = this.totalUsers === 0 ? 0 : (this.currentPage - 1) * this.itemsPerPage + 1;
@@ -437,7 +468,7 @@ class AdminUsersManager {
 
         let text = `Showing ${this.totalUsers} user${this.totalUsers !== 1 ? 's' : ''}`;
         
-        if (this.searchTerm || this.roleFilter !== 'all' || this.statusFilter !== 'all') {
+        if (this.searchTerm || this.roleFilter !== 'all' || this.statusFilter !== 'all' || this.departmentFilter !== 'all') {
             text += ' (filtered)';
         }
 
@@ -446,18 +477,16 @@ class AdminUsersManager {
 
     // Pagination methods
     changePage(direction) {
-        const totalPages = Math.ceil(this.totalUsers / this.itemsPerPage);
         const newPage = this.currentPage + direction;
         
-        if (newPage >= 1 && newPage <= totalPages) {
+        if (newPage >= 1 && newPage <= this.totalPages) {
             this.goToPage(newPage);
         }
     }
 
     goToPage(page) {
         this.currentPage = page;
-        this.displayUsers();
-        this.updatePagination();
+        this.loadUsersData();
     }
 
     // Modal management
@@ -8,6 +8,7 @@ class InvoiceAssistant {
         this.isConnected = false;
         this.currentTheme = localStorage.getItem('theme') || 'light';
         this.currentChatId = null;
+        this.productsModalPageSize = 50;
         
         console.log('Constructor initialized with Session-ID:', this.sessionId);
 
@@ -16,6 +17,7 @@ class InvoiceAssistant {
         
         this.init();
         this.deleteChatDebounced = this.debounce(this.deleteChat.bind(this), 500);
+        this.loadProductsForModalDebounced = this.debounce(() => this.loadProductsForModal(), 250);
     }
 
     debounce(func, wait) {
@@ -178,7 +180,7 @@ class InvoiceAssistant {
 
         if (this.elements.productSearchInput) {
         this.elements.productSearchInput.addEventListener('input', () => {
-            this.filterProductsList();
+            this.loadProductsForModalDebounced();
         });
     }
     }
@@ -679,14 +681,15 @@ class InvoiceAssistant {
 
     async loadProductStats() {
         try {
-            const response = await fetch(`${this.API_BASE_URL}/get_products`, {
+            // Only the total is needed, not the catalog
+            const response = await fetch(`${this.API_BASE_URL}/products/search?limit=1&fields=name`, {
                 headers: { 'Session-ID': this.sessionId },
                 credentials: 'include'
             });
             
             if (response.ok) {
                 const data = await response.json();
-                this.updateProductCount(data.count || data.products.length);
+                this.updateProductCount(data.total);
             } else if (response.status === 403) {
                 console.warn('Access denied, fetching limited product info');
                 this.addMessage('⚠️ Access restricted. Please log in as admin or contact support.', 'ai', true);
@@ -874,6 +877,7 @@ class InvoiceAssistant {
 
         this.elements.chatMessages.appendChild(messageGroup);
         this.scrollToBottom();
+        return messageGroup;
     }
 
     showTyping() {
@@ -994,11 +998,15 @@ class InvoiceAssistant {
                 // Add welcome message
                 this.elements.chatMessages.innerHTML = this.getWelcomeMessage();
 
-                // Add chat messages
+                // Add chat messages (only the most recent page is loaded)
                 data.messages.forEach(msg => {
                     this.addMessage(msg.content, msg.role === 'user' ? 'user' : 'ai');
                 });
 
+                if (data.has_more) {
+                    this.addLoadOlderButton(chatId, data.next_before);
+                }
+
                 // Update chat list to highlight active chat
                 await this.updateChatList();
 
@@ -1019,6 +1027,50 @@ class InvoiceAssistant {
         }
     }
 
+    addLoadOlderButton(chatId, before) {
+        // Goes right after the welcome message, above the oldest loaded message
+        const welcome = this.elements.chatMessages.querySelector('.message-group');
+        const button = document.createElement('button');
+        button.className = 'load-older-messages';
+        button.innerHTML = '<i class="fas fa-history"></i> Load earlier messages';
+        button.addEventListener('click', () => this.loadOlderMessages(chatId, before, button));
+        this.elements.chatMessages.insertBefore(button, welcome ? welcome.nextSibling : this.elements.chatMessages.firstChild);
+    }
+
+    async loadOlderMessages(chatId, before, button) {
+        try {
+            button.disabled = true;
+            const response = await fetch(`${this.API_BASE_URL}/chat_messages/${chatId}?before=${before}`, {
+                headers: { 'Session-ID': this.sessionId },
+                credentials: 'include'
+            });
+            const data = await response.json();
+
+            if (!response.ok || !data.success || chatId !== this.currentChatId) {
+                button.disabled = false;
+                return;
+            }
+
+            // Insert the older page above the current messages, keeping the scroll position
+            const container = this.elements.chatMessages;
+            const previousHeight = container.scrollHeight;
+            const anchor = button.nextSibling;
+            data.messages.forEach(msg => {
+                const group = this.addMessage(msg.content, msg.role === 'user' ? 'user' : 'ai');
+                container.insertBefore(group, anchor);
+            });
+            button.remove();
+
+            if (data.has_more) {
+                this.addLoadOlderButton(chatId, data.next_before);
+            }
+            container.scrollTop = container.scrollHeight - previousHeight;
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+            button.disabled = false;
+        }
+    }
+
     async deleteChat(chatId) {
         if (!confirm('Are you sure you want to delete this chat? This action cannot be undone.')) {
             return;
@@ -1380,7 +1432,14 @@ class InvoiceAssistant {
             this.elements.productsList.style.display = 'none';
             this.elements.productsEmpty.style.display = 'none';
             
-            const response = await fetch(`${this.API_BASE_URL}/products/all`, {
+            // The server ranks and pages matches for the search box instead of sending the whole catalog
+            const query = this.elements.productSearchInput ? this.elements.productSearchInput.value.trim() : '';
+            const params = new URLSearchParams({
+                q: query,
+                limit: this.productsModalPageSize,
+                fields: 'name,name_description,price,stock'
+            });
+            const response = await fetch(`${this.API_BASE_URL}/products/search?${params}`, {
                 method: 'GET',
                 headers: {
                     'Session-ID': this.sessionId
@@ -1390,7 +1449,7 @@ class InvoiceAssistant {
             
             if (response.ok) {
                 const data = await response.json();
-                this.displayProductsInModal(data.products);
+                this.displayProductsInModal(data.results, data.total, query);
             } else {
                 throw new Error('Failed to load products');
             }
@@ -1402,19 +1461,26 @@ class InvoiceAssistant {
         }
     }
 
-    displayProductsInModal(products) {
+    displayProductsInModal(products, total, query) {
         if (!products || products.length === 0) {
             this.elements.productsEmpty.style.display = 'block';
             this.elements.productsList.style.display = 'none';
-            this.elements.productsCount.textContent = 'No products available';
+            this.elements.productsCount.textContent = query ? 'No matching products' : 'No products available';
             return;
         }
 
-        
-        this.updateProductCount(products.length);
+        if (!query) {
+            this.updateProductCount(total);
+        }
         
         // Update count
-        this.elements.productsCount.textContent = `${products.length} products available`;
+        if (query) {
+            this.elements.productsCount.textContent = `${products.length} of ${total} matching products`;
+        } else if (products.length < total) {
+            this.elements.productsCount.textContent = `Showing ${products.length} of ${total} products`;
+        } else {
+            this.elements.productsCount.textContent = `${total} products available`;
+        }
 
         
         // Create products HTML
@@ -1439,30 +1505,6 @@ class InvoiceAssistant {
         this.elements.productsEmpty.style.display = 'none';
     }
 
-    filterProductsList() {
-        const searchTerm = this.elements.productSearchInput.value.toLowerCase();
-        const productItems = this.elements.productsList.querySelectorAll('.product-item');
-        let visibleCount = 0;
-        
-        productItems.forEach(item => {
-            const productName = item.dataset.name;
-            if (productName.includes(searchTerm)) {
-                item.style.display = 'block';
-                visibleCount++;
-            } else {
-                item.style.display = 'none';
-            }
-        });
-        
-        // Update count
-        const totalProducts = productItems.length;
-        if (searchTerm) {
-            this.elements.productsCount.textContent = `${visibleCount} of ${totalProducts} products`;
-        } else {
-            this.elements.productsCount.textContent = `${totalProducts} products available`;
-        }
-    }
-
     showProductsError() {
         this.elements.productsList.innerHTML = `
             <div class="error-message">
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class SystemMetricsSampler:
+    """
+    Background sampler for /api/system_health.
+
+    A daemon thread records CPU, memory, disk, database size, active
+    sessions and request rate every interval seconds into a fixed-size ring
+    buffer, so the endpoint only reads the latest sample instead of blocking
+    on psutil.cpu_percent(interval=1).
+    """
+
+    def __init__(self, db_path='invoices.db', interval=5.0, history_size=120, session_counter=None):
+        self.db_path = db_path
+        self.interval = interval
+        self.session_counter = session_counter or (lambda: 0)
+        self.samples = deque(maxlen=history_size)
+        self.started_at = self._process_start_time()
+        self._request_count = 0
+        self._last_request_count = 0
+        self._last_sample_time = None
+        self._count_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _process_start_time():
+        if PSUTIL_AVAILABLE:
+            try:
+                return psutil.Process(os.getpid()).create_time()
+            except Exception:
+                pass
+        return time.time()
+
+    def ensure_started(self):
+        """Start the sampler thread once (safe to call on every request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if PSUTIL_AVAILABLE:
+                psutil.cpu_percent(interval=None)  # Prime the counter; the first reading is meaningless
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='system-metrics-sampler', daemon=True)
+            self._thread.start()
+            logger.info("System metrics sampler started (%ss interval)", self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def record_request(self):
+        """Count one handled request (used for the request rate)"""
+        with self._count_lock:
+            self._request_count += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning("Error sampling system metrics: %s", e)
+            self._stop.wait(self.interval)
+
+    def sample(self):
+        """Take one sample and append it to the ring buffer"""
+        now = time.time()
+
+        with self._count_lock:
+            request_count = self._request_count
+        elapsed = now - self._last_sample_time if self._last_sample_time else None
+        request_rate = (request_count - self._last_request_count) / elapsed if elapsed else 0.0
+        self._last_request_count = request_count
+        self._last_sample_time = now
+
+        cpu = memory = disk = None
+        if PSUTIL_AVAILABLE:
+            cpu = psutil.cpu_percent(interval=None)
+            memory = psutil.virtual_memory().percent
+            disk = psutil.disk_usage('/').percent
+
+        try:
+            db_size = os.path.getsize(self.db_path) / (1024 * 1024)  # Size in MB
+        except OSError:
+            db_size = 0
+
+        sample = {
+            'timestamp': datetime.fromtimestamp(now).isoformat(),
+            'cpu_usage': round(cpu, 1) if cpu is not None else None,
+            'memory_usage': round(memory, 1) if memory is not None else None,
+            'disk_usage': round(disk, 1) if disk is not None else None,
+            'database_size': round(db_size, 2),
+            'active_sessions': self.session_counter(),
+            'request_rate': round(request_rate, 2)
+        }
+        self.samples.append(sample)
+        return sample
+
+    def latest(self):
+        """Most recent sample, taking one synchronously if none exists yet"""
+        if not self.samples:
+            return self.sample()
+        return self.samples[-1]
+
+    def history(self, field, limit=60):
+        """Recent values of one metric, oldest first"""
+        return [sample[field] for sample in list(self.samples)[-limit:]]
+
+    def uptime_seconds(self):
+        return time.time() - self.started_at
+
+    def uptime(self):
+        """Process uptime formatted like '1d 2h 35m'"""
+        minutes = int(self.uptime_seconds() // 60)
+        days, minutes = divmod(minutes, 1440)
+        hours, minutes = divmod(minutes, 60)
+        return f"{days}d {hours}h {minutes}m" if days else f"{hours}h {minutes}m"
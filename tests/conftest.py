@@ -0,0 +1,44 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def app0(tmp_path_factory):
+    """
+    The app module, imported in a scratch directory holding a fresh
+    database (with the default admin/admin123 and user1/user123 accounts)
+    and a copy of product_data.json, so tests never touch the real files.
+    """
+    workdir = tmp_path_factory.mktemp('app')
+    shutil.copy(os.path.join(ROOT, 'product_data.json'), workdir)
+    previous = os.getcwd()
+    os.chdir(workdir)
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '2')
+    os.environ.setdefault('SYSTEM_SAMPLER_INTERVAL', '60')
+
+    from database_manager import DatabaseManager
+    DatabaseManager()
+    import app0 as module
+    yield module
+    # Write pending cart adds now: the exit-time flush would run outside workdir
+    module.cart_add_counter.flush()
+    os.chdir(previous)
+
+
+def login(app0, username='admin', password='admin123'):
+    """Test client logged in as username"""
+    client = app0.app.test_client()
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200, response.get_json()
+    return client
+
+
+@pytest.fixture
+def admin_client(app0):
+    return login(app0)
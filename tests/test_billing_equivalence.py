@@ -0,0 +1,136 @@
+"""
+Randomized equivalence tests for the billing engine.
+
+Each case generates a random catalog, a sequence of cart edits (add,
+partial remove, discount changes, clear) and an overall discount from its
+seed, and checks that every billing path agrees:
+
+  * a Cart's running totals (integer paise) exactly equal the totals
+    summed from its lines,
+  * Cart.invoice() equals BillingEngine.calculate_invoice() for the same
+    order, and the breakdown summary equals the invoice summary,
+  * the summary the cart views format is exact integer paise: the overall
+    discount is rounded once and the grand total is the total less it,
+  * each tax rule matches a straightforward float reference formula to
+    within the engine's two roundings per line (subtotal and GST).
+
+A failing case is rerun by its test id (tax rule and seed):
+
+    python -m pytest "tests/test_billing_equivalence.py::test_billing_paths_agree[goods-17]"
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from billing_engine import BillingEngine, TAX_RULES, TOTAL_PAISE_FIELDS, percent_of, to_basis_points, to_rupees
+from cart import Cart
+
+SEEDS = range(200)
+STEPS = 40  # Cart edits per case
+CATALOG_SIZE = 25
+
+# Rupees: the engine rounds each line's discounted subtotal (half a paisa, which the highest
+# GST rate carries into the tax) and its GST (another half paisa)
+REFERENCE_TOLERANCE = 0.005 * (1 + 0.28) + 0.005 + 1e-9
+
+
+def random_catalog(rng, size):
+    catalog = []
+    for i in range(size):
+        product = {'name': f"Product {i} {rng.choice(['Camera', 'Doorbell', 'NVR', 'Sensor'])}",
+                   'price': round(rng.uniform(1, 50000), rng.choice([0, 2]))}
+        for field in ('Installation Charge', 'Service Charge', 'Shipping Charge', 'Handling Fee'):
+            if rng.random() < 0.6:
+                product[field] = round(rng.uniform(0, 2000), 2)
+        if rng.random() < 0.8:
+            product['gst_rate'] = rng.choice([0, 5, 12, 18, 28])
+        catalog.append(product)
+    return catalog
+
+
+def reference_line(product, quantity, discount, rule):
+    """Line total written out independently of the engine"""
+    price = product['price'] * (1 - discount / 100) * quantity
+    charges = sum(product.get(field, 0) for field in
+                  ('Installation Charge', 'Service Charge', 'Shipping Charge', 'Handling Fee')) * quantity
+    taxable = price + charges if rule == 'taxable_value' else price
+    return price + charges + taxable * product.get('gst_rate', 18) / 100
+
+
+def assert_running_totals(cart):
+    for field in TOTAL_PAISE_FIELDS:
+        summed = sum(getattr(line, field) for line in cart)
+        assert getattr(cart, field) == summed, f"running {field} differs from the lines' sum"
+
+
+def build_case(rng, rule):
+    """(engine, catalog, cart, overall discount) after a random edit sequence, checking running totals each step"""
+    engine = BillingEngine(rule)
+    catalog = random_catalog(rng, CATALOG_SIZE)
+    cart = Cart(engine)
+
+    for _ in range(STEPS):
+        product = rng.choice(catalog)
+        action = rng.random()
+        if action < 0.55:
+            discount = rng.choice([0, 0, 5, 10, 12.5, 33.3])
+            cart.add(product, rng.randint(1, 50), discount)
+        elif action < 0.75 and len(cart):
+            line = rng.choice(list(cart))
+            cart.remove(line.name, rng.choice([None, rng.randint(1, line.quantity + 5)]))
+        elif action < 0.95 and len(cart):
+            cart.set_discount(rng.choice(list(cart)).name, rng.choice([0, 7.5, 15, 50, 100]))
+        elif action >= 0.98:
+            cart.clear()
+        assert_running_totals(cart)
+
+    return engine, catalog, cart, rng.choice([0, 0, 5, 10, 25])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('rule', list(TAX_RULES))
+def test_billing_paths_agree(rule, seed):
+    engine, catalog, cart, overall_discount = build_case(random.Random(seed), rule)
+    order = {line.name: line.quantity for line in cart}
+    discounts = {line.name: line.discount for line in cart if line.discount}
+    from_cart = cart.invoice(overall_discount)
+    from_order = engine.calculate_invoice(order, catalog, discounts, overall_discount)
+
+    assert from_cart['items'] == from_order['items']
+    assert from_cart['summary'] == from_order['summary']
+    # The breakdown does not show the invoice's single GST rate, so summary() leaves it at the default
+    breakdown = dict(cart.summary(overall_discount), gst_rate=from_cart['summary']['gst_rate'])
+    assert breakdown == from_cart['summary']
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('rule', list(TAX_RULES))
+def test_lines_match_reference_formula(rule, seed):
+    _, catalog, cart, _ = build_case(random.Random(seed), rule)
+    by_name = {product['name']: product for product in catalog}
+    for line in cart:
+        expected = reference_line(by_name[line.name], line.quantity, line.discount, rule)
+        assert line.total == pytest.approx(expected, abs=REFERENCE_TOLERANCE), line.name
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('rule', list(TAX_RULES))
+def test_summary_is_exact_paise(rule, seed):
+    _, _, cart, overall_discount = build_case(random.Random(seed), rule)
+    summary = cart.summary(overall_discount)
+    for key, value in summary.items():
+        if key.endswith('_paise'):
+            assert isinstance(value, int), key
+            assert summary[key[:-len('_paise')]] == to_rupees(value), key
+
+    total = summary['total_incl_gst_paise']
+    assert total == (summary['subtotal_paise'] + summary['total_installation_paise'] + summary['total_service_paise']
+                     + summary['total_shipping_paise'] + summary['total_handling_paise'] + summary['total_gst_paise'])
+    discount = percent_of(total, to_basis_points(overall_discount)) if overall_discount > 0 else 0
+    assert summary['overall_discount_amount_paise'] == discount
+    assert summary['grand_total_paise'] == total - discount
@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+
+from catalog_snapshot import MAX_EXACT_INT, CatalogSnapshot, catalog_column, load_catalog, write_snapshot
+
+PRODUCTS = [
+    {'name': 'Camera', 'price': 1999.99, 'stock': 12, 'gst_rate': 18, 'tags': ['ai', '4k']},
+    {'name': 'Doorbell ₹ édition', 'price': 850, 'stock': 0, 'active': True, 'specs': {'wifi': None}},
+    {'name': '', 'price': 2.0, 'note': None, 'serial': MAX_EXACT_INT + 1},
+    {'price': -0.5, 'stock': 'unknown', 'gst_rate': 5},
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / 'catalog.snapshot')
+    write_snapshot(PRODUCTS, path, source={'mtime_ns': 1, 'size': 2})
+    snapshot = CatalogSnapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def test_round_trip_keeps_values_types_and_missing_keys(snapshot):
+    assert list(snapshot) == PRODUCTS
+    assert [sorted(product) for product in snapshot] == [sorted(product) for product in PRODUCTS]
+    for read, written in zip(snapshot, PRODUCTS):
+        assert [type(read[key]) for key in written] == [type(value) for value in written.values()]
+    assert snapshot.source == {'mtime_ns': 1, 'size': 2}
+    assert not snapshot.materialized
+
+
+def test_indexing_and_columns(snapshot):
+    assert len(snapshot) == 4
+    assert snapshot[-1] == PRODUCTS[-1]
+    assert snapshot[1:3] == PRODUCTS[1:3]
+    with pytest.raises(IndexError):
+        snapshot[4]
+    assert snapshot.column('stock', 0) == [12, 0, 0, 'unknown']
+    assert snapshot.column('name') == ['Camera', 'Doorbell ₹ édition', '', None]
+    assert snapshot.column('colour', 'n/a') == ['n/a'] * 4
+
+
+def test_writes_are_copy_on_write(snapshot):
+    snapshot[0] = dict(PRODUCTS[0], stock=3)
+    snapshot.append({'name': 'Sensor'})
+    del snapshot[1]
+
+    assert snapshot.materialized
+    assert snapshot.column('stock', 0) == [3, 0, 'unknown', 0]
+    assert [product.get('name') for product in snapshot] == ['Camera', '', None, 'Sensor']
+    # The mapped file, shared with other workers, is unchanged
+    assert list(CatalogSnapshot(snapshot.path)) == PRODUCTS
+
+
+def test_empty_catalog_round_trips(tmp_path):
+    path = str(tmp_path / 'empty.snapshot')
+    write_snapshot([], path)
+    assert list(CatalogSnapshot(path)) == [] and CatalogSnapshot(path).column('name') == []
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'catalog.snapshot'
+    path.write_bytes(b'not a snapshot, just some bytes')
+    with pytest.raises(ValueError):
+        CatalogSnapshot(str(path))
+
+
+def test_load_catalog_rebuilds_a_stale_snapshot(tmp_path):
+    source = tmp_path / 'product_data.json'
+    source.write_text(json.dumps(PRODUCTS[:2]))
+    snapshot_path = str(tmp_path / 'catalog.snapshot')
+    assert list(load_catalog(str(source), snapshot_path)) == PRODUCTS[:2]
+
+    source.write_text(json.dumps(PRODUCTS))
+    os.utime(source, ns=(1, 1))
+    assert list(load_catalog(str(source), snapshot_path)) == PRODUCTS
+
+
+def test_catalog_column_reads_snapshot_and_list_alike(tmp_path):
+    products = [{'name': 'A', 'stock': 3}, {'name': 'B'}, {'name': 'C', 'stock': 40}]
+    write_snapshot(products, str(tmp_path / 'catalog.snapshot'))
+    snapshot = CatalogSnapshot(str(tmp_path / 'catalog.snapshot'))
+
+    assert catalog_column(snapshot, 'stock', 0) == catalog_column(products, 'stock', 0) == [3, 0, 40]
+    assert snapshot.materialized is False
+
+
+def test_dashboard_counts_products_without_building_rows(app0, admin_client, monkeypatch):
+    assert isinstance(app0.default_products, CatalogSnapshot)
+
+    def no_rows(self, index):
+        raise AssertionError('dashboard built a catalog row')
+
+    monkeypatch.setattr(CatalogSnapshot, '_row', no_rows)
+    response = admin_client.get('/api/enhanced_dashboard_data')
+
+    assert response.status_code == 200
+    body = response.get_json()['data']
+    assert body['metrics']['total_products'] == len(app0.default_products)
+    low_stock = sum(1 for stock in app0.default_products.column('stock', 0) if stock < 10)
+    messages = [alert['message'] for alert in body['alerts']]
+    assert (f'{low_stock} products have low stock' in messages) == (low_stock > 0)
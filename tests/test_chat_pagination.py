@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from database_manager import DatabaseManager, decode_page_cursor
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / 'chats.db'))
+
+
+def add_chats(db, username, created_ats):
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany('INSERT INTO chat_history (chat_id, username, title, created_at) VALUES (?, ?, ?, ?)',
+                     [(f'{username}-{index}', username, f'Chat {index}', created_at)
+                      for index, created_at in enumerate(created_ats)])
+    conn.commit()
+    conn.close()
+
+
+def all_pages(db, username, limit):
+    pages, cursor = [], None
+    while True:
+        chats, cursor = db.get_user_chats(username, limit=limit, cursor=cursor)
+        pages.append([chat['chat_id'] for chat in chats])
+        if cursor is None:
+            return pages
+
+
+def test_chat_pages_break_created_at_ties_by_id(db):
+    # Five chats share one timestamp, so pages of two end in the middle of the tie
+    add_chats(db, 'ana', ['2026-01-01 10:00:00'] * 5 + ['2026-01-02 09:00:00', '2026-01-01 08:00:00'])
+    add_chats(db, 'ben', ['2026-01-01 10:00:00'] * 3)
+
+    pages = all_pages(db, 'ana', limit=2)
+
+    assert pages == [['ana-5', 'ana-4'], ['ana-3', 'ana-2'], ['ana-1', 'ana-0'], ['ana-6']]
+
+
+def test_chat_cursor_on_the_last_row_ends_paging(db):
+    add_chats(db, 'ana', ['2026-01-01 10:00:00'] * 4)
+
+    chats, cursor = db.get_user_chats('ana', limit=4)
+    assert len(chats) == 4 and cursor is None
+
+    chats, cursor = db.get_user_chats('ana', limit=3)
+    assert decode_page_cursor(cursor) == [chats[-1]['created_at'], chats[-1]['id']]
+    assert [chat['chat_id'] for chat in db.get_user_chats('ana', limit=3, cursor=cursor)[0]] == ['ana-0']
+
+
+def test_malformed_chat_cursor_is_rejected(db):
+    with pytest.raises(ValueError):
+        db.get_user_chats('ana', cursor='not a cursor')
+
+
+def test_messages_page_backwards_from_before_id(db):
+    chat_id, _ = db.create_new_chat('ana')
+    for index in range(7):
+        db.save_message(chat_id, 'ana', 'user', f'message {index}')
+    ids = [message['id'] for message in db.get_chat_messages(chat_id, 'ana')]
+
+    newest = db.get_chat_messages(chat_id, 'ana', limit=3)
+    assert [message['content'] for message in newest] == ['message 4', 'message 5', 'message 6']
+
+    pages, before_id = [], None
+    while True:
+        page = db.get_chat_messages(chat_id, 'ana', limit=3, before_id=before_id)
+        if not page:
+            break
+        pages.insert(0, [message['id'] for message in page])
+        before_id = page[0]['id']
+    assert pages == [ids[:1], ids[1:4], ids[4:]]
+
+    # before_id is exclusive: at the oldest message there is nothing left
+    assert db.get_chat_messages(chat_id, 'ana', limit=3, before_id=ids[0]) == []
+    assert [message['id'] for message in db.get_chat_messages(chat_id, 'ana', limit=3, before_id=ids[1])] == ids[:1]
+
+
+def test_messages_of_another_users_chat_are_refused(db):
+    chat_id, _ = db.create_new_chat('ana')
+    with pytest.raises(Exception, match='access denied'):
+        db.get_chat_messages(chat_id, 'ben', limit=3)
@@ -0,0 +1,137 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from billing_engine import BillingEngine, allocate
+from cart import Cart
+from dashboard_snapshot import CartAddCounter, DashboardSnapshot, growth_percent
+from database_manager import DatabaseManager
+
+CATALOG = [
+    {'name': 'Camera', 'price': 1999.99, 'Installation Charge': 250, 'gst_rate': 18},
+    {'name': 'Doorbell', 'price': 849.5, 'gst_rate': 12},
+    {'name': 'Sensor', 'price': 333.33, 'Shipping Charge': 40.5},
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / 'dashboard.db'))
+
+
+def invoice(overall_discount=0, **quantities):
+    cart = Cart(BillingEngine())
+    for product in CATALOG:
+        if quantities.get(product['name'].lower()):
+            cart.add(product, quantities[product['name'].lower()], 5)
+    return cart.invoice(overall_discount)
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+@pytest.mark.parametrize('paise, weights', [(0, [3, 4]), (100, [1, 1, 1]), (12345, [0, 7, 3, 9999]), (5, [0, 0])])
+def test_allocate_is_exact_and_proportional(paise, weights):
+    shares = allocate(paise, weights)
+    assert sum(shares) == (paise if sum(weights) else 0)
+    for share, weight in zip(shares, weights):
+        assert abs(share - paise * weight / (sum(weights) or 1)) < 1
+
+
+def test_product_revenue_adds_up_to_daily_revenue(db):
+    for overall_discount in (0, 7.5, 33):
+        db.save_invoice(f'INV-{overall_discount}', 'Client', invoice(overall_discount, camera=3, doorbell=2, sensor=7),
+                        'x.pdf', 'user1')
+
+    product_revenue = sum(row['revenue'] for row in db.get_product_sales().values())
+    daily_revenue = sum(row['revenue'] for row in db.get_daily_sales(days_ago(1), days_ago(0)).values())
+    assert product_revenue == pytest.approx(daily_revenue, abs=0.005)
+    assert daily_revenue == pytest.approx(db.get_invoice_totals()[0])
+
+
+def test_snapshot_growth_compares_with_previous_window(db):
+    db.save_invoice('INV-OLD', 'Client', invoice(camera=1), 'x.pdf', 'user1', days_ago(40))
+    db.save_invoice('INV-NEW-1', 'Client', invoice(camera=1), 'x.pdf', 'user1', days_ago(3))
+    db.save_invoice('INV-NEW-2', 'Client', invoice(camera=2), 'x.pdf', 'user1', days_ago(0))
+    snapshot = DashboardSnapshot(db)
+
+    metrics = snapshot.get_metrics()
+    assert metrics['orders_growth'] == 100.0
+    assert metrics['revenue_growth'] == growth_percent(invoice(camera=1)['summary']['grand_total']
+                                                       + invoice(camera=2)['summary']['grand_total'],
+                                                       invoice(camera=1)['summary']['grand_total'])
+    # The chart still covers only the current window
+    assert len(metrics['revenue_chart']['labels']) == snapshot.window_days
+    # Default users were all created today: no users 30 days ago to grow from
+    assert metrics['users_growth'] == 0.0
+
+    snapshot.record_invoice('INV-NEW-3', 'Client', 100.0, days_ago(0), 'user1')
+    assert snapshot.get_metrics()['orders_growth'] == 200.0
+
+
+def test_users_growth_counts_users_created_in_the_window(db):
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO users (username, password, role, created_at) VALUES (?, 'x', 'user', ?)",
+                     [(f'old{i}', (datetime.now() - timedelta(days=90)).isoformat()) for i in range(6)])
+    conn.commit()
+    conn.close()
+    snapshot = DashboardSnapshot(db)
+
+    # 8 users now (6 old plus the 2 default ones created today) against 6 thirty days ago
+    assert snapshot.get_metrics()['users_growth'] == growth_percent(8, 6)
+    snapshot.record_user_created('new_user')
+    assert snapshot.get_metrics()['users_growth'] == growth_percent(9, 6)
+
+
+def test_migration_restates_product_revenue_net_of_overall_discount(db):
+    db.save_invoice('INV-1', 'Client', invoice(10, camera=2, sensor=3), 'x.pdf', 'user1')
+    conn = sqlite3.connect(db.db_path)
+    # Schema 8 summed the line totals, before the overall discount
+    conn.execute('UPDATE product_sales SET revenue = (SELECT SUM(line_total) FROM invoice_items '
+                 'WHERE invoice_items.product_name = product_sales.product_name)')
+    conn.execute('PRAGMA user_version = 8')
+    conn.commit()
+    conn.close()
+
+    db.init_database()
+    assert sum(row['revenue'] for row in db.get_product_sales().values()) == pytest.approx(
+        invoice(10, camera=2, sensor=3)['summary']['grand_total'], abs=0.01)
+    assert db.get_schema_version() == 9
+
+
+def cart_adds(db):
+    return {name: row['cart_adds'] for name, row in db.get_product_sales().items()}
+
+
+def test_cart_adds_are_batched_until_flushed(db):
+    counter = CartAddCounter(db, flush_interval=3600, max_pending=5)
+    for name in ('Camera', 'Camera', 'Sensor'):
+        counter.add(name)
+    assert counter.pending == 3 and cart_adds(db) == {}
+
+    assert counter.flush() == 3
+    assert cart_adds(db) == {'Camera': 2, 'Sensor': 1}
+
+    # Reaching max_pending flushes on the add itself
+    for _ in range(5):
+        counter.add('Doorbell')
+    assert counter.pending == 0
+    assert cart_adds(db) == {'Camera': 2, 'Sensor': 1, 'Doorbell': 5}
+
+
+def test_failed_cart_add_flush_keeps_the_counts(db, monkeypatch):
+    counter = CartAddCounter(db, flush_interval=3600)
+    counter.add('Camera')
+
+    def locked(counts):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(db, 'record_cart_adds', locked)
+    assert counter.flush() == 0
+    counter.add('Camera')
+    monkeypatch.undo()
+
+    assert counter.flush() == 2
+    assert cart_adds(db) == {'Camera': 2}
@@ -0,0 +1,70 @@
+import pytest
+
+from product_matcher import FuzzyMatcher, trigrams
+
+NAMES = [
+    'AI Security Camera 4K',
+    'Smart Video Doorbell',
+    'Security Camera Mount',
+    'Outdoor Security Light',
+    'AI Security Camera 4K',  # duplicate name: ties resolve by catalog order
+    '',
+]
+
+
+def jaccard(query, name):
+    a, b = trigrams(query), trigrams(name)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def test_trigrams_are_padded_like_pg_trgm():
+    assert trigrams('TV') == {'  t', ' tv', 'tv '}
+    assert trigrams('') == set()
+
+
+def test_misspelled_query_finds_the_product():
+    matcher = FuzzyMatcher(NAMES)
+    assert NAMES[matcher.best('secuirty camra 4k')] == 'AI Security Camera 4K'
+    assert NAMES[matcher.best('doorbel')] == 'Smart Video Doorbell'
+
+
+def test_exact_name_ignores_case_and_wins():
+    matcher = FuzzyMatcher(NAMES)
+    assert matcher.exact('  security camera MOUNT ') == 2
+    assert matcher.best('ai security camera 4k') == 0
+    assert matcher.exact('Camera') is None
+
+
+def test_equal_scores_rank_by_catalog_order():
+    matches = FuzzyMatcher(NAMES).match('AI Security Camera 4K', limit=3)
+    assert [index for index, _ in matches][:2] == [0, 4]
+    assert matches[0][1] == matches[1][1] == 1.0
+
+
+def test_limit_keeps_the_earliest_of_tied_names():
+    matcher = FuzzyMatcher(['Camera'] * 4 + ['Cameras'])
+    assert matcher.match('camera', limit=2) == [(0, 1.0), (1, 1.0)]
+
+
+@pytest.mark.parametrize('query', ['', '   ', '!!!', 'zzzz qqqq'])
+def test_queries_without_known_trigrams_match_nothing(query):
+    matcher = FuzzyMatcher(NAMES)
+    assert matcher.match(query) == []
+    assert matcher.best(query) is None
+
+
+def test_scores_equal_brute_force_jaccard_including_common_trigrams():
+    # 'security' is in most names, so its trigrams are stored as complements
+    names = [f'Security Camera Model {i}' for i in range(12)] + ['Doorbell', 'Security Light', 'Sensor']
+    matcher = FuzzyMatcher(names, threshold=0.05)
+    assert matcher._complements
+    for query in ('securty camera model 7', 'security', 'light sensor', 'doorbell'):
+        expected = sorted(((index, round(jaccard(query, name), 4)) for index, name in enumerate(names)
+                           if jaccard(query, name) >= 0.05), key=lambda entry: (-entry[1], entry[0]))
+        assert matcher.match(query, limit=len(names)) == expected
+
+
+def test_threshold_filters_weak_matches():
+    matcher = FuzzyMatcher(NAMES)
+    assert matcher.match('camera', threshold=0.9) == []
+    assert all(score >= 0.2 for _, score in matcher.match('camera', threshold=0.2))
@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+import time
+
+from conftest import login
+
+PRODUCT = 'AI Security Camera 4K'
+
+
+def fill_cart(app0, session_id, quantity=2):
+    session_data = app0.get_session_data(session_id)
+    app0.execute_add_action(PRODUCT, str(quantity), '0', session_data, app0.default_products, None)
+    assert len(session_data['cart'])
+
+
+def generate(client, session_id):
+    response = client.post('/api/generate_invoice_from_cart', json={}, headers={'Session-ID': session_id})
+    return response.status_code, response.get_json()
+
+
+def saved_invoices(app0, invoice_number=None):
+    conn = sqlite3.connect(app0.db_manager.db_path)
+    try:
+        if invoice_number is None:
+            return conn.execute('SELECT COUNT(*) FROM invoices').fetchone()[0]
+        return conn.execute('SELECT COUNT(*) FROM invoices WHERE invoice_number = ?', (invoice_number,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_number_matches_file_record_and_reply(app0, admin_client):
+    fill_cart(app0, 'inv-number')
+    status, body = generate(admin_client, 'inv-number')
+
+    assert status == 200
+    assert body['invoice_number'] in body['pdf_path']
+    assert body['invoice_number'] in body['ai_response']
+    assert saved_invoices(app0, body['invoice_number']) == 1
+
+
+def test_same_order_placed_again_is_a_new_invoice(app0, admin_client):
+    numbers = []
+    for _ in range(2):
+        fill_cart(app0, 'inv-repeat')
+        status, body = generate(admin_client, 'inv-repeat')
+        assert status == 200
+        numbers.append(body['invoice_number'])
+
+    assert numbers[0] != numbers[1]
+    assert [saved_invoices(app0, number) for number in numbers] == [1, 1]
+
+
+def test_double_click_shares_one_render_and_record(app0, monkeypatch):
+    render = app0.render_invoice_file
+    calls = []
+
+    def slow_render(*args):
+        calls.append(args)
+        time.sleep(0.3)
+        return render(*args)
+
+    monkeypatch.setattr(app0, 'render_invoice_file', slow_render)
+    clients = [login(app0), login(app0)]
+    fill_cart(app0, 'inv-double')
+    before = saved_invoices(app0)
+
+    results = [None, None]
+
+    def click(index):
+        results[index] = generate(clients[index], 'inv-double')
+
+    threads = [threading.Thread(target=click, args=(index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    assert [status for status, _ in results] == [200, 200]
+    assert results[0][1]['invoice_number'] == results[1][1]['invoice_number']
+    assert len(calls) == 1
+    assert saved_invoices(app0) == before + 1
+
+
+def test_failed_save_is_reported_and_not_retried(app0, admin_client, monkeypatch):
+    saves = []
+
+    def failing_save(*args):
+        saves.append(args)
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(app0, 'save_invoice_record', failing_save)
+    fill_cart(app0, 'inv-save-error')
+    status, body = generate(admin_client, 'inv-save-error')
+
+    assert status == 500
+    assert 'database is locked' in body['error']
+    assert len(saves) == 1
+
+
+def test_failed_render_records_the_error_file_once(app0, admin_client, monkeypatch):
+    def broken_render(*args):
+        raise RuntimeError('template exploded')
+
+    monkeypatch.setattr(app0, 'render_invoice_file', broken_render)
+    fill_cart(app0, 'inv-render-error')
+    status, body = generate(admin_client, 'inv-render-error')
+
+    assert status == 200
+    assert body['pdf_path'].startswith('invoice_error_')
+    assert saved_invoices(app0, body['invoice_number']) == 1
+
+
+def test_cart_adds_are_written_with_the_invoice(app0, admin_client):
+    app0.cart_add_counter.flush()
+    fill_cart(app0, 'inv-cart-adds')
+    assert app0.cart_add_counter.pending == 1
+
+    status, _ = generate(admin_client, 'inv-cart-adds')
+    assert status == 200
+    assert app0.cart_add_counter.pending == 0
+
+
+def test_preview_shows_no_invoice_number(app0):
+    session_data = app0.get_session_data('inv-preview')
+    fill_cart(app0, 'inv-preview')
+    session_data['client_details'] = {'name': 'Preview Client'}
+
+    message, payload = app0.process_invoice_generation(session_data)
+    assert payload['action'] == 'show_invoice_preview'
+    assert 'invoice_number' not in payload
+    assert 'INV-' not in message
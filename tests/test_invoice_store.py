@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+from conftest import login
+from invoice_store import InvoiceStore
+
+
+def test_files_are_sharded_by_name_and_legacy_files_still_found(tmp_path):
+    store = InvoiceStore(str(tmp_path / 'invoices'))
+    path = store.path_for('invoice_INV-1.pdf')
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4 one')
+    with open(os.path.join(store.root, 'invoice_INV-0.pdf'), 'wb') as f:
+        f.write(b'%PDF-1.4 legacy')
+
+    digest = hashlib.sha1(b'invoice_INV-1.pdf').hexdigest()
+    assert store.relative_path('invoice_INV-1.pdf') == os.path.join(digest[:2], digest[2:4], 'invoice_INV-1.pdf')
+    assert store.locate('invoice_INV-1.pdf') == path
+    assert store.locate('invoice_INV-0.pdf') == os.path.abspath(os.path.join(store.root, 'invoice_INV-0.pdf'))
+    assert store.locate('invoice_INV-2.pdf') is None
+
+    assert store.shard_legacy_files() == ['invoice_INV-0.pdf']
+    assert store.locate('invoice_INV-0.pdf') == store.path_for('invoice_INV-0.pdf')
+
+
+def test_file_info_hashes_in_chunks(tmp_path):
+    store = InvoiceStore(str(tmp_path / 'invoices'), chunk_size=4)
+    content = b'0123456789abcdef-'
+    with open(store.path_for('invoice_INV-3.pdf'), 'wb') as f:
+        f.write(content)
+
+    assert store.file_info('invoice_INV-3.pdf') == {
+        'file_path': store.relative_path('invoice_INV-3.pdf'),
+        'file_size': len(content),
+        'file_hash': hashlib.sha256(content).hexdigest()
+    }
+    assert store.file_info('missing.pdf') is None
+
+
+def stored_invoice(app0, client):
+    session_data = app0.get_session_data('store-download')
+    app0.execute_add_action('AI Security Camera 4K', '1', '0', session_data, app0.default_products, None)
+    response = client.post('/api/generate_invoice_from_cart', json={}, headers={'Session-ID': 'store-download'})
+    assert response.status_code == 200
+    return response.get_json()['pdf_path']
+
+
+def test_download_uses_the_recorded_hash_as_etag(app0):
+    client = login(app0)
+    filename = stored_invoice(app0, client)
+    record = app0.db_manager.get_invoice_file(filename)
+
+    response = client.get(f'/api/download_invoice/{filename}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{record["file_hash"]}"'
+    assert 'private' in response.headers['Cache-Control']
+    body = response.data
+
+    assert client.get(f'/api/download_invoice/{filename}',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    partial = client.get(f'/api/download_invoice/{filename}', headers={'Range': 'bytes=0-9'})
+    assert partial.status_code == 206
+    assert partial.data == body[:10]
+
+
+def test_download_of_unknown_file_is_404(app0, admin_client):
+    assert admin_client.get('/api/download_invoice/invoice_INV-NOPE.pdf').status_code == 404
@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import login
+from product_matcher import PrefixIndex
+
+NAMES = [
+    'Smart Camera Mount',     # 0
+    'Camera',                 # 1
+    'AI Security Camera 4K',  # 2
+    'Camera Tripod',          # 3
+    'Cameras Bundle',         # 4
+    'Camera',                 # 5  duplicate of 1
+    'Doorbell',               # 6
+]
+
+
+def search(query):
+    return [int(index) for index in PrefixIndex(NAMES).search(query)]
+
+
+def test_exact_then_prefix_then_whole_words_then_shorter():
+    # Exact names (tied, catalog order), names starting with the query,
+    # then 'camera' as a whole word before 'cameras', shorter names first
+    assert search('camera') == [1, 5, 3, 4, 0, 2]
+
+
+def test_every_term_must_start_a_word():
+    assert search('cam mou') == [0]
+    assert search('sec cam 4') == [2]
+    assert search('camera doorbell') == []
+    assert search('amera') == []
+
+
+def test_prefix_terms_match_in_any_order_and_case():
+    assert search('MOUNT cam') == search('cam mount') == [0]
+
+
+@pytest.mark.parametrize('query', ['', '   ', '--'])
+def test_empty_query_lists_every_name_in_catalog_order(query):
+    assert search(query) == list(range(len(NAMES)))
+
+
+def test_search_requires_login(app0):
+    anonymous = app0.app.test_client()
+    response = anonymous.get('/api/products/search?q=camera')
+    assert response.status_code == 401
+    assert response.get_json()['success'] is False
+
+    response = login(app0, 'user1', 'user123').get('/api/products/search?q=camera&fields=name')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['mode'] == 'prefix' and body['total'] > 0
+    assert all(set(result) == {'name'} and 'camera' in result['name'].lower() for result in body['results'])
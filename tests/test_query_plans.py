@@ -0,0 +1,213 @@
+"""
+Query-plan regression tests for DatabaseManager.
+
+Builds a synthetic database, calls every DatabaseManager query method while
+tracing the SQL it executes, and runs EXPLAIN QUERY PLAN on each traced
+statement. A hot query that falls back to a full scan or sorts/groups
+through a temp B-tree (a missing composite index, typically) fails its
+test; ALLOWED_FULL_SCANS lists the calls that read a whole table by design.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager, content_hash
+
+# Calls that read a whole (small or aggregate) table by design
+ALLOWED_FULL_SCANS = {
+    'get_product_sales': 'loads the whole per-product rollup (one row per product)',
+    'get_user_count': 'COUNT(*) over users',
+    'get_invoice_totals (all time)': 'all-time SUM over invoices; cached by DashboardSnapshot',
+    'get_latest_invoice': 'reverse rowid walk that stops at the first row (LIMIT 1)',
+    'get_user_stats': 'single aggregate pass over users',
+    'get_users_page': 'COUNT(*) of the filtered users; the page itself walks idx_users_created up to LIMIT',
+    'get_users_page (search)': "substring LIKE '%term%' cannot use an index",
+}
+
+EXPLAINED_VERBS = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+
+# Large enough that ANALYZE statistics make the planner prefer indexes over scans
+INVOICES = 20000
+MESSAGES = 20000
+
+
+class TracingDatabaseManager(DatabaseManager):
+    """DatabaseManager that records every SQL statement it executes"""
+
+    def __init__(self, db_path):
+        self.statements = []
+        super().__init__(db_path, initialize=False)
+
+    def get_connection(self):
+        conn = super().get_connection()
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+def build_database(db_path, invoice_count, message_count, user_count=5000, chat_count=20000, days=730, seed=42):
+    """Populate a fresh database with synthetic users, chats, messages and invoices"""
+    DatabaseManager(db_path)
+    rng = random.Random(seed)
+    today = datetime.now()
+    usernames = [f"user{i}" for i in range(user_count)]
+
+    def timestamp(max_days):
+        return (today - timedelta(days=rng.randrange(max_days), seconds=rng.randrange(86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.executemany('INSERT OR IGNORE INTO users (username, password, role, created_at) VALUES (?, ?, ?, ?)',
+                       [(name, 'x', 'user', timestamp(days)) for name in usernames])
+
+    chats = [(f"chat_bench_{i}", rng.choice(usernames), f"Chat {i}", timestamp(days)) for i in range(chat_count)]
+    # One long-running chat so message pages are exercised on a large chat
+    chats.append(('chat_bench_heavy', 'user1', 'Heavy chat', timestamp(days)))
+    cursor.executemany('INSERT INTO chat_history (chat_id, username, title, created_at, updated_at) '
+                       'VALUES (?, ?, ?, ?, ?)', [(c[0], c[1], c[2], c[3], c[3]) for c in chats])
+
+    batch = []
+    for i in range(message_count):
+        chat_id, username = ('chat_bench_heavy', 'user1') if i % 4 == 0 else rng.choice(chats)[:2]
+        content = f"Message {i} about product {rng.randrange(500)}"
+        batch.append((chat_id, username, 'user' if i % 2 == 0 else 'ai', content, timestamp(days), content_hash(content)))
+        if len(batch) == 50000:
+            cursor.executemany('INSERT INTO messages (chat_id, username, message_type, content, timestamp, content_hash) '
+                               'VALUES (?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        cursor.executemany('INSERT INTO messages (chat_id, username, message_type, content, timestamp, content_hash) '
+                           'VALUES (?, ?, ?, ?, ?, ?)', batch)
+    cursor.execute('UPDATE chat_history SET message_count = '
+                   '(SELECT COUNT(*) FROM messages WHERE messages.chat_id = chat_history.chat_id)')
+
+    batch = []
+    for i in range(invoice_count):
+        batch.append((f"INV-BENCH-{i}", f"Client {rng.randrange(5000)}", round(rng.uniform(500, 50000), 2),
+                      (today - timedelta(days=rng.randrange(days))).strftime('%Y-%m-%d'),
+                      f"invoice_INV-BENCH-{i}.pdf", rng.choice(usernames)))
+        if len(batch) == 50000:
+            cursor.executemany('INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username) '
+                               'VALUES (?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    if batch:
+        cursor.executemany('INSERT INTO invoices (invoice_number, client_name, amount, date, pdf_path, username) '
+                           'VALUES (?, ?, ?, ?, ?, ?)', batch)
+    cursor.execute('''
+        INSERT INTO daily_sales (date, username, revenue, invoice_count, units_sold)
+        SELECT date, username, SUM(amount), COUNT(*), COUNT(*) FROM invoices GROUP BY date, username
+    ''')
+    cursor.executemany('INSERT INTO product_sales (product_name, units_sold, revenue, order_count, cart_adds) '
+                       'VALUES (?, ?, ?, ?, ?)',
+                       [(f"Product {i}", rng.randrange(1000), rng.uniform(0, 1e6), rng.randrange(500), rng.randrange(2000))
+                        for i in range(500)])
+    conn.commit()
+    cursor.execute('ANALYZE')
+    conn.close()
+
+
+def _dates():
+    today = datetime.now()
+    return ((today - timedelta(days=29)).strftime('%Y-%m-%d'), (today - timedelta(days=364)).strftime('%Y-%m-%d'),
+            today.strftime('%Y-%m-%d'))
+
+
+def _second_chat_page(db, state):
+    _, cursor = db.get_user_chats('user1', 2)
+    return db.get_user_chats('user1', 2, cursor)
+
+
+def _older_messages(db, state):
+    page = db.get_chat_messages('chat_bench_heavy', 'user1', limit=51)
+    return db.get_chat_messages('chat_bench_heavy', 'user1', limit=51, before_id=page[0]['id'])
+
+
+def _create_chat(db, state):
+    state['chat_id'], _ = db.create_new_chat('user1')
+
+
+INVOICE = {'items': [{'name': 'Product 1', 'qty': 2, 'unit_price': 100.0, 'discount': 0, 'total_amount': 236.0}],
+           'summary': {'grand_total': 236.0}}
+
+# (label, call(db, state)) for every DatabaseManager query path, run in this order
+QUERY_CALLS = [
+    ('create_new_chat', _create_chat),
+    ('get_user_chats', lambda db, state: db.get_user_chats('user1', 50)),
+    ('get_user_chats (next page)', _second_chat_page),
+    ('get_chat_messages (all)', lambda db, state: db.get_chat_messages('chat_bench_heavy', 'user1')),
+    ('get_chat_messages (tail page)', lambda db, state: db.get_chat_messages('chat_bench_heavy', 'user1', limit=51)),
+    ('get_chat_messages (older page)', _older_messages),
+    ('save_message', lambda db, state: db.save_message('chat_bench_heavy', 'user1', 'user', 'add 2 Product 1')),
+    ('rename_chat', lambda db, state: db.rename_chat(state['chat_id'], 'user1', 'Renamed')),
+    ('delete_chat', lambda db, state: db.delete_chat(state['chat_id'], 'user1')),
+    ('update_user_login', lambda db, state: db.update_user_login('user1')),
+    ('save_invoice', lambda db, state: db.save_invoice('INV-PLAN-1', 'Client', INVOICE, 'x.pdf', 'user1')),
+    ('record_cart_adds', lambda db, state: db.record_cart_adds({'Product 1': 2, 'Product 2': 1})),
+    ('get_product_sales', lambda db, state: db.get_product_sales()),
+    ('get_top_products', lambda db, state: db.get_top_products()),
+    ('get_daily_sales (all users)', lambda db, state: db.get_daily_sales(_dates()[0], _dates()[2])),
+    ('get_daily_sales (user)', lambda db, state: db.get_daily_sales(_dates()[0], _dates()[2], 'user1')),
+    ('get_invoice_totals (all time)', lambda db, state: db.get_invoice_totals()),
+    ('get_invoice_totals (user)', lambda db, state: db.get_invoice_totals(username='user1')),
+    ('get_invoice_totals (range)', lambda db, state: db.get_invoice_totals(_dates()[0], _dates()[2])),
+    ('get_invoice_totals_by_period (day)',
+     lambda db, state: db.get_invoice_totals_by_period(_dates()[0], _dates()[2], 'day')),
+    ('get_invoice_totals_by_period (month, user)',
+     lambda db, state: db.get_invoice_totals_by_period(_dates()[1], _dates()[2], 'month', 'user1')),
+    ('get_user_registrations_by_day', lambda db, state: db.get_user_registrations_by_day(_dates()[0])),
+    ('get_latest_invoice', lambda db, state: db.get_latest_invoice()),
+    ('get_latest_invoice (user)', lambda db, state: db.get_latest_invoice('user1')),
+    ('get_invoice_file', lambda db, state: db.get_invoice_file('invoice_INV-BENCH-7.pdf')),
+    ('get_user_count', lambda db, state: db.get_user_count()),
+    ('get_user_stats', lambda db, state: db.get_user_stats(_dates()[0])),
+    ('get_users_page', lambda db, state: db.get_users_page(('user', 'admin'), limit=10, offset=20)),
+    ('get_users_page (search)', lambda db, state: db.get_users_page(search='user12', limit=10)),
+]
+
+
+def explain(conn, statement):
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {statement}').fetchall()]
+
+
+def plan_problems(plan):
+    return [detail for detail in plan if detail.startswith('SCAN ') or 'USE TEMP B-TREE' in detail]
+
+
+@pytest.fixture(scope='module')
+def traced_plans(tmp_path_factory):
+    """{label: [(statement, plan), ...]} for every call in QUERY_CALLS against one synthetic database"""
+    db_path = str(tmp_path_factory.mktemp('plans') / 'plans.db')
+    build_database(db_path, INVOICES, MESSAGES)
+    db = TracingDatabaseManager(db_path)
+    explain_conn = sqlite3.connect(db_path)
+    state = {}
+    plans = {}
+    try:
+        for label, call in QUERY_CALLS:
+            db.statements.clear()
+            call(db, state)
+            plans[label] = [(statement, explain(explain_conn, statement)) for statement in db.statements
+                            if statement.lstrip().upper().startswith(EXPLAINED_VERBS)]
+    finally:
+        explain_conn.close()
+    return plans
+
+
+@pytest.mark.parametrize('label', [label for label, _ in QUERY_CALLS])
+def test_query_uses_indexes(traced_plans, label):
+    assert traced_plans[label], f"{label} executed no statements"
+    if label in ALLOWED_FULL_SCANS:
+        return
+    for statement, plan in traced_plans[label]:
+        problems = plan_problems(plan)
+        assert not problems, f"{' '.join(statement.split())[:120]}: {problems}"
+
+
+def test_allowed_full_scans_are_current():
+    assert set(ALLOWED_FULL_SCANS) <= {label for label, _ in QUERY_CALLS}
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+import render_cache
+from render_cache import RenderCache, canonical_hash
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(render_cache.time, 'time', clock)
+    return clock
+
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_hash({'a': 1, 'b': [1, 2]}, 'x') == canonical_hash({'b': [1, 2], 'a': 1}, 'x')
+    assert canonical_hash({'a': 1}) != canonical_hash({'a': 2})
+
+
+def render_concurrently(cache, render, callers=3, **options):
+    """Run callers get_or_render calls for one key while render blocks; returns the results or exceptions"""
+    release = threading.Event()
+    results = [None] * callers
+
+    def blocking_render():
+        release.wait(5)
+        return render()
+
+    def call(index):
+        try:
+            results[index] = cache.get_or_render('key', blocking_render, **options)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()['coalesced'] < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_render():
+    cache = RenderCache()
+    calls = []
+    results = render_concurrently(cache, lambda: calls.append(1) or object())
+
+    assert len(calls) == 1
+    assert results[0] is results[1] is results[2]
+    assert cache.stats() == {'entries': 1, 'in_flight': 0, 'hits': 0, 'coalesced': 2, 'renders': 1}
+
+
+def test_failed_render_is_raised_in_every_waiter_and_not_cached():
+    cache = RenderCache()
+    error = RuntimeError('render failed')
+
+    def failing():
+        raise error
+
+    assert render_concurrently(cache, failing) == [error, error, error]
+    assert cache.stats()['entries'] == 0
+    assert cache.get_or_render('key', lambda: 'retried') == 'retried'
+
+
+def test_store_false_shares_only_with_waiters():
+    cache = RenderCache()
+    results = render_concurrently(cache, object, store=False)
+
+    assert results[0] is results[1] is results[2]
+    assert cache.stats()['entries'] == 0
+    assert cache.get_or_render('key', lambda: 'fresh', store=False) == 'fresh'
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = RenderCache(ttl_seconds=60)
+    assert cache.get_or_render('key', lambda: 'first') == 'first'
+
+    clock.now += 60
+    assert cache.get_or_render('key', lambda: 'second') == 'first'
+    clock.now += 0.001
+    assert cache.get_or_render('key', lambda: 'third') == 'third'
+    assert (cache.hits, cache.renders) == (1, 2)
+
+
+def test_invalid_entries_are_rendered_again():
+    cache = RenderCache()
+    cache.get_or_render('key', lambda: 'gone.pdf')
+    assert cache.get_or_render('key', lambda: 'new.pdf', is_valid=lambda path: path != 'gone.pdf') == 'new.pdf'
+    assert cache.get_or_render('key', lambda: 'unused.pdf', is_valid=lambda path: True) == 'new.pdf'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RenderCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.get_or_render(key, lambda: key)
+    cache.get_or_render('a', lambda: 'unused')
+    cache.get_or_render('c', lambda: 'c')
+
+    assert cache.get_or_render('a', lambda: 'unused') == 'a'
+    assert cache.get_or_render('b', lambda: 'rendered again') == 'rendered again'
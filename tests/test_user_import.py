@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from werkzeug.security import check_password_hash
+
+from conftest import login
+from user_import import PasswordHashPool, hash_passwords, parse_user_rows
+
+
+def test_parse_user_rows_csv_and_json():
+    csv_rows = parse_user_rows(b'Username,Full_Name,Email\nana, Ana K ,ana@example.com\n', 'users.csv')
+    json_rows = parse_user_rows(json.dumps({'users': [{'username': 'ana', 'full_name': 'Ana K',
+                                                       'email': 'ana@example.com'}]}))
+    assert csv_rows == json_rows
+    assert csv_rows[0]['username'] == 'ana' and csv_rows[0]['full_name'] == 'Ana K' and csv_rows[0]['role'] == ''
+
+
+@pytest.mark.parametrize('payload, filename', [
+    ('not json', 'users.json'),
+    ('{"users": "ana"}', None),
+    ('name,email\nana,ana@example.com', 'users.csv'),
+])
+def test_parse_user_rows_rejects_bad_uploads(payload, filename):
+    with pytest.raises(ValueError):
+        parse_user_rows(payload, filename)
+
+
+def test_hash_pool_hashes_in_workers_and_is_reused():
+    pool = PasswordHashPool(2).start()
+    try:
+        assert pool.running
+        for batch in (['a', 'b', 'c'], ['d', 'e']):
+            hashes = hash_passwords(batch, pool)
+            assert all(check_password_hash(h, password) for h, password in zip(hashes, batch))
+        assert pool.running
+    finally:
+        pool.shutdown()
+    assert not pool.running
+
+
+def test_hash_passwords_inline_without_a_running_pool():
+    pool = PasswordHashPool(1).start()
+    assert not pool.running
+    hashes = hash_passwords(['x', 'y'], pool)
+    assert check_password_hash(hashes[0], 'x') and check_password_hash(hashes[1], 'y')
+
+
+def import_users(client, users):
+    response = client.post('/api/admin/users/bulk', data=json.dumps(users), content_type='application/json')
+    return response.status_code, response.get_json()
+
+
+def user(username, email=None, **fields):
+    return dict({'username': username, 'full_name': username.title(), 'email': email or f'{username}@example.com'},
+                **fields)
+
+
+def test_bulk_import_reports_each_rejected_row(app0, admin_client):
+    status, body = import_users(admin_client, [
+        user('bulk_ok'),
+        user('bulk_ok', 'other@example.com'),              # duplicate username in the import
+        user('bulk_dup_email', 'bulk_ok@example.com'),     # duplicate email in the import
+        {'username': 'bulk_missing', 'email': 'missing@example.com'},
+        user('bulk_bad_email', 'not-an-email'),
+        user('admin', 'fresh@example.com'),                # username already in the database
+        user('bulk_given', temp_password='Given-pass-1'),
+    ])
+
+    assert status == 200
+    assert (body['created'], body['failed']) == (2, 5)
+    errors = {result['row']: result.get('error') for result in body['results']}
+    assert errors == {
+        1: None,
+        2: 'Duplicate username in import',
+        3: 'Duplicate email in import',
+        4: 'Missing required field: full_name',
+        5: 'Invalid email format',
+        6: 'Username already exists',
+        7: None,
+    }
+    # Generated passwords are returned once; given ones are not echoed back
+    generated = body['results'][0]['temp_password']
+    assert 'temp_password' not in body['results'][6]
+    login(app0, 'bulk_ok', generated)
+    login(app0, 'bulk_given', 'Given-pass-1')
+
+
+def test_bulk_import_rejects_rows_already_in_the_database(admin_client):
+    assert import_users(admin_client, [user('bulk_existing')])[0] == 200
+    status, body = import_users(admin_client, [
+        user('bulk_existing', 'new_address@example.com'),
+        user('bulk_new_name', 'bulk_existing@example.com'),
+    ])
+
+    assert status == 400
+    assert not body['success'] and body['created'] == 0
+    assert [result['error'] for result in body['results']] == ['Username already exists', 'Email already exists']
+
+
+def test_bulk_import_requires_admin(app0):
+    status, _ = import_users(app0.app.test_client(), [user('bulk_anonymous')])
+    assert status == 403
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from database_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'users.db'))
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany('''
+        INSERT INTO users (username, password, full_name, email, department, role, status, created_at)
+        VALUES (?, 'x', ?, ?, ?, ?, ?, '2026-01-01T00:00:00')
+    ''', [
+        ('carol', 'Carol Diaz', 'carol@example.com', 'Sales', 'user', 'active'),
+        ('dev_1', 'Dev One', 'dev1@example.com', 'R&D', 'user', 'inactive'),
+        ('devon', 'Devon 100%', 'devon@example.com', 'R&D', 'admin', 'active'),
+        ('erin', 'Erin Ng', 'erin@example.com', 'Sales', 'user', 'active'),
+    ])
+    conn.commit()
+    conn.close()
+    return db
+
+
+def usernames(page):
+    return [user['username'] for user in page[0]]
+
+
+def test_pages_share_one_total_and_break_ties_by_id(db):
+    # The inserted users share created_at, so the id orders them; user1 was created today
+    first = db.get_users_page(role='user', sort='created_at', descending=False, limit=2)
+    second = db.get_users_page(role='user', sort='created_at', descending=False, limit=2, offset=2)
+
+    assert usernames(first) + usernames(second) == ['carol', 'dev_1', 'erin', 'user1']
+    assert first[1] == second[1] == 4
+
+
+def test_filters_combine(db):
+    assert usernames(db.get_users_page(department='R&D', status='active')) == ['devon']
+    assert usernames(db.get_users_page(visible_roles=['user'], department='Sales', sort='username',
+                                       descending=False)) == ['carol', 'erin']
+
+
+@pytest.mark.parametrize('search, expected', [
+    ('dev', ['dev_1', 'devon']),
+    ('_', ['dev_1']),     # LIKE wildcards match literally
+    ('100%', ['devon']),
+    ('SALES', ['carol', 'erin']),
+])
+def test_search_matches_literally_across_columns(db, search, expected):
+    assert usernames(db.get_users_page(search=search, sort='username', descending=False)) == expected
+
+
+def test_unknown_sort_column_is_rejected(db):
+    with pytest.raises(ValueError):
+        db.get_users_page(sort='password')
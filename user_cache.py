@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """
+    In-memory cache of user auth records for the login and admin_required
+    hot paths.
+
+    Records (id, username, password hash, role, status, must_change_password)
+    are loaded per user on first use; unknown usernames are cached too.
+    Whoever creates, updates or deletes a user calls invalidate() for it.
+    Each process holds its own cache, so entries also expire after
+    ttl_seconds to pick up changes made by other workers.
+    """
+
+    FIELDS = ('id', 'username', 'password', 'role', 'status', 'must_change_password')
+
+    def __init__(self, db_path='invoices.db', ttl_seconds=60, max_entries=10000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # username -> (record or None, loaded_at)
+        self._ids = {}  # user id -> username
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fetch(self, column, value):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(f"SELECT {', '.join(self.FIELDS)} FROM users WHERE {column} = ?", (value,)).fetchone()
+        finally:
+            conn.close()
+        return dict(zip(self.FIELDS, row)) if row else None
+
+    def _store(self, username, record):
+        self._entries[username] = (record, time.time())
+        self._entries.move_to_end(username)
+        if record:
+            self._ids[record['id']] = username
+        while len(self._entries) > self.max_entries:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            if evicted:
+                self._ids.pop(evicted['id'], None)
+
+    def _cached(self, username):
+        entry = self._entries.get(username)
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            return False, None
+        self._entries.move_to_end(username)
+        return True, entry[0]
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get_user(self, username):
+        """Auth record for a username, or None if the user does not exist"""
+        if not username:
+            return None
+        with self._lock:
+            hit, record = self._cached(username)
+            self._count(hit)
+        if not hit:
+            record = self._fetch('username', username)
+            with self._lock:
+                self._store(username, record)
+        return dict(record) if record else None
+
+    def get_user_by_id(self, user_id):
+        """Auth record for a user id, or None if the user does not exist"""
+        with self._lock:
+            username = self._ids.get(user_id)
+            hit, record = self._cached(username) if username else (False, None)
+            self._count(hit)
+        if not hit:
+            record = self._fetch('id', user_id)
+            if not record:
+                return None
+            with self._lock:
+                self._store(record['username'], record)
+        return dict(record) if record else None
+
+    def get_role(self, username):
+        record = self.get_user(username)
+        return record['role'] if record else None
+
+    def invalidate(self, username=None, user_id=None):
+        """Drop one user (by username and/or id), or everything if neither is given"""
+        with self._lock:
+            if username is None and user_id is None:
+                self._entries.clear()
+                self._ids.clear()
+                return
+            if user_id is not None:
+                username = self._ids.pop(user_id, username)
+            entry = self._entries.pop(username, None) if username is not None else None
+            if entry and entry[0]:
+                self._ids.pop(entry[0]['id'], None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash
+
+# Columns accepted per imported user; username, full_name and email are required
+BULK_USER_FIELDS = ('username', 'full_name', 'email', 'phone', 'department', 'role', 'temp_password')
+REQUIRED_BULK_USER_FIELDS = ('username', 'full_name', 'email')
+
+logger = logging.getLogger(__name__)
+
+
+def parse_user_rows(payload, filename=None, content_type=None):
+    """
+    Parse an uploaded user list into a list of dicts.
+
+    Accepts a JSON list of user objects, a JSON object with a 'users' list,
+    or CSV with a header row (BULK_USER_FIELDS as column names). The format
+    is taken from the filename extension or content type, defaulting to JSON
+    if the payload starts with '[' or '{'. Raises ValueError if unparseable.
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8-sig')
+
+    name = (filename or '').lower()
+    is_csv = name.endswith('.csv') or 'csv' in (content_type or '')
+    if not is_csv and not name.endswith('.json'):
+        is_csv = not payload.lstrip().startswith(('[', '{'))
+
+    if is_csv:
+        reader = csv.DictReader(io.StringIO(payload))
+        if not reader.fieldnames or 'username' not in [field.strip().lower() for field in reader.fieldnames]:
+            raise ValueError("CSV must have a header row with at least a 'username' column")
+        rows = [{(key or '').strip().lower(): (value or '').strip() for key, value in row.items()} for row in reader]
+    else:
+        try:
+            data = json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        rows = data.get('users') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("JSON must be a list of user objects or {'users': [...]}")
+
+    return [{field: str(row.get(field) or '').strip() for field in BULK_USER_FIELDS} for row in rows]
+
+
+def generate_temp_password():
+    return secrets.token_urlsafe(9)
+
+
+class PasswordHashPool:
+    """
+    Long-lived worker processes for hash_passwords, shared by every bulk import.
+
+    start() forks all the workers at once. Call it at startup, before the
+    process starts any thread (log listener, system sampler, profiler):
+    forking a multi-threaded process can leave a child deadlocked on a lock
+    another thread held at fork time. spawn/forkserver workers would avoid
+    that but re-import the app's main module in every worker. The pool is
+    never re-created later; if it was not started (fewer than two workers,
+    no fork on this platform) or a worker died, hashing runs inline.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self._pool = None
+
+    @property
+    def running(self):
+        return self._pool is not None
+
+    def start(self):
+        if self._pool is not None or self.max_workers < 2:
+            return self
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            logger.info("fork is unavailable; passwords are hashed inline")
+            return self
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        # With fork, the first submit launches every worker (and only then the pool's manager thread)
+        self._pool.submit(int).result()
+        return self
+
+    def map(self, func, items):
+        """list(map(func, items)) across the workers; raises BrokenProcessPool (and stops the pool) if one died"""
+        items = list(items)
+        chunksize = max(1, len(items) // (self.max_workers * 4))
+        try:
+            return list(self._pool.map(func, items, chunksize=chunksize))
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def hash_passwords(passwords, pool=None):
+    """
+    Hash passwords with werkzeug's generate_password_hash (the scheme
+    /api/login verifies), across pool's worker processes when it is running.
+
+    Each hash is a deliberately slow key derivation (~0.2s), so a batch of
+    hundreds would block a request for minutes if done inline.
+    """
+    passwords = list(passwords)
+    if pool is not None and pool.running and len(passwords) > 1:
+        try:
+            return pool.map(generate_password_hash, passwords)
+        except BrokenProcessPool:
+            logger.warning("Password hashing pool broke; hashing %s passwords inline", len(passwords))
+    return [generate_password_hash(password) for password in passwords]